@@ -0,0 +1,80 @@
+"""HTTP client of the advisor service (service.py), mirroring the call surface of core.
+
+Set ADVISOR_SERVICE_URL (e.g. http://127.0.0.1:8600) and app.py sends model
+calls and report rendering to the service instead of running them in process.
+"""
+import json
+import os
+import threading
+from typing import Dict, Iterator, Optional
+
+from scheduler import StreamInterrupted
+
+# Base URL of the advisor service (unset: the app calls core in process)
+SERVICE_URL = os.getenv("ADVISOR_SERVICE_URL")
+# Seconds to wait for the service to answer (for streams: between chunks)
+SERVICE_TIMEOUT = float(os.getenv("ADVISOR_SERVICE_TIMEOUT", 60))
+
+# Process-wide HTTP client with a shared connection pool, created on first use by get_http_client()
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the process-wide httpx.Client for SERVICE_URL, creating it on first call."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                import httpx
+
+                _http_client = httpx.Client(base_url=SERVICE_URL, timeout=SERVICE_TIMEOUT)
+    return _http_client
+
+
+def _payload(user_input: str, context: Optional[Dict], chat_history, priority: str) -> Dict:
+    return {"user_input": user_input, "context": context, "chat_history": chat_history, "priority": priority}
+
+
+def call_gemini_api(user_input: str, context: Optional[Dict] = None, chat_history=None, priority: str = "chat") -> str:
+    """core.call_gemini_api answered by the service."""
+    try:
+        response = get_http_client().post("/v1/respond", json=_payload(user_input, context, chat_history, priority))
+        response.raise_for_status()
+        return response.json()["response"]
+    except Exception as e:
+        # Same contract as in process: failures come back as text rather than exceptions
+        return f"Error generating response: {str(e)}"
+
+
+def call_gemini_api_stream(user_input: str, context: Optional[Dict] = None, chat_history=None,
+                           priority: str = "chat") -> Iterator[str]:
+    """core.call_gemini_api_stream answered by the service, one newline-delimited JSON chunk at a time."""
+    received = False
+    try:
+        payload = _payload(user_input, context, chat_history, priority)
+        with get_http_client().stream("POST", "/v1/stream", json=payload) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    message = json.loads(line)
+                    if "error" in message:
+                        raise StreamInterrupted(message["error"])
+                    received = True
+                    yield message["text"]
+    except StreamInterrupted:
+        raise
+    except Exception as e:
+        # Like core, a failure after part of the answer is raised rather than appended to it
+        if received:
+            raise StreamInterrupted(f"The answer stopped: {e}") from e
+        yield f"Error generating response: {str(e)}"
+
+
+def generate_pdf(user_context: Dict, insights: str) -> bytes:
+    """pdf_utils.generate_pdf rendered (and cached) by the service."""
+    response = get_http_client().post("/v1/pdf", json={"user_context": user_context, "insights": insights})
+    if response.status_code >= 400:
+        # The service explains render failures in its JSON body
+        raise RuntimeError(response.json().get("error", response.text) if response.content else response.reason_phrase)
+    return response.content
@@ -1,19 +1,49 @@
 import streamlit as st
-from core import call_gemini_api
-from typing import Dict
+from advisor_client import SERVICE_URL
+from typing import Dict, Iterable
 import base64
 import datetime
-from pdf_utils import generate_pdf
+import os
+import uuid
+from metrics import REGISTRY as metrics, start_metrics_server
+from render_utils import escape_markdown, prepare_markdown
+from reports import get_report_service, report_key
+from retrieval import relevant_history
+from scheduler import StreamInterrupted
+from session_store import SessionMessages, get_session_store
+from warm_insights import INITIAL_INSIGHTS_PROMPT, lookup_insights
 
+if SERVICE_URL:
+    # Thin client: model calls and report rendering happen in the advisor service (service.py)
+    from advisor_client import call_gemini_api_stream
+else:
+    from core import call_gemini_api_stream
+
+# Messages rendered per rerun; "Load earlier messages" widens the window by this much
+CHAT_RENDER_WINDOW = 20
+
+# Show the metrics debug panel in the sidebar (also enabled per browser with ?debug=1)
+DEBUG_PANEL = os.getenv("ADVISOR_DEBUG_PANEL", "0") == "1"
 
 
 def initialize_session_state():
     """Initialize session state variables."""
-    if "chat_sessions" not in st.session_state:
-        st.session_state.chat_sessions = {
-            "Default": [{"role": "assistant", "content": "Let's start chatting! 👇"}]
-        }
-        st.session_state.current_session = "Default"
+    if "user_id" not in st.session_state:
+        # A stable id in the URL lets a returning browser find its stored sessions
+        user_id = st.query_params.get("user")
+        if not user_id:
+            user_id = uuid.uuid4().hex
+            st.query_params["user"] = user_id
+        st.session_state.user_id = user_id
+
+    # Only the id of the open session and a page of its messages live in memory,
+    # everything else stays in the session store until it is needed
+    if "current_session" not in st.session_state:
+        sessions = get_session_store().list_sessions(st.session_state.user_id)
+        if sessions:
+            open_session(sessions[-1]["id"])
+        else:
+            open_session(create_chat_session("Default", "Let's start chatting! 👇"))
     
     if "user_context" not in st.session_state:
         st.session_state.user_context = {}
@@ -21,14 +51,39 @@ def initialize_session_state():
     if "form_submitted" not in st.session_state:
         st.session_state.form_submitted = False
 
-    # State for managing the dynamic download button
-    if "pdf_data_to_download" not in st.session_state:
-        st.session_state.pdf_data_to_download = None
-    if "pdf_ready_for_download" not in st.session_state:
-        st.session_state.pdf_ready_for_download = False
-    # Store the content of the message the PDF was generated for
-    if "pdf_generated_for_message_content" not in st.session_state:
-        st.session_state.pdf_generated_for_message_content = None
+    # Content hash of the report this browser session last asked for (see reports.report_key)
+    if "pdf_report_key" not in st.session_state:
+        st.session_state.pdf_report_key = None
+    # Key of the last full-session export and the (session, message count) it covers
+    if "pdf_export_key" not in st.session_state:
+        st.session_state.pdf_export_key = None
+        st.session_state.pdf_export_scope = None
+
+def create_chat_session(name: str, greeting: str) -> int:
+    """Create a stored chat session for the current user, starting with a greeting."""
+    store = get_session_store()
+    session_id = store.create_session(st.session_state.user_id, name)
+    store.append_message(session_id, "assistant", greeting)
+    return session_id
+
+def open_session(session_id: int):
+    """Make session_id the current session and load its most recent page of messages."""
+    st.session_state.current_session = session_id
+    st.session_state.messages = get_session_store().load_messages(session_id)
+    st.session_state.render_window = CHAT_RENDER_WINDOW
+
+def load_earlier_messages():
+    """Widen the rendered window, fetching the previous page from the store once the loaded ones run out."""
+    st.session_state.render_window += CHAT_RENDER_WINDOW
+    messages = st.session_state.messages
+    if st.session_state.render_window > len(messages) and messages[0]["seq"] > 0:
+        earlier = get_session_store().load_messages(st.session_state.current_session, before=messages[0]["seq"])
+        st.session_state.messages = earlier + messages
+
+def append_message(role: str, content: str):
+    """Append a message to the current session, in the store and in the loaded page."""
+    seq = get_session_store().append_message(st.session_state.current_session, role, content)
+    st.session_state.messages.append({"seq": seq, "role": role, "content": content})
 
 def render_financial_form():
     """Render and handle the financial information form."""
@@ -56,15 +111,34 @@ def render_financial_form():
             return True
     return False
 
+def stream_to_placeholder(message_placeholder, chunks: Iterable[str]) -> str:
+    """Render streamed response chunks into a placeholder as they arrive and return the full text."""
+    response = ""
+    try:
+        for chunk in chunks:
+            response += chunk
+            # Trailing cursor shows the answer is still being generated
+            message_placeholder.markdown(escape_markdown(response) + "▌")
+    except StreamInterrupted as e:
+        # What arrived is kept as the answer; the failure is shown next to it, not as part of it
+        st.error(f"{e}. Please ask again for the complete answer.")
+    message_placeholder.markdown(prepare_markdown(response))
+    return response
+
 def render_initial_insights():
     """Generate and display initial insights based on the user's financial profile."""
-    initial_insights = call_gemini_api(
-        "Provide initial financial insights based on the user's profile.",
-        st.session_state.user_context
-    )
-    st.session_state.messages.append({"role": "assistant", "content": initial_insights})
     st.markdown("### Initial Financial Insights")
-    st.markdown(initial_insights)
+    # Common profiles with generic goals get insights precomputed by warm_insights.py
+    initial_insights = lookup_insights(st.session_state.user_context)
+    if initial_insights is not None:
+        metrics.inc("advisor_responses_total", outcome="prewarmed")
+        st.markdown(prepare_markdown(initial_insights))
+    else:
+        initial_insights = stream_to_placeholder(
+            st.empty(),
+            call_gemini_api_stream(INITIAL_INSIGHTS_PROMPT, st.session_state.user_context, priority="insights")
+        )
+    append_message("assistant", initial_insights)
     return initial_insights
 
 def download_pdf_link(pdf_data: bytes, filename: str) -> str:
@@ -73,12 +147,77 @@ def download_pdf_link(pdf_data: bytes, filename: str) -> str:
     href = f'<a href="data:application/octet-stream;base64,{b64}" download="{filename}">Download PDF Report</a>'
     return href
 
+@st.fragment(run_every=1)
+def render_report_progress(key: str):
+    """Show a progress note while a report renders, rerunning the app once it is finished."""
+    if get_report_service().is_pending(key):
+        st.info("⏳ Preparing report...")
+    else:
+        st.rerun()
+
+def render_session_export(report_service):
+    """Sidebar controls exporting the whole current session as one PDF."""
+    # Messages are append-only, so an export is current while the message count is unchanged
+    message_count = st.session_state.messages[-1]["seq"] + 1
+    scope = (st.session_state.current_session, message_count)
+    export_key = st.session_state.pdf_export_key if st.session_state.pdf_export_scope == scope else None
+    export_path = report_service.get_export_path(export_key) if export_key else None
+
+    if export_path is not None:
+        try:
+            export_file = open(export_path, "rb")
+        except FileNotFoundError:
+            # Deleted between the lookup and here; handled like any other expired export below
+            export_path = None
+        else:
+            # Served from the exported file rather than from bytes held in session state
+            with export_file:
+                st.sidebar.download_button(
+                    label="📥 Download Full Session",
+                    data=export_file,
+                    file_name="Financial_Advisor_Session.pdf",
+                    mime="application/pdf",
+                    key="pdf_export_download"
+                )
+            return
+
+    if export_key and report_service.is_pending(export_key):
+        with st.sidebar:
+            render_report_progress(export_key)
+    else:
+        error = report_service.get_error(export_key) if export_key else None
+        if error:
+            st.sidebar.error(f"Error exporting session: {error}")
+        elif export_key:
+            # Finished earlier, but newer exports (from any session) have since pushed its file out
+            st.session_state.pdf_export_key = None
+            st.session_state.pdf_export_scope = None
+            st.sidebar.info("The exported file is no longer available, please export the session again.")
+        if st.sidebar.button("🗂️ Export Full Session", key="pdf_export"):
+            # The worker streams the session from the store rather than receiving every message
+            st.session_state.pdf_export_key = report_service.submit_session_export(
+                st.session_state.user_context,
+                SessionMessages(get_session_store().path, st.session_state.current_session, message_count)
+            )
+            st.session_state.pdf_export_scope = scope
+            st.rerun()
+
 def render_chat_interface():
     """Render the chat interface."""
+    messages = st.session_state.messages
+    window = st.session_state.render_window
+
+    # Only the newest messages are rendered; older ones (loaded or still in the store) on request
+    if len(messages) > window or (messages and messages[0]["seq"] > 0):
+        if st.button("⬆️ Load earlier messages", key="load_earlier"):
+            load_earlier_messages()
+            st.rerun()
+
     # Display current chat history
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    with metrics.span("chat_render"):
+        for message in messages[-window:]:
+            with st.chat_message(message["role"]):
+                st.markdown(prepare_markdown(message["content"]))
     
     # Chat input
     if prompt := st.chat_input("Ask your financial question"):
@@ -86,22 +225,48 @@ def render_chat_interface():
 
 def handle_chat_input(prompt: str):
     """Handle chat input and generate response."""
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    append_message("user", prompt)
     with st.chat_message("user"):
-        st.markdown(prompt)
-
-    response = call_gemini_api(prompt, st.session_state.user_context)
-    
+        st.markdown(prepare_markdown(prompt))
 
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
-        message_placeholder.markdown(response)
+        # The latest turns plus the earlier ones relevant to this question, rather than the whole session
+        chat_history = relevant_history(st.session_state.current_session, prompt)
+        response = stream_to_placeholder(
+            message_placeholder,
+            call_gemini_api_stream(prompt, st.session_state.user_context, chat_history)
+        )
+
+    append_message("assistant", response)
 
-    st.session_state.messages.append({"role": "assistant", "content": response})
-    st.session_state.chat_sessions[st.session_state.current_session] = st.session_state.messages
+def render_metrics_panel():
+    """Sidebar debug panel showing the process-wide latency histograms, counters and gauges."""
+    with st.sidebar.expander("📊 Metrics", expanded=False):
+        if not metrics.enabled:
+            st.caption("Instrumentation is disabled (ADVISOR_METRICS=0).")
+            return
+        spans = metrics.span_summary()
+        if spans:
+            st.table([
+                {
+                    "span": row["span"],
+                    "count": row["count"],
+                    "mean ms": f"{row['mean_ms']:.1f}",
+                    "p50 ms": f"≤{row['p50_ms']:g}",
+                    "p95 ms": f"≤{row['p95_ms']:g}",
+                    "errors": row["errors"],
+                }
+                for row in spans
+            ])
+        for series, value in {**metrics.counters(), **metrics.gauges()}.items():
+            st.caption(f"`{series}` {value:g}")
+        st.code(metrics.render_prometheus(), language="text")
 
 def main():
     st.set_page_config(page_title="Financial Advisor Chat", layout="wide")
+    # No-op unless METRICS_PORT is set; the server outlives reruns
+    start_metrics_server()
     
     initialize_session_state()
     
@@ -122,74 +287,80 @@ def main():
         except IndexError:
             st.sidebar.warning("No messages yet.")
 
-        # Determine if the current ready PDF matches the latest message
-        pdf_matches_latest = (
-            st.session_state.pdf_ready_for_download and 
-            st.session_state.pdf_generated_for_message_content == latest_message_content
-        )
+        # Reports are identified by a hash of (profile, message), so re-preparing a report
+        # rendered earlier (in this or any other session) is served straight from the cache
+        if latest_message_content:
+            report_service = get_report_service()
+            latest_report_key = report_key(st.session_state.user_context, latest_message_content)
+            requested = st.session_state.pdf_report_key == latest_report_key
+            pdf_data = report_service.get(latest_report_key) if requested else None
 
-        # --- Conditional Button Rendering ---
-        if pdf_matches_latest and st.session_state.pdf_data_to_download:
-            # State: PDF is ready and matches the latest message -> Show Download Button
-            st.sidebar.download_button(
-                label="📥 Download Report",
-                data=st.session_state.pdf_data_to_download,
-                file_name="Financial_Advisor_Report.pdf",
-                mime="application/pdf",
-                key="pdf_download_active",
-                # When download button is clicked, reset the state so it becomes "Prepare" again
-                on_click=lambda: setattr(st.session_state, 'pdf_ready_for_download', False) 
-            )
-        elif latest_message_content: 
-            # State: PDF not ready, or doesn't match latest -> Show Prepare Button
-            if st.sidebar.button("⚙️ Prepare Report", key="pdf_prepare"):
-                try:
-                    # Generate PDF and update state
-                    st.session_state.pdf_data_to_download = generate_pdf(
+            # --- Conditional Button Rendering ---
+            if pdf_data is not None:
+                # State: PDF is ready and matches the latest message -> Show Download Button
+                st.sidebar.download_button(
+                    label="📥 Download Report",
+                    data=pdf_data,
+                    file_name="Financial_Advisor_Report.pdf",
+                    mime="application/pdf",
+                    key="pdf_download_active"
+                )
+            elif requested and report_service.is_pending(latest_report_key):
+                # State: PDF is rendering in the background -> Poll until it is done
+                with st.sidebar:
+                    render_report_progress(latest_report_key)
+            else:
+                # State: PDF not requested for the latest message (or it failed) -> Show Prepare Button
+                error = report_service.get_error(latest_report_key) if requested else None
+                if error:
+                    st.sidebar.error(f"Error generating PDF: {error}")
+                if st.sidebar.button("⚙️ Prepare Report", key="pdf_prepare"):
+                    st.session_state.pdf_report_key = report_service.submit(
                         st.session_state.user_context,
                         latest_message_content
                     )
-                    st.session_state.pdf_generated_for_message_content = latest_message_content
-                    st.session_state.pdf_ready_for_download = True
-                    # Use st.rerun() to immediately re-render the sidebar with the download button
-                    st.rerun() 
-                except Exception as e:
-                    st.sidebar.error(f"Error generating PDF: {e}")
-                    st.session_state.pdf_ready_for_download = False
-                    st.session_state.pdf_data_to_download = None
-                    st.session_state.pdf_generated_for_message_content = None
+                    # Use st.rerun() to immediately re-render the sidebar with the download button or progress
+                    st.rerun()
+
+            render_session_export(report_service)
+
+            stats = report_service.get_stats()
+            if stats["hits"] + stats["misses"]:
+                st.sidebar.caption(
+                    f"Report cache hit rate {stats['hit_rate']:.0%}, "
+                    f"avg render {stats['avg_render_seconds']:.2f}s"
+                )
         # else: # Case where there are no messages yet - do nothing for buttons
 
+    # Session index (names and ids only, no messages)
+    sessions = get_session_store().list_sessions(st.session_state.user_id)
+
     # New chat button
     if st.sidebar.button("➕ New Chat"):
-        new_name = f"Chat {len(st.session_state.chat_sessions) + 1}"
-        st.session_state.chat_sessions[new_name] = [
-            {"role": "assistant", "content": "New chat started 👇"}
-        ]
-        st.session_state.current_session = new_name
-        # Reset PDF state
-        st.session_state.pdf_ready_for_download = False
-        st.session_state.pdf_data_to_download = None
-        st.session_state.pdf_generated_for_message_content = None
+        new_name = f"Chat {len(sessions) + 1}"
+        open_session(create_chat_session(new_name, "New chat started 👇"))
+        sessions = get_session_store().list_sessions(st.session_state.user_id)
 
     # Session selector
-    session_names = list(st.session_state.chat_sessions.keys())
-    selected_session = st.sidebar.selectbox("Select a session", session_names)
+    session_names = {session["id"]: session["name"] for session in sessions}
+    session_ids = list(session_names)
+    selected_session = st.sidebar.selectbox(
+        "Select a session",
+        session_ids,
+        index=session_ids.index(st.session_state.current_session),
+        format_func=session_names.get
+    )
     
     if selected_session != st.session_state.current_session:
-        st.session_state.current_session = selected_session
-         # Reset PDF state
-        st.session_state.pdf_ready_for_download = False
-        st.session_state.pdf_data_to_download = None
-        st.session_state.pdf_generated_for_message_content = None
+        open_session(selected_session)
+
+    if DEBUG_PANEL or st.query_params.get("debug") == "1":
+        render_metrics_panel()
     
     # Main content
     st.title("🧠 Financial Advisor Chat")
     st.markdown("---")
     
-    # Get current session messages
-    st.session_state.messages = st.session_state.chat_sessions[st.session_state.current_session]
-    
     # Show financial profile if form has been submitted
     if st.session_state.form_submitted:
         with st.expander("Your Financial Profile", expanded=False):
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import threading
+from typing import Iterator, Optional
+
+from metrics import REGISTRY as metrics
+
+# Default hosted model
+GEMINI_MODEL = "gemini-2.0-flash"
+# Backend answering when the primary is slow or saturated: a Gemini model name, "local" or "none"
+FALLBACK_MODEL = os.getenv("ADVISOR_FALLBACK_MODEL", "gemini-2.0-flash-lite")
+
+
+class ModelBackend:
+    """Interface FinancialAdvisor dispatches fully built prompts to.
+
+    Subclasses implement generate(); streaming and async default to wrapping it.
+    """
+
+    model = "base"
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        yield self.generate(prompt)
+
+    async def generate_async(self, prompt: str) -> str:
+        return await asyncio.to_thread(self.generate, prompt)
+
+
+class GeminiBackend(ModelBackend):
+    """Hosted Gemini models through a single, lazily built genai.Client."""
+
+    def __init__(self, client=None, model: str = GEMINI_MODEL, api_key: Optional[str] = None):
+        self.model = model
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The genai.Client, constructed (and google.genai imported) on first access."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from google import genai
+
+                    self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def generate(self, prompt: str) -> str:
+        response = self.client.models.generate_content(model=self.model, contents=prompt)
+        metrics.record_usage(self.model, response.usage_metadata)
+        return response.text
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        usage = None
+        for chunk in self.client.models.generate_content_stream(model=self.model, contents=prompt):
+            # Usage metadata may repeat with running totals, the last one covers the whole response
+            usage = chunk.usage_metadata or usage
+            # Some chunks (e.g. the final usage-only one) carry no text
+            if chunk.text:
+                yield chunk.text
+        metrics.record_usage(self.model, usage)
+
+    async def generate_async(self, prompt: str) -> str:
+        response = await self.client.aio.models.generate_content(model=self.model, contents=prompt)
+        metrics.record_usage(self.model, response.usage_metadata)
+        return response.text
+
+
+class LocalModelBackend(ModelBackend):
+    """Offline GPT-2 served by the process-wide warm LocalModelEngine."""
+
+    model = "local-gpt2"
+
+    def __init__(self, engine=None):
+        self._engine = engine
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from local_model import get_local_engine
+
+            self._engine = get_local_engine()
+        return self._engine
+
+    def generate(self, prompt: str) -> str:
+        return self.engine.generate(prompt)
+
+
+def create_backend(name: Optional[str] = None, client=None) -> ModelBackend:
+    """Build the backend named by name or the ADVISOR_BACKEND env var ("gemini", "local" or "fake").
+
+    "fake" answers with fake_genai.FakeClient after FAKE_MODEL_LATENCY seconds, for running
+    the app or the service without an API key.
+    """
+    name = (name or os.getenv("ADVISOR_BACKEND", "gemini")).lower()
+    if name == "gemini":
+        return GeminiBackend(client=client)
+    if name == "local":
+        return LocalModelBackend()
+    if name == "fake":
+        from fake_genai import FakeClient
+
+        return GeminiBackend(client=client or FakeClient(latency=float(os.getenv("FAKE_MODEL_LATENCY", 0.5))))
+    raise ValueError(f"Unknown model backend: {name}")
+
+
+def create_fallback_backend(primary: ModelBackend, name: Optional[str] = None) -> Optional[ModelBackend]:
+    """Backend the scheduler hedges primary with, named by name or ADVISOR_FALLBACK_MODEL (None: no fallback)."""
+    name = name or FALLBACK_MODEL
+    if name.lower() in ("", "none") or name == primary.model:
+        return None
+    if name.lower() == "local":
+        return None if isinstance(primary, LocalModelBackend) else LocalModelBackend()
+    if isinstance(primary, GeminiBackend):
+        # A second model on the same client and key; each Gemini model has its own quota
+        return GeminiBackend(client=primary._client, model=name, api_key=primary.api_key)
+    return GeminiBackend(model=name)
@@ -0,0 +1,115 @@
+"""Render one PDF report per record of a JSONL file.
+
+Each input line is a JSON object with "user_context" and "insights" keys.
+Reports are named after the content hash of that pair, so rerunning after a
+partial failure skips every report that already exists on disk.
+
+    python batch_reports.py records.jsonl reports/ [--workers N]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+from pdf_utils import generate_pdf
+from reports import report_key
+
+
+def parse_record(line: str) -> Dict:
+    """Decode one JSONL line, raising ValueError unless it is a {user_context, insights} record."""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("record is not a JSON object")
+    if not isinstance(record.get("user_context"), dict):
+        raise ValueError('"user_context" must be an object')
+    if not isinstance(record.get("insights"), str):
+        raise ValueError('"insights" must be a string')
+    return record
+
+
+def iter_records(path: str) -> Iterator[Tuple[int, Optional[Dict], str]]:
+    """Yield (line number, record or None, error or "") for each non-blank line of a JSONL file.
+
+    A malformed line is reported with its error instead of stopping the run.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield line_number, parse_record(line), ""
+                except ValueError as e:
+                    # json.JSONDecodeError is a ValueError too
+                    yield line_number, None, str(e)
+
+
+def write_atomic(path: str, data: bytes):
+    """Write data to path via a temporary file so readers never see a partial PDF."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def render_record(job: Tuple[int, Dict, str]) -> Tuple[int, str, str]:
+    """Render one record to its output path; returns (line number, path, error or "")."""
+    line_number, record, path = job
+    try:
+        write_atomic(path, generate_pdf(record["user_context"], record["insights"]))
+        return line_number, path, ""
+    except Exception as e:
+        return line_number, path, str(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of {user_context, insights} records")
+    parser.add_argument("output_dir", help="Directory the PDFs are written to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    jobs = []
+    queued = set()
+    skipped = 0
+    invalid = 0
+    for line_number, record, error in iter_records(args.input):
+        if error:
+            invalid += 1
+            print(f"line {line_number}: invalid record: {error}", file=sys.stderr)
+            continue
+        path = os.path.join(args.output_dir, f"{report_key(record['user_context'], record['insights'])}.pdf")
+        # Already rendered by an earlier run, or a duplicate record in this one
+        if path in queued or os.path.exists(path):
+            skipped += 1
+        else:
+            queued.add(path)
+            jobs.append((line_number, record, path))
+
+    start = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for line_number, path, error in executor.map(render_record, jobs, chunksize=8):
+            if error:
+                failed += 1
+                print(f"line {line_number}: failed: {error}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    rendered = len(jobs) - failed
+    rate = rendered / elapsed if elapsed > 0 else 0.0
+    # Invalid records count as failures, like records that failed to render
+    failed += invalid
+    print(f"Rendered {rendered}, skipped {skipped} existing, failed {failed} in {elapsed:.2f}s ({rate:.1f} reports/sec)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
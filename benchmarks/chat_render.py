@@ -0,0 +1,86 @@
+"""Rerun latency of the chat page: windowed rendering versus rendering every message.
+
+Seeds a session with N stored messages, loads all of them into the page, and
+times a Streamlit rerun through AppTest with the default render window and
+with a window wide enough to render the whole history.
+
+Run from the repository root:
+    python -m benchmarks.chat_render [--sizes 50 500 5000 --runs 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+ANSWER = (
+    "With a monthly income of $4,000, keep needs at 50% ($2,000) and savings at 20% ($800).\n\n"
+    "- **Emergency fund:** 6 months of expenses\n"
+    "- **Investing:** low-cost index funds\n"
+)
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+USER_CONTEXT = {"age": 30, "income": 4000.0, "expenses": "Medium", "goals": "Retire early", "country": "Other"}
+
+
+def seed_session(store, user_id: str, size: int) -> int:
+    session_id = store.create_session(user_id, "Chat 1")
+    for turn in range(size):
+        if turn % 2:
+            store.append_message(session_id, "user", f"How much should I save, question {turn}?")
+        else:
+            store.append_message(session_id, "assistant", ANSWER)
+    return session_id
+
+
+def time_reruns(user_id: str, session_id: int, size: int, window, runs: int) -> float:
+    """Median seconds per rerun with every message loaded and the given render window."""
+    from streamlit.testing.v1 import AppTest
+
+    from app import CHAT_RENDER_WINDOW
+    from session_store import get_session_store
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.query_params["user"] = user_id
+    at.run()
+    at.session_state.form_submitted = True
+    at.session_state.user_context = USER_CONTEXT
+    at.session_state.messages = get_session_store().load_messages(session_id, limit=size)
+    at.session_state.render_window = window or CHAT_RENDER_WINDOW
+    # Untimed: fills render_utils' markdown cache, which the timed reruns then reuse
+    at.run()
+    assert not at.exception, at.exception
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before app (and with it session_store) is imported
+        os.environ["SESSION_DB_PATH"] = os.path.join(tmp, "sessions.sqlite")
+        os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+        from session_store import get_session_store
+
+        store = get_session_store()
+        print(f"{'messages':>8} {'windowed':>12} {'render all':>12} {'speedup':>8}")
+        for size in args.sizes:
+            user_id = f"bench-{size}"
+            session_id = seed_session(store, user_id, size)
+            windowed = time_reruns(user_id, session_id, size, None, args.runs)
+            full = time_reruns(user_id, session_id, size, size, args.runs)
+            print(f"{size:>8} {windowed * 1000:>9.1f} ms {full * 1000:>9.1f} ms {full / windowed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
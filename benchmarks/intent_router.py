@@ -0,0 +1,122 @@
+"""Routed share, accuracy and latency of the local intent router on a labeled sample.
+
+Each sample question is labeled with the intent that should answer it, or
+None when it needs the model (including close matches with a condition or
+goal the template would ignore). A question routed to the wrong template (or
+routed at all when it should not be) counts as a false route.
+
+Run from the repository root:
+    python -m benchmarks.intent_router [--threshold 0.35]
+"""
+import argparse
+import time
+
+from cache import ResponseCache
+from core import FinancialAdvisor
+from fake_genai import FakeClient
+from intent_router import ROUTER_THRESHOLD, IntentRouter
+
+CONTEXT = {"age": 30, "income": 4000.0, "expenses": "Medium", "goals": "Retire early", "country": "United States"}
+
+SAMPLES = [
+    ("What's my budget breakdown?", "budget_breakdown"),
+    ("Can you break down my budget?", "budget_breakdown"),
+    ("Show me my monthly budget", "budget_breakdown"),
+    ("How should I split my paycheck?", "budget_breakdown"),
+    ("What does the 50/30/20 rule mean for my income?", "budget_breakdown"),
+    ("Give me a monthly budget", "budget_breakdown"),
+    ("How much should I save monthly?", "monthly_savings"),
+    ("How much should I save every month?", "monthly_savings"),
+    ("How much money should I save?", "monthly_savings"),
+    ("What's a good monthly savings amount for me?", "monthly_savings"),
+    ("How much should I be putting into savings each month?", "monthly_savings"),
+    ("How much of my salary should I save?", "monthly_savings"),
+    ("How much can I spend on fun each month?", "wants_allowance"),
+    ("What's my budget for dining out and entertainment?", "wants_allowance"),
+    ("How much can I spend on hobbies?", "wants_allowance"),
+    ("How much discretionary money do I have?", "wants_allowance"),
+    ("How big should my emergency fund be?", "emergency_fund"),
+    ("How long will it take to build my emergency fund?", "emergency_fund"),
+    ("How much do I need in an emergency fund?", "emergency_fund"),
+    ("When will I have a full emergency fund?", "emergency_fund"),
+    ("Am I on track for retirement?", "retirement_outlook"),
+    ("Will I have enough money to retire?", "retirement_outlook"),
+    ("How much will I have saved by retirement?", "retirement_outlook"),
+    ("Can I retire at 65?", "retirement_outlook"),
+    ("Should I invest in index funds or individual stocks?", None),
+    ("How do I pay off my student loans faster?", None),
+    ("Is it better to rent or buy a home in my city?", None),
+    ("What is a Roth IRA and should I open one?", None),
+    ("How much should I save for a house down payment in 5 years?", None),
+    ("Should I use my emergency fund to pay off my credit card?", None),
+    ("How do I negotiate a higher salary?", None),
+    ("What are the tax benefits of a 401k?", None),
+    ("Should I pay off my mortgage early or invest?", None),
+    ("How can I lower my grocery bill?", None),
+    ("Is gold a good investment right now?", None),
+    ("How much life insurance do I need?", None),
+    ("What should I do with a $10,000 bonus?", None),
+    ("How do I start investing with little money?", None),
+    ("Can I retire early at 50 if I move abroad?", None),
+    ("How do I budget for a wedding?", None),
+    # Conditions and goals a template would ignore
+    ("What is my budget breakdown if I lose my job?", None),
+    ("How much should I save monthly for a house?", None),
+    ("Can I retire at 65 if I buy a house?", None),
+    ("What if my income doubles, how should I split my income?", None),
+    ("how much should I save monthly to retire at 50?", None),
+    # Negations, which a template would answer as if they were not there
+    ("can I not retire at 65", None),
+    ("how much should I not save each month", None),
+    ("What if I don't save anything this month?", None),
+    ("whats my budget", "budget_breakdown"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threshold", type=float, default=ROUTER_THRESHOLD)
+    parser.add_argument("--model-latency", type=float, default=1.5,
+                        help="Mean seconds of a simulated model call (FakeClient)")
+    args = parser.parse_args()
+
+    router = IntentRouter(threshold=args.threshold)
+    routed = correct = false_routes = missed = 0
+    for question, label in SAMPLES:
+        intent, confidence = router.classify(question)
+        predicted = router.route(question)
+        if predicted is not None:
+            routed += 1
+            if predicted == label:
+                correct += 1
+            else:
+                false_routes += 1
+                print(f"false route  {confidence:.2f} {predicted:<18} {question}")
+        elif label is not None:
+            missed += 1
+            print(f"missed       {confidence:.2f} {str(intent):<18} {question}")
+
+    routable = sum(1 for _, label in SAMPLES if label is not None)
+    print(f"\n{len(SAMPLES)} questions, {routable} routable: routed {routed} ({routed / len(SAMPLES):.0%}), "
+          f"correct {correct}, false routes {false_routes}, missed {missed}")
+
+    # End-to-end cost per question through the advisor, routed versus sent to the model
+    advisor = FinancialAdvisor(client=FakeClient(latency=args.model_latency, jitter=False), router=router)
+    advisor.cache = ResponseCache(path=None)
+    for name, samples in (("routed", [q for q, l in SAMPLES if router.route(q)]),
+                          ("model", [q for q, l in SAMPLES if not router.route(q)][:3])):
+        start = time.perf_counter()
+        for question in samples:
+            advisor.get_response(question, CONTEXT)
+        per_question = (time.perf_counter() - start) / max(len(samples), 1)
+        print(f"{name:<7} {per_question * 1000:10.2f} ms per question ({len(samples)} questions)")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        for question, _ in SAMPLES:
+            router.classify(question)
+    print(f"classify {(time.perf_counter() - start) / (100 * len(SAMPLES)) * 1e6:8.1f} us per question")
+
+
+if __name__ == "__main__":
+    main()
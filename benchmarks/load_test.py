@@ -0,0 +1,252 @@
+"""Concurrent-session load test of the Streamlit app against a fake Gemini client.
+
+Every simulated session drives app.py through Streamlit's AppTest, so the real
+UI code paths run. The steps are:
+- open: first page load
+- submit: profile form, i.e. render_initial_insights
+- chat: --turns questions, i.e. handle_chat_input
+- report: Prepare Report, polled until the PDF from generate_pdf is ready
+
+All sessions share the process-wide advisor, scheduler, caches and report
+workers, as they would on one node. Sessions run --concurrency at a time;
+pass several levels to find where latency takes off or answers are shed.
+State goes to a scratch directory, never to the app's own data or cache.
+
+Run from the repository root:
+    python -m benchmarks.load_test [--sessions 200] [--concurrency 10 50 100] [--latency 1.0]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+STEPS = ("open", "submit", "chat", "report")
+QUESTIONS = [
+    "How should I pay down my credit card of ${amount}?",
+    "Is a ${amount} car affordable on my income?",
+    "Should I invest ${amount} in index funds or keep it in savings?",
+    "How do I plan for a ${amount} wedding next year?",
+    "What should I do with a ${amount} tax refund?",
+]
+GOALS = ["Buy a house", "Pay off student loans", "Start a business", "Travel for a year", "Send kids to college"]
+COUNTRIES = ["United States", "India", "United Kingdom", "Canada", "Australia", "Other"]
+
+
+def _rss_kib(pid="self") -> int:
+    """Resident set size of a process from /proc, 0 where that is unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class RssSampler(threading.Thread):
+    """Tracks the peak RSS of this process and of its worker processes (the report pool)."""
+
+    def __init__(self, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kib = 0
+        self.peak_children_kib = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        self.peak_kib = max(self.peak_kib, _rss_kib())
+        children = sum(_rss_kib(child.pid) for child in multiprocessing.active_children())
+        self.peak_children_kib = max(self.peak_children_kib, children)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.sample()
+
+
+class Results:
+    def __init__(self):
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+        self.sessions = 0
+        self._lock = threading.Lock()
+
+    def record(self, step: str, seconds: float, ok: bool = True):
+        with self._lock:
+            self.timings[step].append(seconds)
+            if not ok:
+                self.failures[step] += 1
+
+
+def allow_concurrent_app_tests():
+    """Let AppTest sessions run side by side in one process.
+
+    AppTest installs a stand-in Runtime singleton for every script run and
+    clears it when the run ends, which breaks whichever other session is
+    mid-run; Runtime lookups fall back to the last stand-in installed instead.
+    Every run also compiles app.py afresh, and ast.parse is not thread-safe
+    on Python 3.11, so compiling is serialized.
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    last = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+        if not last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last[0]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(last))
+    # AppTest patches this per run as well, concurrent patches could restore each other's
+    config.set_option("global.appTest", True)
+
+    compile_lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def locked_get_bytecode(self, script_path):
+        with compile_lock:
+            return get_bytecode(self, script_path)
+
+    ScriptCache.get_bytecode = locked_get_bytecode
+
+
+def _answer_failed(at) -> bool:
+    from core import BUSY_MESSAGE
+
+    content = at.session_state.messages[-1]["content"] if at.session_state.messages else ""
+    return bool(at.exception) or content.startswith("Error generating response") or content == BUSY_MESSAGE
+
+
+def run_session(index: int, turns: int, report_timeout: float, results: Results):
+    """One scripted conversation: open, submit the profile, chat, prepare the report."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(index)
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+
+    start = time.perf_counter()
+    at.run()
+    results.record("open", time.perf_counter() - start, not at.exception)
+
+    # A distinct profile per session, so answers are not simply served from the response cache
+    at.number_input[0].set_value(rng.randint(20, 70))
+    at.number_input[1].set_value(float(rng.randrange(1000, 15000, 50)))
+    next(r for r in at.radio if r.label == "Monthly Expenses").set_value(rng.choice(["Low", "Medium", "High"]))
+    next(t for t in at.text_input if t.label == "Your Financial Goals").set_value(f"{rng.choice(GOALS)} #{index}")
+    next(s for s in at.selectbox if s.label == "Country").set_value(rng.choice(COUNTRIES))
+    start = time.perf_counter()
+    at.button[0].click().run()
+    results.record("submit", time.perf_counter() - start, not _answer_failed(at))
+
+    for turn in range(turns):
+        question = rng.choice(QUESTIONS).replace("{amount}", f"{rng.randrange(500, 50000, 500):,}")
+        start = time.perf_counter()
+        at.chat_input[0].set_value(question).run()
+        results.record("chat", time.perf_counter() - start, not _answer_failed(at))
+
+    start = time.perf_counter()
+    at.button(key="pdf_prepare").click().run()
+    ready = False
+    while time.perf_counter() - start < report_timeout:
+        if any(button.key == "pdf_download_active" for button in at.get("download_button")):
+            ready = True
+            break
+        if at.sidebar.error:
+            break
+        # What the report progress fragment does every second, more often so the timing stays fine-grained
+        time.sleep(0.1)
+        at.run()
+    results.record("report", time.perf_counter() - start, ready)
+    with results._lock:
+        results.sessions += 1
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def run_level(concurrency: int, sessions: int, turns: int, report_timeout: float):
+    results = Results()
+    sampler = RssSampler()
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency, thread_name_prefix="session") as pool:
+        futures = [pool.submit(run_session, index, turns, report_timeout, results) for index in range(sessions)]
+        crashes = [future.exception() for future in futures if future.exception() is not None]
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+
+    steps = sum(len(results.timings[step]) for step in STEPS)
+    print(f"\nconcurrency {concurrency}: {results.sessions} sessions in {elapsed:.1f}s, "
+          f"{results.sessions / elapsed:.2f} sessions/s, {steps / elapsed:.1f} steps/s, {len(crashes)} crashed, "
+          f"peak RSS {sampler.peak_kib / 1024:.0f} MiB (+{sampler.peak_children_kib / 1024:.0f} MiB report workers)")
+    print(f"  {'step':<7} {'n':>6} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'mean s':>8} {'failed':>7}")
+    for step in STEPS:
+        timings = results.timings[step]
+        if timings:
+            print(f"  {step:<7} {len(timings):>6} {_percentile(timings, 0.5):>8.2f} {_percentile(timings, 0.95):>8.2f} "
+                  f"{_percentile(timings, 0.99):>8.2f} {statistics.fmean(timings):>8.2f} {results.failures[step]:>7}")
+    if crashes:
+        print(f"  first crash: {crashes[0]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200, help="Sessions per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--turns", type=int, default=3, help="Chat questions per session")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean seconds per fake model call")
+    parser.add_argument("--distribution", choices=["fixed", "exponential", "lognormal"], default="lognormal")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--error-codes", default="503:3,429:1,500:1",
+                        help="Relative weights of the failing calls' HTTP codes, code:weight,...")
+    parser.add_argument("--report-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    # Read by the stores when they are first imported, so set before importing the app's modules
+    scratch = tempfile.mkdtemp(prefix="advisor-load-")
+    os.environ["SESSION_DB_PATH"] = os.path.join(scratch, "sessions.sqlite")
+    os.environ["RESPONSE_CACHE_PATH"] = os.path.join(scratch, "responses.sqlite")
+    os.environ["WARM_INSIGHTS_PATH"] = os.path.join(scratch, "warm_insights.sqlite")
+    os.environ.setdefault("GEMINI_API_KEY", "load-test")
+
+    import core
+    from fake_genai import FakeClient
+
+    allow_concurrent_app_tests()
+
+    error_codes = {int(code): float(weight) for code, weight in (item.split(":") for item in args.error_codes.split(","))}
+    client = FakeClient(latency=args.latency, error_rate=args.error_rate, distribution=args.distribution,
+                        error_codes=error_codes, seed=0)
+    core.get_financial_advisor().client = client
+    print(f"{args.sessions} sessions x ({args.turns} chat turns + form + report), model latency "
+          f"{args.distribution} mean {args.latency}s, error rate {args.error_rate:.0%}, scratch {scratch}")
+
+    for concurrency in args.concurrency:
+        run_level(concurrency, args.sessions, args.turns, args.report_timeout)
+    print(f"\n{client.calls} fake model calls, process max RSS "
+          f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""CPU throughput of the local GPT-2 engine for batch sizes 1, 4 and 16.
+
+Requires the weights in models/gpt2 (see download_model.py).
+
+Run from the repository root:
+    python -m benchmarks.local_model [--quantize]
+"""
+import argparse
+import time
+
+from local_model import MODEL_DIR, LocalModelEngine
+
+BATCH_SIZES = [1, 4, 16]
+PROMPT = (
+    "User's Financial Profile: Age 32, Monthly Income $5,000.00, Medium expenses, United States.\n"
+    "Current Question: How much should I save each month for retirement?\n"
+    "Answer:"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--quantize", action="store_true", help="Use dynamic int8 quantization")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = LocalModelEngine(args.model_dir, quantize=args.quantize, max_new_tokens=args.max_new_tokens)
+    engine.generate_batch([PROMPT])  # warm-up
+
+    print(f"{'batch':>5} {'tokens':>7} {'seconds':>8} {'tokens/sec':>10}")
+    for batch_size in BATCH_SIZES:
+        tokens = 0
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            tokens += sum(count for _, count in engine.generate_batch([PROMPT] * batch_size))
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>5} {tokens:>7} {elapsed:>8.2f} {tokens / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Cost of the hot-path instrumentation with metrics enabled and disabled.
+
+Times a bare span() and a full uncached get_response() round trip against the
+zero-latency FakeClient, so the instrumentation is a large share of the work.
+
+Run from the repository root:
+    python -m benchmarks.metrics_overhead [--calls 2000]
+"""
+import argparse
+import time
+
+from cache import ResponseCache
+from core import FinancialAdvisor
+from fake_genai import FakeClient
+from metrics import REGISTRY
+from scheduler import ModelScheduler
+
+CONTEXT = {"age": 30, "income": 4000.0, "expenses": "Medium", "goals": "Retire early", "country": "Other"}
+
+
+def time_spans(calls: int) -> float:
+    """Nanoseconds per empty span."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        with REGISTRY.span("bench"):
+            pass
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def time_responses(calls: int) -> float:
+    """Microseconds per get_response() that misses the cache."""
+    # No rate limit, the point is to call the model as fast as possible
+    advisor = FinancialAdvisor(client=FakeClient(), scheduler=ModelScheduler(rpm=None))
+    advisor.cache = ResponseCache(path=None)
+    start = time.perf_counter()
+    for index in range(calls):
+        # A distinct question per call so every call reaches the model
+        advisor.get_response(f"How much should I save, question {index}?", CONTEXT)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        REGISTRY.enabled = enabled
+        REGISTRY.reset()
+        span_ns = time_spans(args.calls * 50)
+        response_us = time_responses(args.calls)
+        label = "enabled" if enabled else "disabled"
+        print(f"metrics {label:<8}  span {span_ns:7.0f} ns   get_response {response_us:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Render time and output size of pdf_utils.generate_pdf, optionally against another commit.
+
+Every render starts from an empty fragment cache, as the first report of a
+conversation does; "cached" shows a re-render of the same report.
+
+To compare with an earlier renderer (0202c95 is the original one), check
+that commit out next to this tree and point --baseline at it; its
+pdf_utils.py is loaded from there, anything it imports comes from here.
+
+Run from the repository root:
+    git worktree add /tmp/advisor-baseline 0202c95
+    python -m benchmarks.pdf_render [--baseline /tmp/advisor-baseline]
+    git worktree remove /tmp/advisor-baseline
+"""
+import argparse
+import importlib.util
+import os
+import time
+
+import pdf_utils
+from benchmarks.regression import cold_pdf
+
+SAMPLE_CONTEXT = {
+    "age": 32,
+    "income": 5000.0,
+    "expenses": "Medium",
+    "goals": "Buy a house in 5 years, pay off student loans and start investing for retirement " * 3,
+    "country": "United States",
+}
+SECTION = """**Understanding the situation**
+With a monthly income of **$5,000**, your 50/30/20 split is $2,500 for needs, $1,500 for wants and $1,000 for savings.
+
+**Immediate Action Items:**
+1. Open a high-yield savings account for a **$15,000** emergency fund
+2. Automate a $500 transfer on payday
+- Cancel unused subscriptions (~$60/month)
+- Refinance the car loan if the rate is above 7%
+
+| Goal | Monthly | Years |
+|---|---:|---:|
+| Emergency fund | $500 | 2.5 |
+| House down payment | $400 | 5 |
+
+Keep housing costs under 30% of take-home pay and review your budget every quarter.
+"""
+ANSWER_SIZES = {"short": 1, "long": 10, "very long": 40}
+REPEATS = 5
+
+
+def measure(generate, insights: str):
+    """Mean render time in milliseconds and the PDF size in KiB."""
+    generate(SAMPLE_CONTEXT, insights)  # warm caches (font metrics, regexes)
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        pdf_data = generate(SAMPLE_CONTEXT, insights)
+    return (time.perf_counter() - start) / REPEATS * 1000, len(pdf_data) / 1024
+
+
+def load_baseline(checkout: str):
+    """The pdf_utils module of another checkout of the repository."""
+    spec = importlib.util.spec_from_file_location("baseline_pdf_utils", os.path.join(checkout, "pdf_utils.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", help="Checkout of the commit to compare with, e.g. from git worktree add")
+    args = parser.parse_args()
+
+    renderers = {"current": cold_pdf, "cached": pdf_utils.generate_pdf}
+    if args.baseline:
+        renderers = {"baseline": load_baseline(args.baseline).generate_pdf, **renderers}
+    print(f"unicode font: {pdf_utils.find_unicode_font() is not None}")
+    print(f"{'answer':>10} {'chars':>7} {'renderer':>10} {'ms':>8} {'KiB':>7}")
+    for name, sections in ANSWER_SIZES.items():
+        insights = SECTION * sections
+        for renderer, generate in renderers.items():
+            elapsed, size = measure(generate, insights)
+            print(f"{name:>10} {len(insights):>7,} {renderer:>10} {elapsed:>8.1f} {size:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Time the Monte Carlo projection engine at its full size.
+
+A 15-year-old profile gives the longest horizon (50 years), so each run
+simulates 10,000 paths x 50 years. Exits non-zero past the budget.
+
+Run from the repository root:
+    python -m benchmarks.projections [--paths 10000 --runs 10]
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from projections import format_projection, project
+
+PROFILE = {"age": 15, "income": 4000.0, "expenses": "Medium", "goals": "Retire early", "country": "United States"}
+# Median milliseconds allowed for one projection
+BUDGET_MS = 250
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paths", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    # The first call also imports NumPy
+    projection = project(PROFILE, paths=args.paths)
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        project(PROFILE, paths=args.paths)
+        timings.append(time.perf_counter() - start)
+
+    median_ms = statistics.median(timings) * 1000
+    print(format_projection(projection))
+    print(f"{args.paths:,} paths x {projection['years']} years: median {median_ms:.1f} ms, "
+          f"max {max(timings) * 1000:.1f} ms (budget {BUDGET_MS} ms)")
+    sys.exit(1 if median_ms > BUDGET_MS else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Prompt size and build time of FinancialAdvisor._build_prompt for growing chat histories.
+
+Run from the repository root:
+    python -m benchmarks.prompt_build
+"""
+import time
+
+from core import FinancialAdvisor
+from fake_genai import FakeClient
+from prompt_utils import estimate_tokens
+
+SAMPLE_CONTEXT = {
+    "age": 32,
+    "income": 5000.0,
+    "expenses": "Medium",
+    "goals": "Buy a house in 5 years",
+    "country": "United States",
+}
+TURN_COUNTS = [10, 100, 1000]
+REPEATS = 50
+
+
+def make_history(turns: int):
+    """Alternate user questions and multi-paragraph assistant answers."""
+    history = []
+    for i in range(turns):
+        if i % 2:
+            content = f"How should I adjust my budget for goal number {i}?"
+        else:
+            content = (
+                f"For step {i}, put 20% of income toward savings. "
+                "Keep housing under 30% of take-home pay and review subscriptions monthly.\n"
+                "- Build a 6-month emergency fund\n- Max out employer retirement matching\n" * 3
+            )
+        history.append({"role": "user" if i % 2 else "assistant", "content": content})
+    history.append({"role": "user", "content": "What next?"})
+    return history
+
+
+def measure(advisor: FinancialAdvisor, history) -> tuple:
+    """Mean build time in milliseconds and the resulting prompt."""
+    advisor._build_prompt("What next?", SAMPLE_CONTEXT, history)  # warm the prefix and turn memos
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        prompt = advisor._build_prompt("What next?", SAMPLE_CONTEXT, history)
+    return (time.perf_counter() - start) / REPEATS * 1000, prompt
+
+
+def main():
+    modes = {
+        "unbounded": FinancialAdvisor(client=FakeClient(), history_token_budget=None),
+        "budgeted": FinancialAdvisor(client=FakeClient()),
+    }
+    print(f"{'turns':>6} {'mode':>10} {'chars':>9} {'~tokens':>8} {'build ms':>9}")
+    for turns in TURN_COUNTS:
+        history = make_history(turns)
+        for name, advisor in modes.items():
+            elapsed, prompt = measure(advisor, history)
+            print(f"{turns:>6} {name:>10} {len(prompt):>9,} {estimate_tokens(prompt):>8,} {elapsed:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
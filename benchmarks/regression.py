@@ -0,0 +1,268 @@
+"""Microbenchmarks of the per-turn CPU hot paths, gated against a stored baseline.
+
+Covers FinancialAdvisor._build_prompt, pdf_utils.sanitize_text and
+pdf_utils.generate_pdf on generated fixtures (short, long and plain ASCII
+answers, long goals, goals taller than a page, big histories). PDF cases start from an
+empty fragment cache, except the one measuring a cached re-render. For each
+case the suite records:
+- seconds per call: the median of --repeat timed rounds
+- peak bytes allocated during one call (tracemalloc)
+
+It fails (exit code 1) when either is worse than benchmarks/baseline.json by
+more than its threshold. A slowdown must also exceed --time-floor seconds per
+call, and a case that looks slower is timed a second time and only fails if
+it is slow again, so scheduler noise on tens-of-milliseconds cases does not
+fail the gate. Timings only compare on the machine that wrote the
+baseline, so refresh it there with --update-baseline after an intended
+change; each stored time is the median of BASELINE_RUNS measurements. Each
+case also writes a cProfile dump and a text summary to --profile-dir; open
+the .prof with snakeviz, or turn it into a flame graph with flameprof.
+
+Run from the repository root:
+    python -m benchmarks.regression [--case pdf] [--update-baseline] [--time-threshold 0.30]
+"""
+import argparse
+import cProfile
+import gc
+import json
+import os
+import platform
+import pstats
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import pdf_utils
+from cache import ResponseCache
+from core import FinancialAdvisor
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+PROFILE_DIR = ".cache/profiles"
+# Each timed round runs a case for at least this long, and each profile for about this long
+MIN_ROUND_SECONDS = 0.2
+# Slowdowns smaller than this per call are within timer and scheduling noise
+TIME_FLOOR_SECONDS = 0.005
+# --update-baseline stores the median of this many measurements of each case
+BASELINE_RUNS = 5
+PROFILE_SECONDS = 1.0
+
+CONTEXT = {"age": 34, "income": 6200.0, "expenses": "Medium", "goals": "Buy a home", "country": "United States"}
+
+_WORDS = (
+    "budget savings emergency fund retirement index invest mortgage rent groceries insurance debt credit "
+    "card interest rate monthly income expenses automate transfer account employer match tax refund"
+).split()
+# What model answers and typed goals actually contain beyond ASCII
+_UNICODE = ["café", "naïve", "—", "–", "“quoted”", "‘single’", "…", "€250", "₹40,000", "£1,200", "✅", "📈", "½", "™"]
+
+
+def _sentence(rng: random.Random, unicode_share: float = 0.0) -> str:
+    words = [rng.choice(_UNICODE) if rng.random() < unicode_share else rng.choice(_WORDS)
+             for _ in range(rng.randint(8, 20))]
+    amount = f"${rng.randrange(50, 20000, 50):,}"
+    return f"{' '.join(words).capitalize()} of {amount}."
+
+
+def make_answer(rng: random.Random, sections: int, unicode_share: float = 0.02) -> str:
+    """A model answer in the markdown the app renders: headings, lists, tables and bold amounts."""
+    parts = []
+    for section in range(sections):
+        parts.append(f"**{rng.choice(_WORDS).capitalize()} plan, step {section + 1}:**")
+        parts.append(" ".join(_sentence(rng, unicode_share) for _ in range(3)))
+        parts.extend(f"- **{rng.choice(_WORDS)}**: {_sentence(rng, unicode_share)}" for _ in range(3))
+        parts.extend(f"{item}. {_sentence(rng, unicode_share)}" for item in range(1, 3))
+        if section % 3 == 0:
+            parts.append("| Goal | Monthly | Years |\n|---|---:|---:|")
+            parts.extend(f"| {rng.choice(_WORDS)} | ${rng.randrange(50, 2000, 50)} | {rng.randint(1, 30)} |"
+                         for _ in range(4))
+        parts.append("")
+    return "\n".join(parts)
+
+
+def make_history(rng: random.Random, turns: int) -> List[Dict]:
+    history = []
+    for turn in range(turns):
+        if turn % 2:
+            history.append({"role": "assistant", "content": make_answer(rng, rng.randint(1, 4))})
+        else:
+            history.append({"role": "user", "content": _sentence(rng) + " What should I do?"})
+    return history
+
+
+def cold_pdf(user_context: Dict, insights: str) -> bytes:
+    pdf_utils.clear_fragment_cache()
+    return pdf_utils.generate_pdf(user_context, insights)
+
+
+def build_cases() -> Dict[str, Callable[[], object]]:
+    rng = random.Random(2024)
+    short_answer = make_answer(rng, 1)
+    long_answer = make_answer(rng, 40)
+    unicode_answer = make_answer(rng, 10, unicode_share=0.3)
+    long_goals = " ".join(_sentence(rng, 0.05) for _ in range(40))
+    long_goals_context = {**CONTEXT, "goals": long_goals}
+    small_history = make_history(rng, 10)
+    big_history = make_history(rng, 400)
+    # Goals long enough that their table row spans several pages
+    oversized_goals_context = {**CONTEXT, "goals": " ".join(_sentence(rng, 0.05) for _ in range(200))}
+    # Drawn with the core fonts, nothing embedded
+    ascii_answer = make_answer(rng, 10, unicode_share=0.0)
+
+    # Prefix memoization is part of the steady state being measured; router off so every call builds a prompt
+    budgeted = FinancialAdvisor(client=object(), router=None)
+    unbounded = FinancialAdvisor(client=object(), history_token_budget=None, router=None)
+    for advisor in (budgeted, unbounded):
+        advisor.cache = ResponseCache(path=None)
+    incomes = iter(range(10**9))
+
+    return {
+        "build_prompt/small_history": lambda: budgeted._build_prompt("What next?", CONTEXT, small_history),
+        "build_prompt/big_history": lambda: budgeted._build_prompt("What next?", CONTEXT, big_history),
+        "build_prompt/big_history_unbounded": lambda: unbounded._build_prompt("What next?", CONTEXT, big_history),
+        "build_prompt/long_goals": lambda: budgeted._build_prompt("What next?", long_goals_context, small_history),
+        # A profile seen for the first time: prefix and projections are built from scratch
+        "build_prompt/new_profile": lambda: budgeted._build_prompt(
+            "What next?", {**CONTEXT, "income": 3000.0 + next(incomes)}, small_history
+        ),
+        "sanitize_text/short": lambda: pdf_utils.sanitize_text(short_answer),
+        "sanitize_text/long": lambda: pdf_utils.sanitize_text(long_answer),
+        "sanitize_text/unicode_heavy": lambda: pdf_utils.sanitize_text(unicode_answer),
+        # A first render: tokenizing and wrapping run in full, nothing comes from the fragment cache
+        "generate_pdf/short": lambda: cold_pdf(CONTEXT, short_answer),
+        "generate_pdf/long": lambda: cold_pdf(CONTEXT, long_answer),
+        "generate_pdf/long_goals": lambda: cold_pdf(long_goals_context, unicode_answer),
+        "generate_pdf/oversized_goals": lambda: cold_pdf(oversized_goals_context, short_answer),
+        "generate_pdf/ascii": lambda: cold_pdf(CONTEXT, ascii_answer),
+        # A re-render of the same report, drawn from cached fragments
+        "generate_pdf/long_cached": lambda: pdf_utils.generate_pdf(CONTEXT, long_answer),
+    }
+
+
+def time_case(fn: Callable[[], object], repeat: int) -> float:
+    """Median seconds per call over repeat rounds, each long enough to be measurable."""
+    fn()  # warm caches, regexes and font metrics
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= MIN_ROUND_SECONDS or number >= 1 << 20:
+            break
+        number *= 2
+    rounds = []
+    gc.collect()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+    return statistics.median(rounds)
+
+
+def peak_bytes(fn: Callable[[], object]) -> int:
+    """Peak memory allocated while making one call."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def profile_case(name: str, fn: Callable[[], object], profile_dir: str, calls: int):
+    """Write <case>.prof and a cumulative-time summary <case>.txt."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for _ in range(calls):
+        fn()
+    profiler.disable()
+    base = os.path.join(profile_dir, name.replace("/", "__"))
+    profiler.dump_stats(base + ".prof")
+    with open(base + ".txt", "w") as f:
+        pstats.Stats(profiler, stream=f).strip_dirs().sort_stats("cumulative").print_stats(25)
+
+
+def compare(name: str, result: Dict, baseline: Dict, time_threshold: float, time_floor: float,
+            alloc_threshold: float) -> Tuple[str, bool]:
+    """Change against the baseline as text, and whether it is a regression."""
+    if name not in baseline:
+        return "new", False
+    slowdown = result["seconds"] - baseline[name]["seconds"]
+    time_change = slowdown / baseline[name]["seconds"]
+    alloc_change = result["peak_bytes"] / max(baseline[name]["peak_bytes"], 1) - 1
+    regressed = (time_change > time_threshold and slowdown > time_floor) or alloc_change > alloc_threshold
+    return f"{time_change:+6.0%} time {alloc_change:+6.0%} alloc", regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--case", default="", help="Only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--time-threshold", type=float, default=0.30, help="Allowed slowdown, 0.30 = 30%%")
+    parser.add_argument("--time-floor", type=float, default=TIME_FLOOR_SECONDS,
+                        help="Slowdowns per call below this many seconds are always allowed")
+    parser.add_argument("--alloc-threshold", type=float, default=0.10, help="Allowed growth of peak allocations")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--profile-dir", default=PROFILE_DIR, help="Where to write profiles ('' to skip)")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        baseline = stored["cases"]
+        if stored.get("unicode_font") != (pdf_utils.find_unicode_font() is not None):
+            print("warning: the baseline was recorded with a different PDF font setup, PDF cases will not compare")
+    if args.profile_dir:
+        os.makedirs(args.profile_dir, exist_ok=True)
+
+    results = {}
+    regressions = []
+    print(f"{'case':<36} {'per call':>11} {'peak alloc':>11}  vs baseline")
+    for name, fn in build_cases().items():
+        if args.case not in name:
+            continue
+        runs = BASELINE_RUNS if args.update_baseline else 1
+        seconds = statistics.median(time_case(fn, args.repeat) for _ in range(runs))
+        result = results[name] = {"seconds": seconds, "peak_bytes": peak_bytes(fn)}
+        change, regressed = compare(name, result, baseline, args.time_threshold, args.time_floor, args.alloc_threshold)
+        if regressed and not args.update_baseline:
+            # A busy stretch of the machine slows one measurement; a real regression slows both
+            result["seconds"] = min(result["seconds"], time_case(fn, args.repeat))
+            change, regressed = compare(
+                name, result, baseline, args.time_threshold, args.time_floor, args.alloc_threshold
+            )
+        seconds = result["seconds"]
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<36} {seconds * 1e6:>8.1f} us {result['peak_bytes'] / 1024:>7.0f} KiB  {change}"
+              + ("  REGRESSION" if regressed else ""))
+        if args.profile_dir:
+            profile_case(name, fn, args.profile_dir, calls=max(3, min(1000, int(PROFILE_SECONDS / seconds))))
+
+    if args.update_baseline:
+        merged = {**baseline, **results}
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "unicode_font": pdf_utils.find_unicode_font() is not None,
+                "cases": {name: merged[name] for name in sorted(merged)},
+            }, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+    if args.profile_dir:
+        print(f"profiles in {args.profile_dir}")
+    if regressions and not args.update_baseline:
+        print(f"{len(regressions)} regression(s) beyond {args.time_threshold:.0%} time / "
+              f"{args.alloc_threshold:.0%} allocations: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Report render time in a session that regenerates its reports after every turn.
+
+After each turn the session prepares the latest-answer report (generate_pdf)
+and exports the whole conversation (generate_session_pdf), once with
+per-message layout fragments reused across reports and once with every
+fragment laid out again (PDF_FRAGMENT_CACHE_SIZE=0).
+
+Run from the repository root:
+    python -m benchmarks.report_regen [--turns 40]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pdf_utils
+from benchmarks.regression import CONTEXT, make_answer, _sentence
+
+
+def make_session(turns: int):
+    rng = random.Random(11)
+    messages = []
+    for _ in range(turns):
+        messages.append({"role": "user", "content": _sentence(rng) + " What should I do?"})
+        messages.append({"role": "assistant", "content": make_answer(rng, rng.randint(2, 6))})
+    return messages
+
+
+def run(messages, path: str, cache_size: int):
+    """Seconds spent on the latest-answer report and on the full export, per turn."""
+    pdf_utils.PDF_FRAGMENT_CACHE_SIZE = cache_size
+    pdf_utils.clear_fragment_cache()
+    report_seconds, export_seconds = [], []
+    for end in range(2, len(messages) + 1, 2):
+        start = time.perf_counter()
+        pdf_utils.generate_pdf(CONTEXT, messages[end - 1]["content"])
+        report_seconds.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        pdf_utils.generate_session_pdf(CONTEXT, messages[:end], path)
+        export_seconds.append(time.perf_counter() - start)
+    return report_seconds, export_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    args = parser.parse_args()
+
+    messages = make_session(args.turns)
+    # Load font metrics before anything is timed
+    pdf_utils.generate_pdf(CONTEXT, messages[1]["content"])
+    print(f"unicode font: {pdf_utils.find_unicode_font() is not None}, {args.turns} turns")
+    print(f"{'fragments':>10} {'report ms':>10} {'export s':>9} {'last export ms':>15} {'total s':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.pdf")
+        for name, cache_size in (("laid out", 0), ("reused", pdf_utils.PDF_FRAGMENT_CACHE_SIZE)):
+            reports, exports = run(messages, path, cache_size)
+            print(f"{name:>10} {sum(reports) / len(reports) * 1000:>10.1f} {sum(exports):>9.2f} "
+                  f"{exports[-1] * 1000:>15.1f} {sum(reports) + sum(exports):>8.2f}")
+    print(f"fragment cache: {pdf_utils.fragment_stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Retrieval latency, index size and prompt size for long stored sessions.
+
+Fills a temporary session store with N turns spread over a set of topics,
+then compares the prompt built from every turn, from the token-budgeted
+history, and from retrieval (top-k relevant turns plus the latest ones).
+Precision is the share of retrieved turns that are about the asked topic,
+hit rate the share of questions with at least one such turn retrieved.
+
+Run from the repository root:
+    python -m benchmarks.retrieval [--sizes 100 1000 10000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from core import FinancialAdvisor
+from retrieval import RETRIEVAL_TOP_K, SessionIndex
+from session_store import SessionStore
+
+CONTEXT = {"age": 35, "income": 6000.0, "expenses": "Medium", "goals": "Buy a home", "country": "Canada"}
+TOPICS = [
+    "car loan refinancing", "mortgage pre-approval", "Roth IRA contributions", "credit card balance transfer",
+    "student loan forgiveness", "wedding budget", "daycare costs", "index fund fees", "crypto volatility",
+    "rental property taxes", "health savings account", "side business income", "vacation sinking fund",
+    "life insurance coverage", "home renovation costs", "pension rollover",
+]
+QUESTIONS = [
+    "Remind me what we said about my {topic}",
+    "Going back to the {topic}, what was the plan?",
+    "Can we revisit my {topic}?",
+    "Any update on how to handle the {topic}?",
+    "I forgot your advice on the {topic}",
+    "Tell me again about the {topic}",
+    "Did you suggest anything for the {topic}?",
+    "Where did we land on the {topic}?",
+]
+FILLER = (
+    "Keep your needs near 50% of income and automate savings before discretionary spending. "
+    "Review the plan every quarter and adjust as your situation changes."
+)
+
+
+def make_turn(rng: random.Random, turn: int):
+    topic = rng.choice(TOPICS)
+    if turn % 2:
+        return topic, "user", f"Question {turn}: what should I do about my {topic}?"
+    return topic, "assistant", f"About your {topic}: {FILLER} For the {topic} specifically, compare options first."
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    unbounded = FinancialAdvisor(client=object(), history_token_budget=None)
+    budgeted = FinancialAdvisor(client=object())
+    print(f"{'turns':>6} {'build':>9} {'add':>8} {'query p50':>10} {'p95':>8} {'index':>9} "
+          f"{'precision':>9} {'hit rate':>8} {'all turns':>10} {'budgeted':>9} {'retrieval':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, "sessions.sqlite"))
+        for size in args.sizes:
+            rng = random.Random(size)
+            session_id = store.create_session("bench-user", f"{size} turns")
+            topics = []
+            for turn in range(size):
+                topic, role, content = make_turn(rng, turn)
+                topics.append(topic)
+                store.append_message(session_id, role, content)
+
+            session_index = SessionIndex(store, session_id)
+            start = time.perf_counter()
+            session_index.sync()
+            build = time.perf_counter() - start
+
+            timings = []
+            hits = retrieved_total = answered = 0
+            history = []
+            for query in range(args.queries):
+                topic = TOPICS[query % len(TOPICS)]
+                question = rng.choice(QUESTIONS).format(topic=topic)
+                seq = store.append_message(session_id, "user", question)
+                topics.append(topic)
+                start = time.perf_counter()
+                history = session_index.relevant_history(question)
+                timings.append(time.perf_counter() - start)
+                retrieved = [m for m in history if m.get("retrieved")]
+                on_topic = sum(topics[m["seq"]] == topic for m in retrieved)
+                hits += on_topic
+                answered += on_topic > 0
+                retrieved_total += len(retrieved)
+            # Appending to the index directly; the session index is not used after this
+            start = time.perf_counter()
+            for _ in range(100):
+                session_index.index.add(FILLER)
+            add_us = (time.perf_counter() - start) / 100 * 1e6
+
+            everything = list(store.iter_messages(session_id, start=0))[:seq + 1]
+            question = everything[-1]["content"]
+            sizes = [
+                len(unbounded._build_prompt(question, CONTEXT, everything)),
+                len(budgeted._build_prompt(question, CONTEXT, everything)),
+                len(budgeted._build_prompt(question, CONTEXT, history)),
+            ]
+            timings.sort()
+            print(f"{size:>6} {build * 1000:>6.0f} ms {add_us:>5.0f} us {timings[len(timings) // 2] * 1000:>7.2f} ms "
+                  f"{timings[int(len(timings) * 0.95)] * 1000:>5.2f} ms {session_index.index.nbytes / 2**20:>5.2f} MiB "
+                  f"{hits / max(retrieved_total, 1):>9.0%} {answered / args.queries:>8.0%} "
+                  + " ".join(f"{chars / 1000:>7.0f}k" for chars in sizes))
+    print(f"(prompt sizes in characters; retrieval uses top-{RETRIEVAL_TOP_K} plus the latest turns)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Queue wait, shedding and hedging of the model scheduler under a burst of mixed traffic.
+
+Starts chat, insights and batch callers at once against a FakeClient whose
+calls take --latency seconds, through a scheduler allowing --rpm requests per
+minute and --concurrency calls in flight. A slice of the primary calls is
+made slow (--slow-share) to show hedging to the fallback model.
+
+Run from the repository root:
+    python -m benchmarks.scheduler [--callers 60] [--rpm 600]
+"""
+import argparse
+import random
+import threading
+import time
+from collections import defaultdict
+
+from backends import GeminiBackend
+from cache import ResponseCache
+from core import BUSY_MESSAGE, FinancialAdvisor
+from fake_genai import FakeClient
+from metrics import REGISTRY
+from scheduler import DEGRADED_NOTE, ModelScheduler
+
+CONTEXT = {"age": 41, "income": 7000.0, "expenses": "High", "goals": "Pay for college", "country": "Canada"}
+MIX = ["chat"] * 3 + ["insights"] * 2 + ["batch"] * 5
+
+
+class SlowSometimes(FakeClient):
+    """FakeClient whose calls occasionally take much longer than latency."""
+
+    def __init__(self, slow_share: float, slow_latency: float, **kwargs):
+        super().__init__(**kwargs)
+        self.slow_share = slow_share
+        self.slow_latency = slow_latency
+
+    def _next_call(self) -> float:
+        delay = super()._next_call()
+        return self.slow_latency if self._random.random() < self.slow_share else delay
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--slow-share", type=float, default=0.1)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=40)
+    parser.add_argument("--hedge-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    client = SlowSometimes(args.slow_share, 10 * args.latency, latency=args.latency, jitter=False, seed=1)
+    scheduler = ModelScheduler(rpm=args.rpm, burst=args.concurrency, max_concurrency=args.concurrency,
+                               max_queue=args.max_queue, hedge_after=args.hedge_after)
+    fallback = GeminiBackend(client=FakeClient(latency=args.latency / 2, jitter=False), model="fallback")
+    advisor = FinancialAdvisor(client=client, scheduler=scheduler, fallback=fallback, router=None)
+    advisor.cache = ResponseCache(path=None)
+    # Build the shared prompt prefix once, so the burst measures the scheduler rather than the GIL
+    advisor._build_prompt("warm-up", CONTEXT)
+    REGISTRY.reset()
+
+    rng = random.Random(7)
+    results = defaultdict(list)
+    lock = threading.Lock()
+
+    def call(index: int, priority: str):
+        start = time.perf_counter()
+        answer = advisor.get_response(f"Question {index}: how should I plan?", CONTEXT, priority=priority)
+        outcome = "shed" if answer == BUSY_MESSAGE else "fallback" if answer.startswith(DEGRADED_NOTE) else "ok"
+        with lock:
+            results[priority].append((time.perf_counter() - start, outcome))
+
+    threads = [threading.Thread(target=call, args=(index, rng.choice(MIX))) for index in range(args.callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.callers} callers in {elapsed:.1f}s, {client.calls} primary calls, "
+          f"{fallback.client.calls} fallback calls")
+    print(f"{'priority':<9} {'n':>4} {'p50 s':>7} {'p95 s':>7} {'ok':>4} {'fallback':>8} {'shed':>5}")
+    for priority in ("chat", "insights", "batch"):
+        rows = sorted(results[priority])
+        if not rows:
+            continue
+        outcomes = [outcome for _, outcome in rows]
+        print(f"{priority:<9} {len(rows):>4} {rows[len(rows) // 2][0]:>7.2f} {rows[int(len(rows) * 0.95)][0]:>7.2f} "
+              f"{outcomes.count('ok'):>4} {outcomes.count('fallback'):>8} {outcomes.count('shed'):>5}")
+    print()
+    for row in REGISTRY.span_summary():
+        if row["span"].startswith("queue_wait_"):
+            print(f"{row['span']:<20} p50 <={row['p50_ms']:g} ms  p95 <={row['p95_ms']:g} ms")
+    for series, value in REGISTRY.counters().items():
+        if series.startswith("advisor_scheduler_total"):
+            print(f"{series} {value:g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Peak Python memory of full-session PDF export as the number of turns grows.
+
+Compares the streaming generate_session_pdf against building the same
+document in memory with the regular PDF class.
+
+Run from the repository root:
+    python -m benchmarks.session_export
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pdf_utils
+
+SAMPLE_CONTEXT = {
+    "age": 32,
+    "income": 5000.0,
+    "expenses": "Medium",
+    "goals": "Buy a house in 5 years",
+    "country": "United States",
+}
+TURN_COUNTS = [50, 200, 800, 3200]
+ANSWER = (
+    "**Summary**\n"
+    "Keep needs at 50% of income and route 20% to savings every month.\n"
+    "- Build a 6-month emergency fund\n"
+    "- Max out employer retirement matching\n"
+    "1. Recommendations:\n"
+    "Review subscriptions and insurance premiums once a quarter.\n"
+) * 3
+
+
+def iter_messages(turns: int):
+    """Generate a session lazily so the fixture itself takes no memory."""
+    for i in range(turns):
+        if i % 2:
+            yield {"role": "user", "content": f"What should I do about goal {i}?"}
+        else:
+            yield {"role": "assistant", "content": ANSWER}
+
+
+def export_in_memory(turns: int, path: str):
+    """The pre-streaming approach: lay out everything in FPDF's buffers, then write."""
+    pdf = pdf_utils.PDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf_utils._render_profile(pdf, SAMPLE_CONTEXT)
+    for message in iter_messages(turns):
+        pdf_utils._render_insights(pdf, message["content"])
+    with open(path, "wb") as f:
+        f.write(pdf.output(dest="S").encode("latin-1"))
+
+
+def measure(export, turns: int, path: str):
+    """Peak traced memory in MiB and wall time of one export."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    export(turns, path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, elapsed
+
+
+def main():
+    exports = {
+        "streaming": lambda turns, path: pdf_utils.generate_session_pdf(SAMPLE_CONTEXT, iter_messages(turns), path),
+        "in-memory": export_in_memory,
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.pdf")
+        print(f"{'turns':>6} {'mode':>10} {'peak MiB':>9} {'seconds':>8} {'file KiB':>9}")
+        for turns in TURN_COUNTS:
+            for name, export in exports.items():
+                peak, elapsed = measure(export, turns, path)
+                size = os.path.getsize(path) / 1024
+                print(f"{turns:>6} {name:>10} {peak:>9.2f} {elapsed:>8.2f} {size:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Memory held per user: in-memory chat_sessions dict versus the SQLite session store.
+
+Builds one user with 1,000 sessions of 200 turns each, then compares what the
+app keeps resident in each model: every message of every session, versus the
+session index plus the latest page of the open session.
+
+Run from the repository root:
+    python -m benchmarks.session_store [--sessions 1000 --turns 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from session_store import SessionStore
+
+ANSWER = (
+    "Based on your income, keep needs at 50% and savings at 20%. "
+    "Build a 6-month emergency fund before investing in index funds.\n"
+) * 4
+
+
+def make_message(turn: int):
+    if turn % 2:
+        return "user", f"What should I do about my budget, question {turn}?"
+    return "assistant", ANSWER
+
+
+def resident_bytes(build) -> int:
+    """Bytes still allocated by the object build() returns."""
+    tracemalloc.start()
+    held = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, "sessions.sqlite"))
+        start = time.perf_counter()
+        for index in range(args.sessions):
+            session_id = store.create_session("bench-user", f"Chat {index + 1}")
+            for turn in range(args.turns):
+                store.append_message(session_id, *make_message(turn))
+        populate = time.perf_counter() - start
+        db_size = os.path.getsize(store.path) / 2**20
+        print(f"populated {args.sessions} x {args.turns} turns in {populate:.1f}s, db {db_size:.1f} MiB")
+
+        def in_memory():
+            # The previous st.session_state.chat_sessions layout
+            return {
+                f"Chat {index + 1}": [
+                    dict(zip(("role", "content"), make_message(turn))) for turn in range(args.turns)
+                ]
+                for index in range(args.sessions)
+            }
+
+        def from_store():
+            sessions = store.list_sessions("bench-user")
+            return sessions, store.load_messages(sessions[-1]["id"])
+
+        print(f"in-memory dict resident:   {resident_bytes(in_memory) / 2**20:8.2f} MiB per user")
+        print(f"session store resident:    {resident_bytes(from_store) / 2**20:8.2f} MiB per user")
+
+        start = time.perf_counter()
+        sessions = store.list_sessions("bench-user")
+        list_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        store.load_messages(sessions[len(sessions) // 2]["id"])
+        page_ms = (time.perf_counter() - start) * 1000
+        print(f"list {len(sessions)} sessions: {list_ms:.2f} ms, load one page: {page_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
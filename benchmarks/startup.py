@@ -0,0 +1,68 @@
+"""Cold-start benchmark: module import time and time to first render of app.py.
+
+Each measurement runs in a fresh interpreter so nothing is already imported.
+Exits non-zero when a median exceeds its budget, so it can guard CI.
+
+Run from the repository root:
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+RENDER_SNIPPET = """
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=60)
+at.run()
+assert not at.exception, at.exception
+print(time.perf_counter() - start)
+"""
+
+# Budgets in milliseconds; heavy backends (torch, google.genai) must stay out of these paths
+DEFAULT_BUDGETS = {"import core": 250, "import app": 1500, "first render": 4000}
+
+
+def run_snippet(snippet: str) -> float:
+    """Run snippet in a fresh interpreter and return the seconds it printed."""
+    output = subprocess.run(
+        [sys.executable, "-c", snippet], capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--no-render", action="store_true", help="Skip the AppTest first-render measurement")
+    args = parser.parse_args()
+
+    cases = {
+        "import core": IMPORT_SNIPPET.format(module="core"),
+        "import app": IMPORT_SNIPPET.format(module="app"),
+    }
+    if not args.no_render:
+        cases["first render"] = RENDER_SNIPPET
+
+    failed = False
+    for name, snippet in cases.items():
+        median_ms = statistics.median(run_snippet(snippet) for _ in range(args.runs)) * 1000
+        budget = DEFAULT_BUDGETS[name]
+        status = "ok" if median_ms <= budget else "REGRESSION"
+        failed |= median_ms > budget
+        print(f"{name:<13} median {median_ms:8.1f} ms (budget {budget} ms) {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compare time-to-first-token of the streaming path against the blocking path.
+
+Run from the repository root (requires GEMINI_API_KEY):
+    python -m benchmarks.ttft --runs 5
+"""
+import argparse
+import statistics
+import time
+
+from cache import ResponseCache
+from core import FinancialAdvisor
+
+SAMPLE_CONTEXT = {
+    "age": 32,
+    "income": 5000.0,
+    "expenses": "Medium",
+    "goals": "Buy a house in 5 years",
+    "country": "United States",
+}
+SAMPLE_QUESTION = "Provide initial financial insights based on the user's profile."
+
+
+def time_blocking(advisor: FinancialAdvisor) -> float:
+    """Seconds until the blocking call returns, i.e. until the user sees anything."""
+    start = time.perf_counter()
+    advisor.get_response(SAMPLE_QUESTION, SAMPLE_CONTEXT)
+    return time.perf_counter() - start
+
+
+def time_streaming(advisor: FinancialAdvisor):
+    """Seconds until the first chunk and until the stream is exhausted."""
+    start = time.perf_counter()
+    first_token = None
+    for _ in advisor.get_response_stream(SAMPLE_QUESTION, SAMPLE_CONTEXT):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return first_token if first_token is not None else total, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Requests per path")
+    args = parser.parse_args()
+
+    advisor = FinancialAdvisor()
+    # Every run must reach the model, not the response cache
+    advisor.cache = ResponseCache(path=None, max_entries=0)
+    blocking = [time_blocking(advisor) for _ in range(args.runs)]
+    streaming = [time_streaming(advisor) for _ in range(args.runs)]
+
+    print(f"blocking  first visible text: median {statistics.median(blocking):.3f}s")
+    print(f"streaming first token:        median {statistics.median(t for t, _ in streaming):.3f}s")
+    print(f"streaming full response:      median {statistics.median(t for _, t in streaming):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
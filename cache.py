@@ -0,0 +1,135 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from sqlite_utils import connect
+
+# Default location of the on-disk cache tier (kept across Streamlit restarts)
+CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite")
+# Most responses kept on disk; the ones closest to expiry are evicted first
+CACHE_MAX_ROWS = int(os.getenv("RESPONSE_CACHE_MAX_ROWS", 20000))
+# Writes between sweeps of the disk tier for expired rows and for rows over CACHE_MAX_ROWS
+PRUNE_EVERY = 200
+
+
+def make_cache_key(prompt: str, model: str) -> str:
+    """Hash a prompt and model name into a cache key, ignoring whitespace-only differences."""
+    normalized = re.sub(r"\s+", " ", prompt).strip()
+    return hashlib.sha256(f"{model}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier LLM response cache: an in-memory LRU in front of a SQLite file.
+
+    Every entry carries an expiry time; expired entries are treated as misses
+    and dropped from both tiers when they are next looked up. The disk tier
+    is also swept every PRUNE_EVERY writes (and when opened): expired rows
+    are deleted, then the oldest rows beyond max_rows.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 24 * 3600, path: Optional[str] = CACHE_PATH,
+                 max_rows: int = CACHE_MAX_ROWS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self._writes = 0
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._db = None
+        if path:
+            # Every service worker writes to the same file
+            self._db = connect(path, wal=True)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+            self._prune(time.time())
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, expires_at = row
+                    if expires_at > now:
+                        self._remember(key, value, expires_at)
+                        self.stats["hits"] += 1
+                        self.stats["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str):
+        """Store value under key in both tiers."""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune(time.time())
+                self._db.commit()
+
+    def _prune(self, now: float):
+        """Delete expired rows, then the rows closest to expiry beyond max_rows (caller commits)."""
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        excess = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_rows
+        if excess > 0:
+            # Every row gets the same TTL, so the soonest to expire are the oldest writes
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY expires_at LIMIT ?)",
+                (excess,)
+            )
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        """Insert into the in-memory tier, evicting the least recently used entries."""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry from both tiers and reset the statistics."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+            self.stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return hit/miss counters plus the overall hit rate."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._memory),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            }
@@ -1,44 +1,100 @@
+import asyncio
+import json
+import logging
 import os
-import requests
-from transformers import pipeline, AutoModelForCausalLM, AutoTokenizer
+import random
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
-from google import genai
-from typing import Dict, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
+from backends import GeminiBackend, ModelBackend, create_backend, create_fallback_backend
+from cache import ResponseCache, make_cache_key
+from intent_router import ANSWER_TEMPLATES, IntentRouter
+from metrics import REGISTRY as metrics
+from projections import budget_allocation, format_projection, project
+from prompt_utils import format_turn, select_history
+from scheduler import DEGRADED_NOTE, ModelScheduler, Overloaded, SchedulerError, StreamInterrupted, get_model_scheduler
+from singleflight import SingleFlight
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Define the model directory
-MODEL_DIR = "models/gpt2"
-
-def load_local_model():
-    if not os.path.exists(MODEL_DIR):
-        os.makedirs(MODEL_DIR, exist_ok=True)
-        model = AutoModelForCausalLM.from_pretrained("gpt2")
-        tokenizer = AutoTokenizer.from_pretrained("gpt2")
-        model.save_pretrained(MODEL_DIR)
-        tokenizer.save_pretrained(MODEL_DIR)
-    else:
-        model = AutoModelForCausalLM.from_pretrained(MODEL_DIR)
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_DIR)
-    
-    return pipeline(
-        "text-generation",
-        model=model,
-        tokenizer=tokenizer,
-        max_length=100,
-        truncation=True,
-        do_sample=True,
-        temperature=0.7
-    )
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying: timeouts, rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Shown instead of an answer when the scheduler sheds a request under load
+BUSY_MESSAGE = "The advisor is handling a lot of requests right now. Please ask again in a moment."
+
+# Set ADVISOR_ROUTER=0 to send every question to the model
+ROUTER_ENABLED = os.getenv("ADVISOR_ROUTER", "1") != "0"
+
+# Number of distinct user contexts whose prompt prefix is kept memoized
+PREFIX_CACHE_SIZE = 256
+
+# Process-wide advisor, created on first use by get_financial_advisor()
+_financial_advisor = None
+_financial_advisor_lock = threading.Lock()
+
+# Pass as FinancialAdvisor(fallback=NO_FALLBACK) to never hedge with a backup model
+NO_FALLBACK = object()
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether a failed model call is worth retrying."""
+    from google.genai import errors as genai_errors
+
+    if isinstance(error, genai_errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError, Overloaded))
 
 class FinancialAdvisor:
-    def __init__(self):
-        load_dotenv()
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        self.client = genai.Client(api_key=self.api_key)
-        self.model = "gemini-2.0-flash"
+    def __init__(self, client=None, backend: Optional[ModelBackend] = None, max_concurrency: int = 8,
+                 max_retries: int = 4, backoff_base: float = 0.5, history_token_budget: Optional[int] = 3000,
+                 summary_token_budget: int = 500, router: Optional[IntentRouter] = None,
+                 scheduler: Optional[ModelScheduler] = None, fallback: Optional[ModelBackend] = None):
+        # Where prompts are sent: Gemini by default (one pooled client serves the sync and
+        # async paths alike) or the offline local model, see backends.create_backend
+        self.backend = backend if backend is not None else create_backend(client=client)
+        # Every model call is admitted by the process-wide scheduler, which may hedge it with the fallback
+        self.scheduler = scheduler if scheduler is not None else get_model_scheduler()
+        # None builds the default fallback for the backend, NO_FALLBACK disables it
+        if fallback is NO_FALLBACK:
+            self.fallback = None
+        else:
+            self.fallback = fallback if fallback is not None else create_fallback_backend(self.backend)
+        self.cache = ResponseCache()
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        # None keeps the whole chat history verbatim; otherwise older turns collapse into a summary
+        self.history_token_budget = history_token_budget
+        self.summary_token_budget = summary_token_budget
+        # Answers routine questions from the profile without a model call (None: always call the model)
+        self.router = router if router is not None else (IntentRouter() if ROUTER_ENABLED else None)
+        # Identical prompts arriving while one is being answered share that model call
+        self._flights = SingleFlight()
+        self._prefix_cache: "OrderedDict[str, str]" = OrderedDict()
+        self._prefix_lock = threading.Lock()
         
+    @property
+    def model(self) -> str:
+        """Name of the model answering prompts; part of every cache key."""
+        return self.backend.model
+
+    @property
+    def client(self):
+        """The genai.Client of the Gemini backend (and of a Gemini fallback)."""
+        return self.backend.client
+
+    @client.setter
+    def client(self, client):
+        self.backend.client = client
+        # A Gemini fallback shares the primary's client, see backends.create_fallback_backend
+        if isinstance(self.fallback, GeminiBackend):
+            self.fallback.client = client
+
     def _get_system_prompt(self) -> str:
         """Returns the system prompt defining the financial advisor's role and capabilities."""
         return """You are an experienced financial advisor with expertise in:
@@ -60,11 +116,8 @@ class FinancialAdvisor:
 
     def _calculate_budget_allocation(self, monthly_income: float) -> Dict[str, float]:
         """Calculate budget allocations based on the 50/30/20 rule."""
-        return {
-            'needs': monthly_income * 0.5,
-            'wants': monthly_income * 0.3,
-            'savings': monthly_income * 0.2
-        }
+        # Shared with the projections, so the budget and the projected savings agree
+        return budget_allocation(monthly_income)
 
     def _format_budget_categories(self, budget: Dict[str, float]) -> str:
         """Format budget categories with specific examples."""
@@ -103,18 +156,13 @@ class FinancialAdvisor:
         - Country: {context.get('country', 'Not specified')}
         """
 
-    def _build_prompt(self, user_input: str, context: Optional[Dict] = None, chat_history=None) -> str:
-        """Build the complete prompt including system prompt, context, chat history, and user input."""
-        system_prompt = self._get_system_prompt()
-        
-        if not context:
-            return f"{system_prompt}\n\nQuestion: {user_input}"
-        
+    def _build_prefix(self, context: Dict) -> str:
+        """Build the static part of the prompt (system prompt, profile and budget) for a user context."""
         monthly_income = float(context.get('income', 0))
         budget = self._calculate_budget_allocation(monthly_income)
-        
-        prompt = f"""
-        {system_prompt}
+
+        prefix = f"""
+        {self._get_system_prompt()}
 
         {self._format_user_profile(context)}
 
@@ -122,44 +170,278 @@ class FinancialAdvisor:
         {self._format_budget_categories(budget)}
         """
 
+        # Computed locally so the model quotes consistent figures instead of estimating them
+        projection = project(context)
+        if projection:
+            prefix += (
+                f"\nMonte Carlo Projections ({projection['paths']:,} market and inflation scenarios, "
+                f"in today's dollars; quote these figures rather than estimating growth):\n"
+                f"{format_projection(projection)}\n"
+            )
+        return prefix
+
+    def _get_prefix(self, context: Dict) -> str:
+        """Return the static prompt prefix for a user context, building it only once per distinct context."""
+        key = json.dumps(context, sort_keys=True, default=str)
+        with self._prefix_lock:
+            prefix = self._prefix_cache.get(key)
+            if prefix is not None:
+                self._prefix_cache.move_to_end(key)
+                return prefix
+        prefix = self._build_prefix(context)
+        with self._prefix_lock:
+            self._prefix_cache[key] = prefix
+            while len(self._prefix_cache) > PREFIX_CACHE_SIZE:
+                self._prefix_cache.popitem(last=False)
+        return prefix
+
+    def _build_prompt(self, user_input: str, context: Optional[Dict] = None, chat_history=None) -> str:
+        """Build the complete prompt including system prompt, context, chat history, and user input."""
+        if not context:
+            return f"{self._get_system_prompt()}\n\nQuestion: {user_input}"
+
+        parts = [self._get_prefix(context)]
+
         # Add chat history if available
         if chat_history and len(chat_history) > 1:
-            prompt += "\nPrevious Conversation:\n"
-            for message in chat_history[:-1]:  # Exclude the current message
-                role = "User" if message["role"] == "user" else "Assistant"
-                prompt += f"{role}: {message['content']}\n"
+            previous = chat_history[:-1]  # Exclude the current message
+            # Older turns picked for their relevance (see retrieval.relevant_history) get their own section
+            relevant = [m for m in previous if m.get("retrieved")]
+            if relevant:
+                parts.append("\nRelevant Earlier Conversation:\n")
+                parts.extend(format_turn(m["role"], m["content"])[0] for m in relevant)
+                previous = [m for m in previous if not m.get("retrieved")]
+            if self.history_token_budget is None:
+                recent = [format_turn(m["role"], m["content"])[0] for m in previous]
+            else:
+                summary, recent = select_history(previous, self.history_token_budget, self.summary_token_budget)
+                if summary:
+                    parts.append("\nSummary of Earlier Conversation:\n")
+                    parts.extend(summary)
+            parts.append("\nPrevious Conversation:\n")
+            parts.extend(recent)
 
-        prompt += f"\nCurrent Question: {user_input}\n"
-        prompt += """
+        parts.append(f"\nCurrent Question: {user_input}\n")
+        parts.append("""
         Please provide specific financial advice considering the user's profile, budget breakdown, and previous conversation context. Include:
         1. Specific recommendations for their situation
         2. Dollar amounts and percentages where relevant
         3. Action items they can implement immediately
         4. Long-term financial planning suggestions
         5. Any relevant warnings or areas of concern
+        """)
+
+        return "".join(parts)
+
+    def _cache_get(self, cache_key: str) -> Optional[str]:
+        """Cached response for cache_key; a cache that fails (e.g. its database is locked) counts as a miss."""
+        try:
+            return self.cache.get(cache_key)
+        except Exception as e:
+            metrics.count_error("cache_lookup", e)
+            logger.warning("Response cache lookup failed: %s", e)
+            return None
+
+    def _cache_set(self, cache_key: str, response: str):
+        """Cache a response; failing to store it must not cost the caller the answer itself."""
+        try:
+            self.cache.set(cache_key, response)
+        except Exception as e:
+            metrics.count_error("cache_store", e)
+            logger.warning("Response cache write failed: %s", e)
+
+    def _route(self, user_input: str, context: Optional[Dict]) -> Optional[str]:
+        """Templated answer for a routine question about the profile, or None if the model should answer."""
+        if self.router is None or not context:
+            return None
+        with metrics.span("intent_route"):
+            intent = self.router.route(user_input)
+            if intent is None:
+                return None
+            budget = self._calculate_budget_allocation(float(context.get('income', 0)))
+            answer = ANSWER_TEMPLATES[intent](context, budget, self._format_budget_categories(budget))
+        metrics.inc("advisor_responses_total", outcome="routed")
+        return answer
+
+    def get_response(self, user_input: str, context: Optional[Dict] = None, chat_history=None,
+                     priority: str = "chat") -> str:
+        """Generate a response using the configured model backend.
+
+        priority is the scheduler queue the model call waits in ("chat", "insights" or "batch").
         """
-        
-        return prompt
+        try:
+            routed = self._route(user_input, context)
+            if routed is not None:
+                return routed
+            with metrics.span("prompt_build"):
+                prompt = self._build_prompt(user_input, context, chat_history)
+            with metrics.span("cache_lookup"):
+                cache_key = make_cache_key(prompt, self.model)
+                cached = self._cache_get(cache_key)
+            if cached is not None:
+                metrics.inc("advisor_responses_total", outcome="cached")
+                return cached
+
+            with metrics.span("model_call"):
+                response = self._flights.call(
+                    cache_key, lambda: self.scheduler.generate(self.backend, prompt, priority, self.fallback)
+                )
+            metrics.observe_size("model", len(response or ""))
 
-    def get_response(self, user_input: str, context: Optional[Dict] = None, chat_history=None) -> str:
-        """Generate a response using the Gemini model."""
+            # Only successful answers reach this point, error strings and fallback answers are never cached
+            if response and not response.startswith(DEGRADED_NOTE):
+                self._cache_set(cache_key, response)
+            metrics.inc("advisor_responses_total", outcome="ok")
+            return response
+        except SchedulerError:
+            metrics.inc("advisor_responses_total", outcome="shed")
+            return BUSY_MESSAGE
+        except Exception as e:
+            # The caller only sees a string, so the counters are the place failures show up
+            metrics.inc("advisor_responses_total", outcome="error")
+            return f"Error generating response: {str(e)}"
+
+    def get_response_stream(self, user_input: str, context: Optional[Dict] = None, chat_history=None,
+                            priority: str = "chat") -> Iterator[str]:
+        """Generate a response using the configured model backend, yielding text chunks as they arrive.
+
+        Failures before the first chunk are yielded as text like in get_response;
+        once part of the answer is out they raise StreamInterrupted instead.
+        """
+        chunks = []
         try:
-            prompt = self._build_prompt(user_input, context, chat_history)
+            routed = self._route(user_input, context)
+            if routed is not None:
+                yield routed
+                return
+            with metrics.span("prompt_build"):
+                prompt = self._build_prompt(user_input, context, chat_history)
+            with metrics.span("cache_lookup"):
+                cache_key = make_cache_key(prompt, self.model)
+                cached = self._cache_get(cache_key)
+            if cached is not None:
+                metrics.inc("advisor_responses_total", outcome="cached")
+                yield cached
+                return
 
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt
+            start = time.perf_counter()
+            stream = self._flights.stream(
+                cache_key, lambda: self.scheduler.generate_stream(self.backend, prompt, priority, self.fallback)
             )
-            
-            return response.text
+            for chunk in stream:
+                if not chunks:
+                    metrics.observe_seconds("model_first_chunk", time.perf_counter() - start)
+                chunks.append(chunk)
+                yield chunk
+            # Includes the time the consumer spent between chunks, i.e. rendering them
+            metrics.observe_seconds("model_stream", time.perf_counter() - start)
+            response = "".join(chunks)
+            metrics.observe_size("model", len(response))
+
+            # Cache only once the stream has completed without errors, and never a fallback answer
+            if chunks and not response.startswith(DEGRADED_NOTE):
+                self._cache_set(cache_key, response)
+            metrics.inc("advisor_responses_total", outcome="ok")
+        except SchedulerError:
+            metrics.inc("advisor_responses_total", outcome="shed")
+            yield BUSY_MESSAGE
+        except Exception as e:
+            metrics.count_error("model_stream", e)
+            metrics.inc("advisor_responses_total", outcome="error")
+            if chunks:
+                # Appending the error would make it read as part of the answer
+                if isinstance(e, StreamInterrupted):
+                    raise
+                raise StreamInterrupted(f"The answer stopped: {e}") from e
+            yield f"Error generating response: {str(e)}"
+
+    async def _generate_async(self, prompt: str, priority: str = "batch") -> str:
+        """Call the model backend asynchronously, retrying retryable errors with jittered exponential backoff."""
+        cache_key = make_cache_key(prompt, self.model)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            metrics.inc("advisor_responses_total", outcome="cached")
+            return cached
+
+        attempt = 0
+        while True:
+            try:
+                with metrics.span("model_call"):
+                    response = await self.scheduler.generate_async(self.backend, prompt, priority)
+                break
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries or not _is_retryable(e):
+                    raise
+                metrics.inc("advisor_retries_total")
+                # "Full jitter": sleep anywhere between 0 and the exponential cap
+                await asyncio.sleep(random.uniform(0, self.backoff_base * 2 ** (attempt - 1)))
+
+        metrics.observe_size("model", len(response or ""))
+        if response:
+            self._cache_set(cache_key, response)
+        metrics.inc("advisor_responses_total", outcome="ok")
+        return response
+
+    async def get_response_async(self, user_input: str, context: Optional[Dict] = None, chat_history=None,
+                                 priority: str = "chat") -> str:
+        """Async variant of get_response."""
+        try:
+            routed = self._route(user_input, context)
+            if routed is not None:
+                return routed
+            with metrics.span("prompt_build"):
+                prompt = self._build_prompt(user_input, context, chat_history)
+            return await self._generate_async(prompt, priority)
+        except SchedulerError:
+            metrics.inc("advisor_responses_total", outcome="shed")
+            return BUSY_MESSAGE
         except Exception as e:
+            metrics.inc("advisor_responses_total", outcome="error")
             return f"Error generating response: {str(e)}"
 
-# Initialize the financial advisor
-financial_advisor = FinancialAdvisor()
+    async def get_responses_batch(self, batch: Iterable[Dict], max_concurrency: Optional[int] = None) -> List[Dict]:
+        """Answer many requests concurrently.
 
-def call_gemini_api(user_input: str, context: Optional[Dict] = None, chat_history=None) -> str:
+        Each batch item is a dict with a "user_input" key and optional "context"
+        and "chat_history" keys. Results are returned in input order as dicts
+        with "status" ("ok" or "error"), "response" and "error".
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def run(request: Dict) -> Dict:
+            async with semaphore:
+                try:
+                    prompt = self._build_prompt(
+                        request["user_input"], request.get("context"), request.get("chat_history")
+                    )
+                    return {"status": "ok", "response": await self._generate_async(prompt), "error": None}
+                except Exception as e:
+                    metrics.inc("advisor_responses_total", outcome="error")
+                    return {"status": "error", "response": None, "error": str(e)}
+
+        return await asyncio.gather(*(run(request) for request in batch))
+
+def get_financial_advisor() -> FinancialAdvisor:
+    """Return the process-wide FinancialAdvisor shared by all sessions, creating it on first call."""
+    global _financial_advisor
+    if _financial_advisor is None:
+        with _financial_advisor_lock:
+            if _financial_advisor is None:
+                _financial_advisor = FinancialAdvisor()
+    return _financial_advisor
+
+def call_gemini_api(user_input: str, context: Optional[Dict] = None, chat_history=None, priority: str = "chat") -> str:
     """Main function to call the Gemini API with financial context and chat history."""
-    return financial_advisor.get_response(user_input, context, chat_history)
+    return get_financial_advisor().get_response(user_input, context, chat_history, priority)
+
+def get_cache_stats() -> Dict[str, float]:
+    """Hit/miss statistics of the shared response cache."""
+    return get_financial_advisor().cache.get_stats()
+
+def call_gemini_api_stream(user_input: str, context: Optional[Dict] = None, chat_history=None,
+                           priority: str = "chat") -> Iterator[str]:
+    """Streaming variant of call_gemini_api that yields response chunks as they are generated."""
+    return get_financial_advisor().get_response_stream(user_input, context, chat_history, priority)
 
 
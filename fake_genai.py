@@ -0,0 +1,136 @@
+"""Local stand-in for google.genai.Client used by benchmarks and offline tests.
+
+Only the surface FinancialAdvisor touches is implemented:
+client.models.generate_content, client.models.generate_content_stream and
+their client.aio counterparts.
+"""
+import asyncio
+import math
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, Optional
+
+from google.genai import errors
+
+
+# Status names google.genai reports alongside the HTTP codes FakeClient can fail with
+_STATUS_NAMES = {
+    400: "INVALID_ARGUMENT", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE", 504: "DEADLINE_EXCEEDED",
+}
+
+
+def default_reply(prompt: str) -> str:
+    """Deterministic canned answer whose length loosely follows the prompt."""
+    return (
+        "**Summary**\n"
+        "Based on your profile, keep needs under 50% of income and automate 20% into savings.\n"
+        "- Build an emergency fund covering 3-6 months of expenses\n"
+        "- Contribute to tax-advantaged retirement accounts\n"
+        f"(answered a {len(prompt)}-character prompt)"
+    )
+
+
+def _make_response(text: str, prompt: str):
+    """Build an object shaped like a GenerateContentResponse."""
+    usage = SimpleNamespace(
+        prompt_token_count=len(prompt) // 4,
+        candidates_token_count=len(text) // 4,
+        total_token_count=(len(prompt) + len(text)) // 4,
+    )
+    return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+class FakeClient:
+    """Mimics genai.Client with configurable latency and failure rate.
+
+    latency is the mean seconds per call, drawn from distribution ("fixed",
+    "exponential" or "lognormal", a heavier tail; by default exponential when
+    jitter is True, else fixed). error_rate is the probability that a call
+    raises an APIError, whose status code is drawn from the error_codes weights
+    (by default always a retryable 503).
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, reply: Callable[[str], str] = default_reply,
+                 jitter: bool = True, seed: Optional[int] = None, chunk_size: int = 16,
+                 distribution: Optional[str] = None, error_codes: Optional[Dict[int, float]] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.reply = reply
+        self.jitter = jitter
+        self.distribution = distribution or ("exponential" if jitter else "fixed")
+        if self.distribution not in ("fixed", "exponential", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+        self.error_codes = error_codes or {503: 1.0}
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.models = _FakeModels(self)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(self))
+
+    def _delay(self) -> float:
+        if not self.latency or self.distribution == "fixed":
+            return self.latency
+        if self.distribution == "exponential":
+            return self._random.expovariate(1 / self.latency)
+        # sigma 1, with mu chosen so the mean is still latency
+        return self._random.lognormvariate(math.log(self.latency) - 0.5, 1.0)
+
+    def _next_call(self) -> float:
+        """Count the call, maybe fail it, and return how long it should take."""
+        with self._lock:
+            self.calls += 1
+            code = None
+            if self._random.random() < self.error_rate:
+                code = self._random.choices(list(self.error_codes), weights=list(self.error_codes.values()))[0]
+            delay = self._delay()
+        if code is not None:
+            error_class = errors.ClientError if code < 500 else errors.ServerError
+            status = _STATUS_NAMES.get(code, "UNKNOWN")
+            raise error_class(code, {"error": {"code": code, "message": "fake failure", "status": status}})
+        return delay
+
+    def _chunks(self, text: str):
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+
+
+class _FakeModels:
+    def __init__(self, client: FakeClient):
+        self._client = client
+
+    def generate_content(self, model: str, contents: str, config=None):
+        time.sleep(self._client._next_call())
+        return _make_response(self._client.reply(contents), contents)
+
+    def generate_content_stream(self, model: str, contents: str, config=None):
+        delay = self._client._next_call()
+        text = self._client.reply(contents)
+        chunks = self._client._chunks(text)
+        for chunk in chunks:
+            time.sleep(delay / max(len(chunks), 1))
+            yield SimpleNamespace(text=chunk, usage_metadata=None)
+        yield _make_response("", contents)
+
+
+class _FakeAsyncModels:
+    def __init__(self, client: FakeClient):
+        self._client = client
+
+    async def generate_content(self, model: str, contents: str, config=None):
+        await asyncio.sleep(self._client._next_call())
+        return _make_response(self._client.reply(contents), contents)
+
+    async def generate_content_stream(self, model: str, contents: str, config=None):
+        delay = self._client._next_call()
+        text = self._client.reply(contents)
+        chunks = self._client._chunks(text)
+
+        async def iterate():
+            for chunk in chunks:
+                await asyncio.sleep(delay / max(len(chunks), 1))
+                yield SimpleNamespace(text=chunk, usage_metadata=None)
+            yield _make_response("", contents)
+
+        return iterate()
@@ -0,0 +1,251 @@
+import math
+import re
+import textwrap
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from projections import cached_projection, projection_rows
+
+# Minimum cosine similarity to an intent's closest example for a question to be answered locally;
+# IntentRouter.route also requires the intent's examples to cover every word of the question
+ROUTER_THRESHOLD = 0.35
+
+# Example questions per intent; None collects questions that must go to the model
+# even though they share words with a routable intent
+INTENT_EXAMPLES: Dict[Optional[str], List[str]] = {
+    "budget_breakdown": [
+        "what's my budget breakdown",
+        "show me my budget",
+        "how should I split my income",
+        "break down my monthly budget",
+        "what is my 50/30/20 budget",
+        "how should I allocate my monthly income",
+        "give me a budget plan",
+    ],
+    "monthly_savings": [
+        "how much should I save monthly",
+        "how much should I save each month",
+        "how much money should I be saving",
+        "what should my monthly savings be",
+        "how much can I save per month",
+        "how much of my income should I save",
+    ],
+    "wants_allowance": [
+        "how much can I spend on wants",
+        "how much can I spend on wants each month",
+        "how much can I spend on fun",
+        "what is my budget for entertainment and dining out",
+        "how much can I spend on shopping and hobbies",
+        "how much discretionary spending can I afford",
+    ],
+    "emergency_fund": [
+        "how big should my emergency fund be",
+        "how long until I have an emergency fund",
+        "how much do I need for an emergency fund",
+        "when will my emergency fund be ready",
+        "how many months to build an emergency fund",
+    ],
+    "retirement_outlook": [
+        "will I have enough to retire",
+        "am I on track for retirement",
+        "how much will I have when I retire",
+        "what will my savings be worth at retirement",
+        "can I retire at 65",
+    ],
+    None: [
+        "should I invest in stocks or bonds",
+        "how do I pay off my credit card debt",
+        "should I buy a house or rent",
+        "how should I invest my savings",
+        "what is the best retirement account",
+        "should I use my emergency fund to pay off debt",
+        "how do I save for a house down payment",
+        "how much should I save for my kids college",
+        "is it a good time to buy crypto",
+        "how do I improve my credit score",
+        "what insurance do I need",
+        "how can I cut my grocery budget",
+        "how do taxes work on my savings account",
+    ],
+}
+
+_STOP_WORDS = frozenset(
+    "a about again also amount an and any anything am are at be been but by can could did do does each every for "
+    "from get good have how i i'm im in into is it just me money my now of ok on or our per please put "
+    "putting remind said say should so take tell than thanks that the then there this to us was we were what "
+    "what's whats when where which who will with would yes you your".split()
+)
+# "if" is deliberately not a stop word: no routable example uses it, so a conditional
+# question is never covered by a template (see IntentRouter.route)
+# Negations are kept as words too, but a negated question ("can I not retire at 65?")
+# is never what a template answers, so any of these sends it to the model
+_NEGATION_RE = re.compile(
+    r"\b(?:no|not|never|nor|none|nothing|without|cannot|\w+n['\u2019]t|"
+    r"cant|dont|doesnt|didnt|wont|isnt|arent|shouldnt|wouldnt|couldnt)\b"
+)
+# Words folded into the term the examples use for the same thing
+_SYNONYMS = {
+    "paycheck": "income", "salary": "income", "earnings": "income",
+    "monthly": "month", "months": "month", "fun": "wants", "discretionary": "wants",
+    "entertainment": "wants", "hobbies": "wants", "retirement": "retire", "retiring": "retire",
+}
+_WORD_RE = re.compile(r"[a-z0-9/']+")
+_SUFFIXES = ("ments", "ment", "ings", "ing", "ed", "es", "s", "e")
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping, enough to match "save", "saving" and "savings"."""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    # "retirement" -> "retire" -> "retir", like "retire" itself
+    return word[:-1] if word.endswith("e") and len(word) > 3 else word
+
+
+def tokenize(text: str, bigrams: bool = True) -> List[str]:
+    """Stemmed content words of text, followed by their bigrams unless bigrams is False."""
+    words = [
+        _stem(_SYNONYMS.get(word, word)) for word in _WORD_RE.findall(text.lower()) if word not in _STOP_WORDS
+    ]
+    if not bigrams:
+        return words
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class IntentRouter:
+    """Nearest-example TF-IDF classifier for routine questions.
+
+    Every example question is a TF-IDF vector; a question takes the intent of
+    its most similar example. It is routed only when that intent is not None,
+    the cosine similarity reaches the threshold and the intent's examples
+    cover every word of the question.
+    """
+
+    def __init__(self, examples: Dict[Optional[str], List[str]] = INTENT_EXAMPLES,
+                 threshold: float = ROUTER_THRESHOLD):
+        self.threshold = threshold
+        documents = [(intent, Counter(tokenize(text))) for intent, texts in examples.items() for text in texts]
+        document_frequency = Counter(term for _, terms in documents for term in terms)
+        self.idf = {
+            term: math.log((1 + len(documents)) / (1 + count)) + 1 for term, count in document_frequency.items()
+        }
+        # Smoothed IDF of a term no example contains
+        self.unseen_idf = math.log(1 + len(documents)) + 1
+        # Words each intent's examples use; a template only answers questions made of them
+        self._vocabulary: Dict[Optional[str], set] = {}
+        for intent, texts in examples.items():
+            self._vocabulary[intent] = {word for text in texts for word in tokenize(text, bigrams=False)}
+        self._examples: List[Tuple[Optional[str], Dict[str, float]]] = []
+        # Inverted index: term -> indexes of the examples containing it
+        self._postings: Dict[str, List[int]] = {}
+        for intent, terms in documents:
+            for term in terms:
+                self._postings.setdefault(term, []).append(len(self._examples))
+            self._examples.append((intent, self._normalize(terms)))
+
+    def _normalize(self, terms: Counter) -> Dict[str, float]:
+        """Unit-length TF-IDF vector of term counts."""
+        weights = {term: count * self.idf.get(term, self.unseen_idf) for term, count in terms.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+    def classify(self, text: str) -> Tuple[Optional[str], float]:
+        """Closest intent (None for the model) and its cosine similarity to text."""
+        # Words no example uses add no similarity but still dilute it, so specific
+        # questions ("...for a house in 5 years?") fall below the threshold
+        vector = self._normalize(Counter(tokenize(text)))
+        scores: Dict[int, float] = {}
+        for term, weight in vector.items():
+            for index in self._postings.get(term, ()):
+                scores[index] = scores.get(index, 0.0) + weight * self._examples[index][1][term]
+        if not scores:
+            return None, 0.0
+        best = max(scores, key=scores.get)
+        return self._examples[best][0], scores[best]
+
+    def route(self, text: str) -> Optional[str]:
+        """Intent to answer text with locally, or None to send it to the model.
+
+        A close match is not enough: "how much should I save monthly to retire
+        at 50?" scores well against the monthly savings examples, but the
+        template would ignore "retire at 50". Any word (a condition, a number,
+        a goal) the intent's examples never use sends the question to the model,
+        and so does any negation.
+        """
+        if _NEGATION_RE.search(text.lower()):
+            return None
+        intent, confidence = self.classify(text)
+        if intent is None or confidence < self.threshold:
+            return None
+        if not set(tokenize(text, bigrams=False)) <= self._vocabulary[intent]:
+            return None
+        return intent
+
+
+def _money(amount: float) -> str:
+    return f"${amount:,.2f}"
+
+
+def _projection_detail(context: Dict, label_prefix: str) -> List[str]:
+    projection = cached_projection(context)
+    if not projection:
+        return []
+    return [f"- **{label}:** {value}" for label, value in projection_rows(projection) if label.startswith(label_prefix)]
+
+
+def _budget_breakdown(context: Dict, budget: Dict[str, float], categories: str) -> str:
+    return (
+        f"Here is your suggested monthly budget for an income of {_money(float(context.get('income', 0)))}, "
+        f"using the 50/30/20 rule:\n\n{textwrap.dedent(categories).strip()}"
+    )
+
+
+def _monthly_savings(context: Dict, budget: Dict[str, float], categories: str) -> str:
+    lines = [
+        f"Aim to save **{_money(budget['savings'])} per month** ({_money(budget['savings'] * 12)} a year), "
+        "20% of your income under the 50/30/20 rule. Put it towards your emergency fund first, "
+        "then retirement accounts and other goals."
+    ]
+    detail = _projection_detail(context, "Savings in")
+    if detail:
+        lines += ["", "If you invest what you save at your current rate, projected in today's dollars:"] + detail
+    return "\n".join(lines)
+
+
+def _wants_allowance(context: Dict, budget: Dict[str, float], categories: str) -> str:
+    return (
+        f"You can spend up to **{_money(budget['wants'])} per month** on wants such as entertainment, "
+        f"dining out, shopping, hobbies and subscriptions: 30% of your income under the 50/30/20 rule. "
+        f"Keep needs within {_money(budget['needs'])} and savings at {_money(budget['savings'])}."
+    )
+
+
+def _emergency_fund(context: Dict, budget: Dict[str, float], categories: str) -> str:
+    detail = _projection_detail(context, "Emergency fund")
+    lines = [
+        "An emergency fund should cover 3 to 6 months of essential expenses, kept in an easy-access savings account."
+    ]
+    if detail:
+        lines += ["", "Based on your profile and savings rate:"] + detail
+    return "\n".join(lines)
+
+
+def _retirement_outlook(context: Dict, budget: Dict[str, float], categories: str) -> str:
+    detail = _projection_detail(context, "Retirement") + _projection_detail(context, "Savings in")
+    if not detail:
+        return "Add your monthly income to your profile to see a retirement projection."
+    return "\n".join(
+        ["Projected from your current savings rate, in today's dollars:"] + detail +
+        ["", "Raising your savings rate or retiring later improves these odds."]
+    )
+
+
+# Templated answers by intent, built from the profile and the 50/30/20 budget
+ANSWER_TEMPLATES: Dict[str, Callable[[Dict, Dict[str, float], str], str]] = {
+    "budget_breakdown": _budget_breakdown,
+    "monthly_savings": _monthly_savings,
+    "wants_allowance": _wants_allowance,
+    "emergency_fund": _emergency_fund,
+    "retirement_outlook": _retirement_outlook,
+}
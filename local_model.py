@@ -0,0 +1,138 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+# Define the model directory
+MODEL_DIR = "models/gpt2"
+
+# Process-wide engine, loaded once by get_local_engine()
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def quantize_model(model):
+    """Apply CPU dynamic int8 quantization to a GPT-2 model.
+
+    GPT-2 implements its projections with transformers' Conv1D (a transposed
+    Linear), which quantize_dynamic does not recognize, so those layers are
+    converted to nn.Linear first.
+    """
+    import torch
+    from transformers.pytorch_utils import Conv1D
+
+    def convert(module):
+        for name, child in module.named_children():
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(module, name, linear)
+            else:
+                convert(child)
+
+    convert(model)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class LocalModelEngine:
+    """A warm GPT-2 model that groups concurrent requests into batched generate calls.
+
+    Requests submitted through generate() are queued; a single worker thread
+    collects up to max_batch_size of them (waiting at most max_wait_ms for
+    company) and answers them with one model.generate call.
+    """
+
+    def __init__(self, model_dir: str = MODEL_DIR, quantize: bool = False, max_batch_size: int = 16,
+                 max_wait_ms: float = 10, max_new_tokens: int = 200, temperature: float = 0.7):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        # local_files_only: never reach out to the Hugging Face hub, even to check for updates
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir, local_files_only=True)
+        self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Decoder-only models must be left padded, and long prompts keep their end (the question)
+        self.tokenizer.padding_side = "left"
+        self.tokenizer.truncation_side = "left"
+
+        model = AutoModelForCausalLM.from_pretrained(model_dir, local_files_only=True)
+        model.eval()
+        self.model = quantize_model(model) if quantize else model
+
+        self._torch = torch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.max_input_tokens = model.config.n_positions - max_new_tokens
+
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._serve, name="local-model-batcher", daemon=True)
+        self._worker.start()
+
+    def generate(self, prompt: str) -> str:
+        """Queue a prompt for the next batch and block until its completion is ready."""
+        future: Future = Future()
+        self._queue.put((prompt, future))
+        return future.result()[0]
+
+    def generate_batch(self, prompts: List[str]) -> List[Tuple[str, int]]:
+        """Run one generate call over prompts, returning (text, new token count) per prompt."""
+        torch = self._torch
+        inputs = self.tokenizer(
+            prompts, return_tensors="pt", padding=True, truncation=True, max_length=self.max_input_tokens
+        )
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=self.max_new_tokens,
+                do_sample=True,
+                temperature=self.temperature,
+                pad_token_id=self.tokenizer.eos_token_id,
+            )
+
+        results = []
+        new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
+        for row in new_tokens.tolist():
+            # Finished sequences are padded with EOS up to the longest one in the batch
+            if self.tokenizer.eos_token_id in row:
+                row = row[:row.index(self.tokenizer.eos_token_id)]
+            results.append((self.tokenizer.decode(row, skip_special_tokens=True).strip(), len(row)))
+        return results
+
+    def _serve(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                results = self.generate_batch([prompt for prompt, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def get_local_engine(model_dir: str = MODEL_DIR, quantize: Optional[bool] = None) -> LocalModelEngine:
+    """Return the process-wide local model engine, loading the weights on first call."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if quantize is None:
+                    quantize = os.getenv("LOCAL_MODEL_QUANTIZE", "0") == "1"
+                _engine = LocalModelEngine(model_dir, quantize=quantize)
+    return _engine
@@ -0,0 +1,290 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# Set ADVISOR_METRICS=0 to turn every span and counter into a no-op
+METRICS_ENABLED = os.getenv("ADVISOR_METRICS", "1") != "0"
+# Port of the Prometheus scrape endpoint started by start_metrics_server() (unset: no endpoint)
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+# Upper bounds of the histogram buckets: seconds for spans, characters for response sizes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (64, 256, 1024, 2048, 4096, 8192, 16384, 65536)
+
+_HELP = {
+    "advisor_span_seconds": ("histogram", "Time spent in an instrumented hot-path operation."),
+    "advisor_response_chars": ("histogram", "Length of generated model responses."),
+    "advisor_errors_total": ("counter", "Exceptions raised inside an instrumented operation."),
+    "advisor_responses_total": (
+        "counter", "Advisor responses by outcome (ok, cached, routed, prewarmed, shed or error)."
+    ),
+    "advisor_retries_total": ("counter", "Model calls retried after a retryable error."),
+    "advisor_tokens_total": ("counter", "Tokens reported in the model's usage metadata."),
+    "advisor_scheduler_total": (
+        "counter", "Model requests by priority and scheduler outcome (admitted, rejected, timeout, hedged, "
+        "fallback, stalled or rate_limited)."
+    ),
+    "advisor_queue_depth": ("gauge", "Model requests waiting for admission, by priority."),
+    "advisor_model_in_flight": ("gauge", "Primary model calls currently running."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Process-wide HTTP endpoint, started at most once by start_metrics_server()
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus layout (per-bucket counts, sum and count)."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One slot per bucket plus the implicit +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (the largest bound for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[min(index, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+
+class _Span:
+    """Times a with-block into advisor_span_seconds and counts the exceptions escaping it."""
+
+    __slots__ = ("registry", "labels", "start")
+
+    def __init__(self, registry: "MetricsRegistry", labels: Labels):
+        self.registry = registry
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry._observe("advisor_span_seconds", self.labels, time.perf_counter() - self.start, LATENCY_BUCKETS)
+        if exc_type is not None:
+            self.registry._inc("advisor_errors_total", self.labels + (("error", exc_type.__name__),), 1)
+        return False
+
+
+class _NullSpan:
+    """Shared do-nothing span handed out while metrics are disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled histograms, counters and gauges.
+
+    Everything is aggregated in process; render_prometheus() exports the
+    current values in the Prometheus text exposition format.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        """Context manager timing the operation name."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, (("span", name),))
+
+    def observe_seconds(self, name: str, seconds: float):
+        """Record an externally measured duration of the operation name, e.g. one timed in a worker process."""
+        if self.enabled:
+            self._observe("advisor_span_seconds", (("span", name),), seconds, LATENCY_BUCKETS)
+
+    def observe_size(self, name: str, chars: int):
+        """Record the length of a generated text."""
+        if self.enabled:
+            self._observe("advisor_response_chars", (("source", name),), chars, SIZE_BUCKETS)
+
+    def inc(self, metric: str, amount: float = 1, **labels: str):
+        if self.enabled:
+            self._inc(metric, tuple(sorted(labels.items())), amount)
+
+    def set_gauge(self, metric: str, value: float, **labels: str):
+        if self.enabled:
+            with self._lock:
+                self._gauges[(metric, tuple(sorted(labels.items())))] = value
+
+    def count_error(self, name: str, error: BaseException):
+        """Count an exception that was handled (and so never escaped a span) in the operation name."""
+        if self.enabled:
+            self._inc("advisor_errors_total", (("span", name), ("error", type(error).__name__)), 1)
+
+    def record_usage(self, model: str, usage_metadata):
+        """Add the token counts of a Gemini response's usage metadata."""
+        if not self.enabled or usage_metadata is None:
+            return
+        for kind, field in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+            count = getattr(usage_metadata, field, None)
+            if count:
+                self._inc("advisor_tokens_total", (("kind", kind), ("model", model)), count)
+
+    def _observe(self, metric: str, labels: Labels, value: float, buckets: Tuple[float, ...]):
+        with self._lock:
+            histogram = self._histograms.get((metric, labels))
+            if histogram is None:
+                histogram = self._histograms[(metric, labels)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def _inc(self, metric: str, labels: Labels, amount: float):
+        with self._lock:
+            self._counters[(metric, labels)] = self._counters.get((metric, labels), 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def span_summary(self) -> List[Dict]:
+        """Per-span count, mean, p50, p95 and error count, slowest total first (for the debug panel)."""
+        with self._lock:
+            errors: Dict[str, float] = {}
+            for (metric, labels), value in self._counters.items():
+                if metric == "advisor_errors_total":
+                    span = dict(labels)["span"]
+                    errors[span] = errors.get(span, 0) + value
+            rows = [
+                {
+                    "span": dict(labels)["span"],
+                    "count": histogram.count,
+                    "mean_ms": histogram.sum / histogram.count * 1000,
+                    "p50_ms": histogram.quantile(0.5) * 1000,
+                    "p95_ms": histogram.quantile(0.95) * 1000,
+                    "errors": int(errors.get(dict(labels)["span"], 0)),
+                    "total_s": histogram.sum,
+                }
+                for (metric, labels), histogram in self._histograms.items()
+                if metric == "advisor_span_seconds" and histogram.count
+            ]
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def counters(self) -> Dict[str, float]:
+        """Current counter values keyed by their Prometheus series name."""
+        with self._lock:
+            return {_series(metric, labels): value for (metric, labels), value in sorted(self._counters.items())}
+
+    def gauges(self) -> Dict[str, float]:
+        """Current gauge values keyed by their Prometheus series name."""
+        with self._lock:
+            return {_series(metric, labels): value for (metric, labels), value in sorted(self._gauges.items())}
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        # Copy under the lock so each histogram is exported consistently
+        with self._lock:
+            histograms = sorted(
+                (key, (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count))
+                for key, histogram in self._histograms.items()
+            )
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+        lines = []
+        described = set()
+
+        def describe(metric: str):
+            if metric not in described:
+                described.add(metric)
+                kind, help_text = _HELP.get(metric, ("untyped", metric))
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} {kind}")
+
+        for (metric, labels), (buckets, counts, total, count) in histograms:
+            describe(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{_series(metric + '_bucket', labels + (('le', le),))} {cumulative}")
+            lines.append(f"{_series(metric + '_sum', labels)} {total!r}")
+            lines.append(f"{_series(metric + '_count', labels)} {count}")
+        for (metric, labels), value in counters + gauges:
+            describe(metric)
+            lines.append(f"{_series(metric, labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _series(metric: str, labels: Labels) -> str:
+    if not labels:
+        return metric
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return metric + "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+# Process-wide registry shared by core, backends, reports and the session store
+REGISTRY = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    return REGISTRY
+
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[int]:
+    """Serve /metrics on port (default METRICS_PORT) from a daemon thread, once per process.
+
+    Returns the bound port, or None when no port is configured.
+    """
+    global _metrics_server
+    if port is None:
+        if not METRICS_PORT:
+            return None
+        port = int(METRICS_PORT)
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            # Imported here so the app does not pay for http.server unless it is asked for
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = REGISTRY.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    # Scrapes every few seconds would otherwise flood the Streamlit log
+                    pass
+
+            _metrics_server = ThreadingHTTPServer(("", port), MetricsHandler)
+            threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _metrics_server.server_address[1]
@@ -1,17 +1,195 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
 import unicodedata
-from fpdf import FPDF
-import re # Import regex for more flexible subheading matching
+from collections import OrderedDict
+from fpdf import FPDF, set_global
+import re # Import regex for markdown tokenizing
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from projections import cached_projection, projection_rows
+
+# Unicode TrueType fonts, tried in order; each entry is (regular, bold, italic).
+# PDF_FONT_REGULAR / PDF_FONT_BOLD / PDF_FONT_ITALIC take precedence when set,
+# PDF_UNICODE=0 forces the latin-1 core fonts.
+UNICODE_FONT_CANDIDATES = [
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+     "/usr/share/fonts/truetype/dejavu/DejaVuSans-Oblique.ttf"),
+    ("/usr/share/fonts/dejavu/DejaVuSans.ttf",
+     "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+     "/usr/share/fonts/dejavu/DejaVuSans-Oblique.ttf"),
+    ("/Library/Fonts/Arial Unicode.ttf", "/Library/Fonts/Arial Unicode.ttf", "/Library/Fonts/Arial Unicode.ttf"),
+    ("C:/Windows/Fonts/arial.ttf", "C:/Windows/Fonts/arialbd.ttf", "C:/Windows/Fonts/ariali.ttf"),
+]
+# Parsed TTF metrics are pickled here so each font file is only analysed once
+FONT_CACHE_DIR = ".cache/fonts"
+# Laid-out fragments (one per message, plus the profile section) kept per process; 0 disables reuse
+PDF_FRAGMENT_CACHE_SIZE = int(os.getenv("PDF_FRAGMENT_CACHE_SIZE", 1024))
+
+# Dashes, quotes and spaces LLMs like to emit, mapped to their latin-1 equivalents
+_LATIN1_REPLACEMENTS = str.maketrans({
+    '\u2013': '-', '\u2014': '-', '\u2212': '-',
+    '\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"',
+    '\u2022': '-', '\u2026': '...', '\u00a0': ' ',
+})
+
+# FPDF's TrueType support stops at the Basic Multilingual Plane (no emoji)
+_NON_BMP_RE = re.compile('[\U00010000-\U0010FFFF]')
+
+# One alternation per block-level markdown construct, matched line by line in a single pass
+_BLOCK_RE = re.compile(
+    r"^[ \t]*(?:"
+    r"(?P<heading>\#{1,6})[ \t]+(?P<heading_text>.+?)[ \t#]*"
+    r"|(?P<bullet>[-*+])[ \t]+(?P<bullet_text>.+?)"
+    r"|(?P<number>\d{1,3})[.)][ \t]+(?P<number_text>.+?)"
+    r"|(?P<table>\|.*\|)"
+    r"|(?P<text>.*?)"
+    r")[ \t]*$",
+    re.MULTILINE
+)
+# A line that is bold as a whole (optionally numbered, optionally ending with a colon) is a subheading
+_BOLD_LINE_RE = re.compile(r"^\*\*(?P<text>[^*]+?)[:\s]*\*\*:?$")
+_TABLE_SEPARATOR_RE = re.compile(r"^\|(?:\s*:?-{3,}:?\s*\|)+$")
+# Inline emphasis: **bold**, __bold__ and *italic*
+_INLINE_RE = re.compile(r"\*\*(?P<bold>.+?)\*\*|__(?P<bold2>.+?)__|(?<![*\w])\*(?P<italic>[^*\s][^*]*?)\*(?![*\w])")
 
 def sanitize_text(text: str) -> str:
-    # Replace special dash-like characters with regular dash
-    text = text.replace('\\u2013', '-').replace('\\u2014', '-')
+    # Replace special dash-like characters and typographic quotes with plain ones
+    text = text.translate(_LATIN1_REPLACEMENTS)
     # Normalize and strip other special characters
     return unicodedata.normalize("NFKD", text).encode("latin1", "ignore").decode("latin1")
 
+@lru_cache(maxsize=1)
+def find_unicode_font() -> Optional[Dict[str, str]]:
+    """Locate a Unicode TTF family, returning {style: path} or None to fall back to core fonts."""
+    if os.getenv("PDF_UNICODE", "1") == "0":
+        return None
+    configured = (os.getenv("PDF_FONT_REGULAR"), os.getenv("PDF_FONT_BOLD"), os.getenv("PDF_FONT_ITALIC"))
+    candidates = ([configured] if configured[0] else []) + UNICODE_FONT_CANDIDATES
+    for regular, bold, italic in candidates:
+        if regular and os.path.exists(regular):
+            # Missing variants are drawn with the regular face rather than disabling Unicode output
+            fonts = {'': regular}
+            if bold and os.path.exists(bold):
+                fonts['B'] = bold
+            if italic and os.path.exists(italic):
+                fonts['I'] = italic
+            return fonts
+    return None
+
+class _GlyphSubset(list):
+    """FPDF's per-font list of used code points, without the duplicates.
+
+    FPDF appends every character it draws and later does `cid in subset` for
+    each glyph of the font, so a plain list grows with the document and makes
+    output quadratic. Keeping it unique (with a set for lookups) bounds both.
+    """
+
+    def __init__(self, code_points: Iterable[int]):
+        super().__init__()
+        self._seen = set()
+        for code_point in code_points:
+            self.append(code_point)
+
+    def append(self, code_point: int):
+        if code_point not in self._seen:
+            self._seen.add(code_point)
+            super().append(code_point)
+
+    def __contains__(self, code_point) -> bool:
+        return code_point in self._seen
+
+    def __delitem__(self, index: int):
+        self._seen.discard(self[index])
+        super().__delitem__(index)
+
+def needs_unicode(*texts: str) -> bool:
+    """Whether any text has characters the core fonts would lose, typographic punctuation aside."""
+    return not all(text.translate(_LATIN1_REPLACEMENTS).isascii() for text in texts)
+
 class PDF(FPDF):
+    def __init__(self, unicode: bool = True):
+        """unicode=False keeps to the core fonts, which are not embedded, even when a TTF is available."""
+        super().__init__()
+        # Deflate page content streams
+        self.set_compression(True)
+        self.font_name = 'Arial'
+        self.unicode = False
+
+        self._unicode_fonts = find_unicode_font() if unicode else None
+        if self._unicode_fonts:
+            os.makedirs(FONT_CACHE_DIR, exist_ok=True)
+            set_global("FPDF_CACHE_MODE", 2)
+            set_global("FPDF_CACHE_DIR", FONT_CACHE_DIR)
+            self.font_name = 'Unicode'
+            self.unicode = True
+
+    def set_font(self, family, style='', size=0):
+        # Unicode faces are registered on first use: every registered font gets
+        # subset and embedded at output, whether or not it was drawn with
+        if family == 'Unicode' and self.unicode:
+            underline = 'U' if 'U' in style.upper() else ''
+            style = style.upper().replace('U', '')
+            if style not in self._unicode_fonts:
+                # Reuse the regular face instead of embedding the same file twice
+                style = ''
+            if 'unicode' + style not in self.fonts:
+                # Embedded as a subset containing only the glyphs actually used
+                self.add_font('Unicode', style, self._unicode_fonts[style], uni=True)
+                font = self.fonts['unicode' + style]
+                font['subset'] = _GlyphSubset(font['subset'])
+            style += underline
+        super().set_font(family, style, size)
+
+    def add_page(self, orientation=''):
+        super().add_page(orientation)
+        # Where content starts below the header, i.e. how much a fresh page can hold
+        self.body_top = self.get_y()
+
+    def table_row(self, row_height: float, line_height: float, fill_color: Tuple[int, int, int],
+                  columns: Sequence[Tuple[float, str, Sequence[str]]]):
+        """Draw one bordered table row of pre-wrapped cells, columns being (width, style, lines).
+
+        A row that does not fit the rest of the page starts on the next one; a
+        row taller than a whole page is split, each page getting its own borders.
+        """
+        lines_per_row = round(row_height / line_height)
+        fresh_page_lines = int((self.page_break_trigger - self.body_top) / line_height + 1e-6)
+        if self.get_y() + row_height > self.page_break_trigger and lines_per_row <= fresh_page_lines:
+            self.add_page()
+        self.set_fill_color(*fill_color)
+        start = 0
+        while True:
+            fits = int((self.page_break_trigger - self.get_y()) / line_height + 1e-6)
+            if fits < 1:
+                self.add_page()
+                continue
+            count = min(lines_per_row - start, fits)
+            x, y = self.l_margin, self.get_y()
+            for width, style, lines in columns:
+                self.rect(x, y, width, count * line_height, 'DF')
+                self.set_xy(x, y)
+                self.set_font(self.font_name, style, self.font_size_pt)
+                for line in lines[start:start + count]:
+                    self.cell(width, line_height, line, 0, 2, 'L')
+                x += width
+            self.set_xy(self.l_margin, y + count * line_height)
+            start += count
+            if start >= lines_per_row:
+                break
+            self.add_page()
+        self.set_font(self.font_name, '', self.font_size_pt)
+
+    def clean(self, text: str) -> str:
+        """Prepare text for the active font; core fonts can only draw latin-1."""
+        return _NON_BMP_RE.sub('', text) if self.unicode else sanitize_text(text)
+
     def header(self):
-        # Arial bold 15
-        self.set_font('Arial', 'B', 15)
+        # Bold 15
+        self.set_font(self.font_name, 'B', 15)
         # Calculate width of title and position
         title = 'Financial Advisory Report'
         w = self.get_string_width(title) + 6
@@ -32,142 +210,462 @@ class PDF(FPDF):
     def footer(self):
         # Position at 1.5 cm from bottom
         self.set_y(-15)
-        # Arial italic 8
-        self.set_font('Arial', 'I', 8)
+        # Italic 8
+        self.set_font(self.font_name, 'I', 8)
         # Text color in gray
         self.set_text_color(128)
         # Page number
         self.cell(0, 10, 'Page ' + str(self.page_no()), 0, 0, 'C')
 
-def generate_pdf(user_context, insights):
-    """Generate a more presentable PDF report with user context and latest insights."""
-    pdf = PDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
+class _FileBuffer:
+    """Stand-in for FPDF's in-memory output string that appends straight to a file.
+
+    FPDF only ever does `buffer += text` and `len(buffer)` (for xref offsets),
+    so both are implemented on top of an open binary file.
+    """
+
+    def __init__(self, fileobj):
+        self._file = fileobj
+        self._length = 0
+
+    def __iadd__(self, text: str):
+        # FPDF keeps binary data as latin-1 text, so one character is one byte
+        self._file.write(text.encode('latin-1'))
+        self._length += len(text)
+        return self
+
+    def __len__(self) -> int:
+        return self._length
+
+
+class _SpilledPages(dict):
+    """Page contents that move to a scratch file once a page is finished.
+
+    Only the page being drawn stays in memory; finished pages are read back one
+    at a time while the document is written out.
+    """
+
+    def __init__(self, scratch):
+        super().__init__()
+        self._scratch = scratch
+        self._spilled = {}
+
+    def spill(self, n: int):
+        self._write(n, dict.pop(self, n))
+
+    def _write(self, n: int, content: str):
+        data = content.encode('latin-1')
+        self._scratch.seek(0, os.SEEK_END)
+        self._spilled[n] = (self._scratch.tell(), len(data))
+        self._scratch.write(data)
+
+    def __setitem__(self, n: int, content: str):
+        # FPDF rewrites every page once at output to substitute the page-count alias
+        if n in self._spilled:
+            self._write(n, content)
+        else:
+            dict.__setitem__(self, n, content)
+
+    def __getitem__(self, n: int) -> str:
+        if n in self._spilled:
+            offset, length = self._spilled[n]
+            self._scratch.seek(offset)
+            return self._scratch.read(length).decode('latin-1')
+        return dict.__getitem__(self, n)
+
+
+class StreamingPDF(PDF):
+    """PDF that writes itself to a file with memory bounded by a single page."""
+
+    def __init__(self, fileobj):
+        super().__init__()
+        self._scratch = tempfile.TemporaryFile()
+        self.buffer = _FileBuffer(fileobj)
+        self.pages = _SpilledPages(self._scratch)
+
+    def _endpage(self):
+        super()._endpage()
+        self.pages.spill(self.page)
+
+    def finish(self):
+        """Write out the remaining document structure and release the scratch file."""
+        self.close()
+        self._scratch.close()
+
+class _LayoutRecorder(PDF):
+    """PDF that lays content out without drawing it, recording the resulting draw calls.
+
+    Line wrapping only depends on fonts and x positions, never on y, so the
+    recorded calls can be replayed into any document at any height; page breaks
+    are left to the replayed cell() and table_row() calls. Positions are kept
+    relative to the left margin and to the previous call.
+    """
+
+    def __init__(self, unicode: bool = True):
+        super().__init__(unicode)
+        self.add_page()
+        self.set_auto_page_break(False)
+        self._ops: List[tuple] = []
+        self._left = self.l_margin
+        self._last_y = 0.0
+
+    def header(self):
+        pass
+
+    def footer(self):
+        pass
+
+    def _out(self, s):
+        # Nothing is drawn, so the single scratch page never grows
+        pass
+
+    def record(self, layout) -> tuple:
+        """Run layout(pdf) from the left margin and return (ops, x, dy) to replay with _replay."""
+        self._ops = []
+        # Layouts may move the margin (hanging indents), x is recorded against the one they start from
+        self._left = self.l_margin
+        self.set_xy(self._left, 0.0)
+        self._last_y = 0.0
+        layout(self)
+        return tuple(self._ops), self.x - self._left, self.y - self._last_y
+
+    def _dy(self) -> float:
+        dy = self.y - self._last_y
+        self._last_y = self.y
+        return dy
+
+    def set_font(self, family, style='', size=0):
+        super().set_font(family, style, size)
+        self._ops.append(('set_font', family, style, size))
+
+    def set_fill_color(self, *color):
+        self._ops.append(('set_fill_color', *color))
+
+    def set_text_color(self, *color):
+        self._ops.append(('set_text_color', *color))
+
+    def cell(self, w, h=0, txt='', border=0, ln=0, align='', fill=0, link=''):
+        self._ops.append(('cell', self.x - self._left, self._dy(), w, h, txt, border, ln, align, fill))
+        # The cursor moves as FPDF.cell() would move it
+        if w == 0:
+            w = self.w - self.r_margin - self.x
+        self.lasth = h
+        if ln > 0:
+            self.y += h
+            self._last_y = self.y
+            if ln == 1:
+                self.x = self.l_margin
+        else:
+            self.x += w
 
+    def table_row(self, row_height, line_height, fill_color, columns):
+        self._ops.append(('table_row', self._dy(), row_height, line_height, fill_color, tuple(columns)))
+        self.y += row_height
+        self._last_y = self.y
+        self.x = self.l_margin
+        PDF.set_font(self, self.font_name, '', self.font_size_pt)
+
+# Per-process layout recorders (one per font setup) and LRU of recorded fragments, see _draw_cached
+_recorders: Dict[bool, _LayoutRecorder] = {}
+_fragments: "OrderedDict[Tuple[str, bool, str], tuple]" = OrderedDict()
+_fragments_lock = threading.Lock()
+fragment_stats = {"hits": 0, "misses": 0}
+
+def _replay(pdf: PDF, fragment: tuple):
+    """Draw a recorded fragment at the current position of pdf."""
+    ops, end_x, end_dy = fragment
+    left = pdf.l_margin
+    for op in ops:
+        kind = op[0]
+        if kind == 'cell':
+            _, dx, dy, *args = op
+            pdf.y += dy
+            pdf.x = left + dx
+            pdf.cell(*args)
+        elif kind == 'table_row':
+            pdf.y += op[1]
+            pdf.table_row(*op[2:])
+        else:
+            getattr(pdf, kind)(*op[1:])
+    pdf.x = left + end_x
+    pdf.y += end_dy
+
+def _draw_cached(pdf: PDF, kind: str, content: str, layout):
+    """Draw layout(pdf), reusing an earlier layout of the same kind and content.
+
+    Wrapping text is most of a report's render time, and reports are rebuilt
+    whenever the conversation grows while most of their content (the profile,
+    earlier messages) stays the same. Each piece is therefore laid out once per
+    process and replayed afterwards, keyed by a hash of what it shows and by
+    whether pdf draws with the Unicode font, whose metrics the wrapping used.
+    """
+    key = (kind, pdf.unicode, hashlib.sha256(content.encode('utf-8')).hexdigest())
+    with _fragments_lock:
+        fragment = _fragments.get(key)
+        if fragment is not None:
+            _fragments.move_to_end(key)
+            fragment_stats["hits"] += 1
+        else:
+            fragment_stats["misses"] += 1
+            recorder = _recorders.get(pdf.unicode)
+            if recorder is None:
+                recorder = _recorders[pdf.unicode] = _LayoutRecorder(pdf.unicode)
+            fragment = recorder.record(layout)
+            if PDF_FRAGMENT_CACHE_SIZE > 0:
+                _fragments[key] = fragment
+                while len(_fragments) > PDF_FRAGMENT_CACHE_SIZE:
+                    _fragments.popitem(last=False)
+    _replay(pdf, fragment)
+
+def clear_fragment_cache():
+    """Forget every recorded fragment, e.g. after changing fonts or PDF_FRAGMENT_CACHE_SIZE."""
+    with _fragments_lock:
+        _fragments.clear()
+
+def tokenize_markdown(text: str) -> Iterator[Tuple[str, object]]:
+    """Turn LLM markdown into a stream of (kind, payload) block tokens in one pass.
+
+    Kinds are "heading", "bullet", "number" (payload: (number, text)),
+    "table" (payload: list of rows, each a list of cells), "paragraph" and
+    "blank". Consecutive table lines are grouped into a single token.
+    """
+    table: List[List[str]] = []
+    for match in _BLOCK_RE.finditer(text):
+        if match.group('table') is not None:
+            row = match.group('table')
+            if not _TABLE_SEPARATOR_RE.match(row):
+                table.append([cell.strip() for cell in row.strip('|').split('|')])
+            continue
+        if table:
+            yield 'table', table
+            table = []
+
+        if match.group('heading') is not None:
+            yield 'heading', match.group('heading_text').strip('*')
+        elif match.group('bullet') is not None:
+            yield 'bullet', match.group('bullet_text')
+        elif match.group('number') is not None:
+            number_text = match.group('number_text')
+            bold_line = _BOLD_LINE_RE.match(number_text)
+            if bold_line:
+                yield 'heading', f"{match.group('number')}. {bold_line.group('text')}"
+            else:
+                yield 'number', (match.group('number'), number_text)
+        else:
+            line = match.group('text')
+            if not line:
+                yield 'blank', None
+                continue
+            bold_line = _BOLD_LINE_RE.match(line)
+            if bold_line:
+                yield 'heading', bold_line.group('text')
+            else:
+                yield 'paragraph', line
+    if table:
+        yield 'table', table
+
+def _write_inline(pdf: PDF, text: str, line_height: float, base_style: str = ''):
+    """Write a run of text with **bold** / *italic* spans, wrapping at the current left margin."""
+    if '*' not in text and '__' not in text:
+        # Plain text (the common case) is a single wrapped cell
+        pdf.set_font(pdf.font_name, base_style, pdf.font_size_pt)
+        pdf.multi_cell(0, line_height, pdf.clean(text), 0, 'L')
+        return
+    position = 0
+    for match in _INLINE_RE.finditer(text):
+        if match.start() > position:
+            pdf.set_font(pdf.font_name, base_style, pdf.font_size_pt)
+            pdf.write(line_height, pdf.clean(text[position:match.start()]))
+        if match.group('italic') is not None:
+            style, span = 'I', match.group('italic')
+        else:
+            style, span = 'B', match.group('bold') or match.group('bold2')
+        pdf.set_font(pdf.font_name, style, pdf.font_size_pt)
+        pdf.write(line_height, pdf.clean(span))
+        position = match.end()
+    if position < len(text):
+        pdf.set_font(pdf.font_name, base_style, pdf.font_size_pt)
+        pdf.write(line_height, pdf.clean(text[position:]))
+    pdf.set_font(pdf.font_name, base_style, pdf.font_size_pt)
+    pdf.ln(line_height)
+
+def _strip_inline(text: str) -> str:
+    """Drop emphasis markers, for places (table cells) that are laid out as plain text."""
+    return _INLINE_RE.sub(lambda m: m.group('bold') or m.group('bold2') or m.group('italic'), text)
+
+def _table_row(pdf: PDF, cells: Sequence[str], widths: Sequence[float], line_height: float,
+               fill_color: Tuple[int, int, int], styles: Sequence[str]):
+    """Draw one bordered table row whose height fits its tallest wrapped cell."""
+    columns = []
+    for text, width, style in zip(cells, widths, styles):
+        pdf.set_font(pdf.font_name, style, pdf.font_size_pt)
+        columns.append((width, style, tuple(pdf.multi_cell(width, line_height, text, 0, 'L', split_only=True))))
+    row_height = max(len(lines) for _, _, lines in columns) * line_height
+    pdf.table_row(row_height, line_height, fill_color, columns)
+
+def _render_profile(pdf: PDF, user_context):
+    """Render the 'Your Financial Profile' section."""
     # --- User Context Section --- 
-    pdf.set_font('Arial', 'B', 14)
+    pdf.set_font(pdf.font_name, 'B', 14)
     pdf.set_fill_color(200, 220, 255) # Light blue background for section header
     pdf.cell(0, 10, 'Your Financial Profile', 0, 1, 'L', fill=True)
     pdf.ln(5)
     
-    pdf.set_font('Arial', '', 11) # Use slightly smaller font for table content
+    pdf.set_font(pdf.font_name, '', 11) # Use slightly smaller font for table content
     pdf.set_text_color(0, 0, 0) # Reset text color
 
     # Table properties
-    col_width_label = 45
-    col_width_value = 145 # Total width = 190
+    col_widths = (45, 145) # Total width = 190
     line_height = 8
-    table_border = 1 # Draw borders for table cells
-    header_fill_color = (230, 230, 230) # Light gray for header (if we add one)
     # Use light blue and white for alternating rows
     row_fill_colors = [(220, 230, 255), (255, 255, 255)] # Light Blue and White
-    row_index = 0
-
-    # Table Header (Optional, but adds structure)
-    # pdf.set_font('Arial', 'B', 11)
-    # pdf.set_fill_color(*header_fill_color)
-    # pdf.cell(col_width_label, line_height, 'Category', border=table_border, align='C', fill=True)
-    # pdf.cell(col_width_value, line_height, 'Details', border=table_border, align='C', fill=True)
-    # pdf.ln(line_height)
 
     profile_data = {
         "Age": str(user_context.get('age', 'N/A')),
         "Monthly Income": f"${float(user_context.get('income', 0)):,.2f}",
-        "Monthly Expenses": sanitize_text(user_context.get('expenses', 'N/A')),
-        "Financial Goals": sanitize_text(user_context.get('goals', 'N/A')),
-        "Country": sanitize_text(user_context.get('country', 'N/A'))
+        "Monthly Expenses": pdf.clean(str(user_context.get('expenses', 'N/A'))),
+        "Financial Goals": pdf.clean(str(user_context.get('goals', 'N/A'))),
+        "Country": pdf.clean(str(user_context.get('country', 'N/A')))
     }
 
-    for label, value in profile_data.items():
-        # Set row fill color
-        pdf.set_fill_color(*row_fill_colors[row_index % 2])
-        row_index += 1
-
-        # Remember starting position for multi_cell height calculation
-        start_y = pdf.get_y()
-        start_x = pdf.l_margin
-
-        # Draw label cell (fixed height)
-        pdf.set_font('Arial', 'B', 11) # Bold label
-        pdf.cell(col_width_label, line_height, label, border=table_border, align='L', fill=True)
-        
-        # Draw value cell using multi_cell to handle wrapping
-        pdf.set_font('Arial', '', 11) # Regular value
-        pdf.set_xy(start_x + col_width_label, start_y) # Position for value cell
-        pdf.multi_cell(col_width_value, line_height, value, border=table_border, align='L', fill=True)
-        
-        # Calculate height of the multi_cell
-        # This is tricky as FPDF doesn't directly return height of multi_cell
-        # We'll advance Y by the fixed line height for simplicity, assuming it won't drastically overflow.
-        # For very long values, a more complex height calculation would be needed.
-        pdf.set_y(start_y + line_height) # Move down for the next row
-        pdf.set_x(start_x) # Reset X position
+    for row_index, (label, value) in enumerate(profile_data.items()):
+        # Bold label, regular value; the row grows to fit a wrapped value
+        _table_row(pdf, (label, value), col_widths, line_height, row_fill_colors[row_index % 2], ('B', ''))
 
+def _render_projections(pdf: PDF, user_context):
+    """Render the 'Projections' section computed from the profile, if there is anything to project."""
+    projection = cached_projection(user_context)
+    if not projection:
+        return
     pdf.ln(10)
-    
-    # --- Latest Insights Section --- 
-    pdf.set_font('Arial', 'B', 14)
-    pdf.set_fill_color(200, 220, 255) # Light blue background
-    pdf.cell(0, 10, 'Latest Financial Insights', 0, 1, 'L', fill=True)
+    pdf.set_font(pdf.font_name, 'B', 14)
+    pdf.set_fill_color(200, 220, 255) # Light blue background for section header
+    pdf.cell(0, 10, 'Projections', 0, 1, 'L', fill=True)
     pdf.ln(5)
-    
-    pdf.set_font('Arial', '', 12)
-    pdf.set_text_color(0, 0, 0) # Reset text color
 
-    # Process insights line by line for subheading formatting
-    sanitized_insights = sanitize_text(insights)
-    # Replace potential markdown-like list markers with a latin-1 compatible character
-    sanitized_insights = sanitized_insights.replace('\n-', '\n- ').replace('\n*', '\n- ') # Ensure space after hyphen
-    
-    # Define potential subheading patterns (case-insensitive)
-    subheading_patterns = [
-        r"Understanding the situation",
-        r"Immediate Action Items(?: & Recommendations)?", # Optional part
-        r"Recommendations", # Simpler version
-        r"Long-Term Financial Planning(?: & House Buying Goal)?", # Optional part
-        r"House Buying Goal", # Simpler version
-        r"Warnings(?: & Areas of Concern)?", # Optional part
-        r"Areas of Concern", # Simpler version
-        r"Summary"
-    ]
-    # Combine into a single regex pattern for matching
-    subheading_regex = re.compile(r"^(\*\*)?(\d+\.?\s*)?(\"?)(%s)(\"?)(?:[\s*.:]*)\*\*?$" % "|".join(subheading_patterns), re.IGNORECASE)
-    
-    lines = sanitized_insights.split('\n')
-    
-    pdf.set_font('Arial', '', 11) # Default font for insights
+    pdf.set_font(pdf.font_name, '', 11)
+    pdf.set_text_color(0, 0, 0)
+    row_fill_colors = [(220, 230, 255), (255, 255, 255)]
+    for row_index, (label, value) in enumerate(projection_rows(projection)):
+        _table_row(pdf, (label, value), (45, 145), 8, row_fill_colors[row_index % 2], ('B', ''))
+
+    pdf.set_font(pdf.font_name, 'I', 9)
+    pdf.multi_cell(0, 5, pdf.clean(
+        f"Simulated over {projection['paths']:,} scenarios of market returns and inflation, "
+        "in today's dollars. Projections are estimates, not guarantees."
+    ), 0, 'L')
+    pdf.set_font(pdf.font_name, '', 11)
+
+def _render_table(pdf: PDF, rows: List[List[str]], line_height: float):
+    """Render a markdown table with equal-width columns and a bold header row."""
+    columns = max(len(row) for row in rows)
+    width = (pdf.w - pdf.l_margin - pdf.r_margin) / columns
+    pdf.set_font(pdf.font_name, '', 10)
+    for row_index, row in enumerate(rows):
+        cells = [pdf.clean(_strip_inline(cell)) for cell in row] + [''] * (columns - len(row))
+        fill = (230, 230, 230) if row_index == 0 else (255, 255, 255)
+        styles = ('B' if row_index == 0 else '',) * columns
+        _table_row(pdf, cells, (width,) * columns, line_height, fill, styles)
+    pdf.set_font(pdf.font_name, '', 11)
+    pdf.ln(2)
+
+def _render_insights(pdf: PDF, insights: str):
+    """Render LLM markdown (headings, emphasis, bullet and numbered lists, tables) in a single pass."""
+    pdf.set_font(pdf.font_name, '', 11) # Default font for insights
     line_height_insight = 6
+    list_indent = 5
 
-    for line in lines:
-        trimmed_line = line.strip()
-        if not trimmed_line:
-            # pdf.ln(line_height_insight / 2) # Add small space for blank lines if desired
+    for kind, payload in tokenize_markdown(insights):
+        if kind == 'blank':
             continue
-
-        match = subheading_regex.match(trimmed_line)
-        
-        if match:
-            # It's a subheading
+        if kind == 'heading':
             pdf.ln(3) # Add space before subheading
-            pdf.set_font('Arial', 'B', 11)
-            # Extract the actual matched group (trims potential extra chars)
-            subheading_text = next(g for g in match.groups()[3:5] if g is not None)
-            pdf.multi_cell(0, line_height_insight, subheading_text.strip(), 0, 'L')
-            pdf.set_font('Arial', '', 11) # Reset font after subheading
+            pdf.set_font(pdf.font_name, 'B', 11)
+            pdf.multi_cell(0, line_height_insight, pdf.clean(_strip_inline(payload)), 0, 'L')
+            pdf.set_font(pdf.font_name, '', 11) # Reset font after subheading
             pdf.ln(1) # Add small space after subheading
-        elif trimmed_line.startswith('- '):
-            # It's a list item - indent it
-            pdf.set_x(pdf.l_margin + 5) # Indent list items
-            pdf.multi_cell(0, line_height_insight, trimmed_line, 0, 'L')
-            pdf.set_x(pdf.l_margin) # Reset indent
+        elif kind in ('bullet', 'number'):
+            marker, text = ('-', payload) if kind == 'bullet' else (f"{payload[0]}.", payload[1])
+            # Hanging indent: the marker sits in the gutter, wrapped lines align with the text
+            left_margin = pdf.l_margin
+            pdf.set_x(left_margin + list_indent)
+            pdf.write(line_height_insight, marker + ' ')
+            pdf.set_left_margin(pdf.get_x())
+            _write_inline(pdf, text, line_height_insight)
+            pdf.set_left_margin(left_margin)
+            pdf.set_x(left_margin)
             pdf.ln(0.5) # Smaller space between list items
+        elif kind == 'table':
+            _render_table(pdf, payload, line_height_insight)
         else:
             # It's a normal paragraph line
-            pdf.multi_cell(0, line_height_insight, trimmed_line, 0, 'L')
+            _write_inline(pdf, payload, line_height_insight)
             pdf.ln(1) # Space after normal paragraphs
 
+def _draw_profile(pdf: PDF, user_context: Dict):
+    """The profile and projections sections, laid out once per distinct profile."""
+    def layout(recorder: PDF):
+        _render_profile(recorder, user_context)
+        _render_projections(recorder, user_context)
+    _draw_cached(pdf, 'profile', json.dumps(user_context, sort_keys=True, default=str), layout)
+
+def _draw_insights(pdf: PDF, insights: str):
+    """A rendered markdown message, laid out once per distinct text."""
+    _draw_cached(pdf, 'insights', insights, lambda recorder: _render_insights(recorder, insights))
+
+def generate_pdf(user_context, insights):
+    """Generate a more presentable PDF report with user context and latest insights."""
+    # An all-ASCII report (the usual case) needs no embedded font subset, which is most of its size and time
+    pdf = PDF(unicode=needs_unicode(json.dumps(user_context, ensure_ascii=False, default=str), insights))
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    _draw_profile(pdf, user_context)
+    pdf.ln(10)
+    
+    # --- Latest Insights Section --- 
+    pdf.set_font(pdf.font_name, 'B', 14)
+    pdf.set_fill_color(200, 220, 255) # Light blue background
+    pdf.cell(0, 10, 'Latest Financial Insights', 0, 1, 'L', fill=True)
+    pdf.ln(5)
+    
+    pdf.set_text_color(0, 0, 0) # Reset text color
+
+    _draw_insights(pdf, insights)
+
     pdf.ln(5)
 
     # Return PDF as bytes
-    return pdf.output(dest='S').encode('latin-1') 
\ No newline at end of file
+    return pdf.output(dest='S').encode('latin-1')
+
+def generate_session_pdf(user_context: Dict, messages: Iterable[Dict], path: str):
+    """Write a report of a whole chat session to path.
+
+    messages is consumed lazily and pages are streamed to disk as they are
+    completed, so memory stays flat no matter how long the session is. Not
+    knowing its text in advance, it always uses the Unicode font if there is one.
+    """
+    with open(path, 'wb') as f:
+        pdf = StreamingPDF(f)
+        pdf.add_page()
+        pdf.set_auto_page_break(auto=True, margin=15)
+
+        _draw_profile(pdf, user_context)
+        pdf.ln(10)
+
+        # --- Conversation Section ---
+        pdf.set_font(pdf.font_name, 'B', 14)
+        pdf.set_fill_color(200, 220, 255) # Light blue background
+        pdf.cell(0, 10, 'Conversation', 0, 1, 'L', fill=True)
+        pdf.ln(5)
+        pdf.set_text_color(0, 0, 0) # Reset text color
+
+        for message in messages:
+            pdf.set_font(pdf.font_name, 'B', 12)
+            pdf.set_text_color(0, 80, 180) # Blue role label
+            pdf.cell(0, 8, 'You' if message['role'] == 'user' else 'Advisor', 0, 1, 'L')
+            pdf.set_text_color(0, 0, 0)
+            _draw_insights(pdf, message['content'])
+            pdf.ln(4)
+
+        pdf.finish()
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import math
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# Simulated scenarios per projection
+PROJECTION_PATHS = 10_000
+# Longest horizon simulated, in years
+MAX_PROJECTION_YEARS = 50
+RETIREMENT_AGE = 65
+# Retirement target as a multiple of annual expenses (the "4% rule")
+RETIREMENT_EXPENSE_MULTIPLE = 25
+EMERGENCY_FUND_MONTHS = 6
+# Longest emergency-fund build-up considered, in months
+MAX_EMERGENCY_FUND_MONTHS = 240
+# Years at which savings percentiles are reported (plus the retirement year)
+MILESTONE_YEARS = (5, 10, 20, 30)
+
+# Share of income per category of the 50/30/20 rule, the budget quoted in prompts and answers
+BUDGET_SHARES = {"needs": 0.5, "wants": 0.3, "savings": 0.2}
+# Annual return of a diversified portfolio: mean and standard deviation
+RETURN_MEAN = 0.07
+RETURN_STDEV = 0.15
+# Mean annual inflation by country, with a shared standard deviation
+INFLATION_MEANS = {
+    "United States": 0.025,
+    "India": 0.05,
+    "United Kingdom": 0.025,
+    "Canada": 0.022,
+    "Australia": 0.028,
+}
+DEFAULT_INFLATION_MEAN = 0.03
+INFLATION_STDEV = 0.01
+# Month-to-month variation of what actually gets saved, as a fraction of the plan
+SAVINGS_STDEV = 0.25
+
+
+def budget_allocation(monthly_income: float) -> Dict[str, float]:
+    """Monthly amounts per 50/30/20 category for an income."""
+    return {category: monthly_income * share for category, share in BUDGET_SHARES.items()}
+
+
+def _seed(user_context: Dict) -> int:
+    """Derive the random seed from the profile, so a profile always gets the same figures (and prompt)."""
+    payload = json.dumps(user_context, sort_keys=True, default=str).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(payload).digest()[:8], "little")
+
+
+def project(user_context: Dict, paths: int = PROJECTION_PATHS, seed: Optional[int] = None) -> Optional[Dict]:
+    """Monte Carlo savings, retirement and emergency-fund projections for a profile.
+
+    Every path draws yearly portfolio returns and inflation; all paths are
+    simulated at once as (paths, years) arrays. Amounts are in today's
+    dollars. Returns None when the profile has no income to project from.
+    """
+    # NumPy is only needed once a profile has been submitted
+    import numpy as np
+
+    income = float(user_context.get("income") or 0)
+    if income <= 0:
+        return None
+    age = int(float(user_context.get("age") or 0))
+    # The savings line of the budget the prompt and the routed answers quote
+    savings_rate = BUDGET_SHARES["savings"]
+    monthly_savings = budget_allocation(income)["savings"]
+    monthly_expenses = income - monthly_savings
+    years = max(1, min(RETIREMENT_AGE - age, MAX_PROJECTION_YEARS))
+
+    rng = np.random.default_rng(_seed(user_context) if seed is None else seed)
+    returns = np.maximum(rng.normal(RETURN_MEAN, RETURN_STDEV, (paths, years)), -0.95)
+    inflation = rng.normal(INFLATION_MEANS.get(user_context.get("country"), DEFAULT_INFLATION_MEAN),
+                           INFLATION_STDEV, (paths, years))
+
+    # growth[:, t]: value at the end of year t of $1 invested at the start; prices likewise
+    growth = np.cumprod(1 + returns, axis=1)
+    prices = np.cumprod(1 + inflation, axis=1)
+    growth_before = np.ones_like(growth)
+    growth_before[:, 1:] = growth[:, :-1]
+    prices_before = np.ones_like(prices)
+    prices_before[:, 1:] = prices[:, :-1]
+    # Contributions rise with inflation and are invested at the start of each year:
+    # balance_t = sum over s <= t of contribution_s * growth_t / growth_(s-1)
+    contributions = 12 * monthly_savings * prices_before
+    real_balance = growth * np.cumsum(contributions / growth_before, axis=1) / prices
+
+    milestone_years = sorted({year for year in MILESTONE_YEARS if year < years} | {years})
+    percentiles = np.percentile(real_balance[:, [year - 1 for year in milestone_years]], (10, 50, 90), axis=0)
+    milestones = [
+        {"year": year, "p10": float(p10), "p50": float(p50), "p90": float(p90)}
+        for year, p10, p50, p90 in zip(milestone_years, *percentiles)
+    ]
+
+    retirement = None
+    if age < RETIREMENT_AGE and years == RETIREMENT_AGE - age:
+        target = RETIREMENT_EXPENSE_MULTIPLE * 12 * monthly_expenses
+        retirement = {
+            "age": RETIREMENT_AGE,
+            "years": years,
+            "target": target,
+            "success_rate": float(np.mean(real_balance[:, -1] >= target)),
+        }
+
+    emergency_fund = None
+    if monthly_savings > 0:
+        target = EMERGENCY_FUND_MONTHS * monthly_expenses
+        # The fund only grows, so it is complete by month n exactly when n months of savings
+        # reach the target; their sum is normal, which gives the timeline without simulating it
+        months = np.arange(1, MAX_EMERGENCY_FUND_MONTHS + 1)
+        z = (target - months * monthly_savings) / (np.sqrt(months) * SAVINGS_STDEV * monthly_savings)
+        reached = [0.5 * math.erfc(value / math.sqrt(2)) for value in z]
+        emergency_fund = {
+            "target": target,
+            "p50_months": _first_month(reached, 0.5),
+            "p90_months": _first_month(reached, 0.9),
+        }
+
+    return {
+        "paths": paths,
+        "years": years,
+        "monthly_savings": monthly_savings,
+        "savings_rate": savings_rate,
+        "monthly_expenses": monthly_expenses,
+        "milestones": milestones,
+        "retirement": retirement,
+        "emergency_fund": emergency_fund,
+    }
+
+
+@lru_cache(maxsize=256)
+def _cached_projection(payload: str) -> Optional[Dict]:
+    return project(json.loads(payload))
+
+
+def cached_projection(user_context: Dict) -> Optional[Dict]:
+    """project() memoized per distinct profile, e.g. for every report rendered for one user.
+
+    The returned dict is shared between callers and must not be modified.
+    """
+    return _cached_projection(json.dumps(user_context, sort_keys=True, default=str))
+
+
+def _first_month(reached, probability: float) -> int:
+    """First month by which the fund is complete with the given probability (past the horizon if never)."""
+    for month, chance in enumerate(reached, 1):
+        if chance >= probability:
+            return month
+    return MAX_EMERGENCY_FUND_MONTHS + 1
+
+
+def _money(amount: float) -> str:
+    return f"${amount:,.0f}"
+
+
+def _months(months: int) -> str:
+    return f"over {MAX_EMERGENCY_FUND_MONTHS} months" if months > MAX_EMERGENCY_FUND_MONTHS else f"{months} months"
+
+
+def projection_rows(projection: Dict) -> List[List[str]]:
+    """(label, value) rows summarizing a projection, shared by the prompt and the PDF report."""
+    rows = [[
+        "Monthly savings",
+        f"{_money(projection['monthly_savings'])} ({projection['savings_rate']:.0%} of income)",
+    ]]
+    for milestone in projection["milestones"]:
+        rows.append([
+            f"Savings in {milestone['year']} years",
+            f"{_money(milestone['p50'])} median, "
+            f"{_money(milestone['p10'])} to {_money(milestone['p90'])} (10th-90th percentile)",
+        ])
+    retirement = projection["retirement"]
+    if retirement:
+        rows.append([
+            f"Retirement at {retirement['age']}",
+            f"target {_money(retirement['target'])} ({RETIREMENT_EXPENSE_MULTIPLE}x annual expenses) "
+            f"reached in {retirement['success_rate']:.0%} of scenarios",
+        ])
+    emergency_fund = projection["emergency_fund"]
+    if emergency_fund:
+        rows.append([
+            "Emergency fund",
+            f"{_money(emergency_fund['target'])} ({EMERGENCY_FUND_MONTHS} months of expenses) "
+            f"in {_months(emergency_fund['p50_months'])} typically, "
+            f"{_months(emergency_fund['p90_months'])} in 90% of scenarios",
+        ])
+    return rows
+
+
+def format_projection(projection: Dict) -> str:
+    """Compact bullet list of a projection for the prompt."""
+    return "\n".join(f"- {label}: {value}" for label, value in projection_rows(projection))
@@ -0,0 +1,75 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+# Rough characters-per-token ratio for English text with Gemini/GPT-style tokenizers
+CHARS_PER_TOKEN = 4
+# Longest one-line digest kept per summarized turn
+SUMMARY_LINE_CHARS = 160
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text without calling the tokenizer API."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _role_label(role: str) -> str:
+    return "User" if role == "user" else "Assistant"
+
+
+@lru_cache(maxsize=4096)
+def format_turn(role: str, content: str) -> Tuple[str, int]:
+    """Format one chat message as a prompt line and return it with its token estimate."""
+    line = f"{_role_label(role)}: {content}\n"
+    return line, estimate_tokens(line)
+
+
+@lru_cache(maxsize=4096)
+def summarize_turn(role: str, content: str) -> Tuple[str, int]:
+    """Collapse one chat message into a one-line digest: its first sentence, truncated."""
+    flat = " ".join(content.split())
+    first_sentence = _SENTENCE_END.split(flat, 1)[0]
+    if len(first_sentence) > SUMMARY_LINE_CHARS:
+        first_sentence = first_sentence[:SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+    line = f"- {_role_label(role)}: {first_sentence}\n"
+    return line, estimate_tokens(line)
+
+
+def select_history(chat_history: Sequence[Dict], token_budget: int, summary_token_budget: int) -> Tuple[List[str], List[str]]:
+    """Split chat history into verbatim recent turns and a rolling summary of older ones.
+
+    The newest turns are kept verbatim while they fit in token_budget. Older
+    turns are reduced to memoized one-line digests, newest first, until
+    summary_token_budget is used up; anything older still is counted but
+    dropped. Returns (summary_lines, recent_lines), both in chronological order.
+    """
+    recent: List[str] = []
+    used = 0
+    index = len(chat_history) - 1
+    while index >= 0:
+        message = chat_history[index]
+        line, tokens = format_turn(message["role"], message["content"])
+        if used + tokens > token_budget and recent:
+            break
+        recent.append(line)
+        used += tokens
+        index -= 1
+    recent.reverse()
+
+    summary: List[str] = []
+    used = 0
+    while index >= 0:
+        message = chat_history[index]
+        line, tokens = summarize_turn(message["role"], message["content"])
+        if used + tokens > summary_token_budget:
+            break
+        summary.append(line)
+        used += tokens
+        index -= 1
+    if index >= 0:
+        summary.append(f"- ({index + 1} earlier turns omitted)\n")
+    summary.reverse()
+
+    return summary, recent
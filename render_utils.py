@@ -0,0 +1,19 @@
+import re
+from functools import lru_cache
+
+# Finished messages whose escaped markdown is kept; this module is imported once per
+# process, unlike app.py, which Streamlit executes afresh on every rerun
+MARKDOWN_CACHE_SIZE = 4096
+
+_UNESCAPED_DOLLAR = re.compile(r"(?<!\\)\$")
+
+
+def escape_markdown(content: str) -> str:
+    """Escape dollar signs so amounts like $5,000 are not typeset as LaTeX math."""
+    return _UNESCAPED_DOLLAR.sub(r"\\$", content)
+
+
+@lru_cache(maxsize=MARKDOWN_CACHE_SIZE)
+def prepare_markdown(content: str) -> str:
+    """escape_markdown for finished messages, memoized so unchanged history is processed only once."""
+    return escape_markdown(content)
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+import advisor_client
+from metrics import REGISTRY as metrics
+from pdf_utils import generate_pdf, generate_session_pdf
+
+# Upper bound on the total size of cached PDFs kept in memory
+REPORT_CACHE_BYTES = int(os.getenv("REPORT_CACHE_BYTES", 64 * 1024 * 1024))
+# Number of full-session PDF exports kept on disk
+MAX_SESSION_EXPORTS = int(os.getenv("MAX_SESSION_EXPORTS", 32))
+# Worker processes rendering reports; FPDF layout is CPU-bound pure Python
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", 2))
+
+# Process-wide service, created on first use by get_report_service()
+_report_service = None
+_report_service_lock = threading.Lock()
+
+
+def report_key(user_context: Dict, insights: str) -> str:
+    """Content hash identifying the report for a profile and a message."""
+    payload = json.dumps([user_context, insights], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def session_key(user_context: Dict, messages: Iterable[Dict]) -> str:
+    """Content hash identifying the full-session export of a profile and its messages."""
+    digest = hashlib.sha256(json.dumps(user_context, sort_keys=True, default=str).encode("utf-8"))
+    for message in messages:
+        digest.update(f"\x00{message['role']}\x00{message['content']}".encode("utf-8"))
+    return "session-" + digest.hexdigest()
+
+
+def _timed_generate_pdf(user_context: Dict, insights: str, render_pdf: Callable[[Dict, str], bytes] = generate_pdf):
+    """Render a report in a worker, returning the PDF and its render time."""
+    start = time.perf_counter()
+    pdf_data = render_pdf(user_context, insights)
+    return pdf_data, time.perf_counter() - start
+
+
+def _timed_generate_session_pdf(user_context: Dict, messages: Iterable[Dict], path: str):
+    """Write a full-session export in a worker process, returning its path and render time."""
+    start = time.perf_counter()
+    generate_session_pdf(user_context, messages, path)
+    return path, time.perf_counter() - start
+
+
+class ReportService:
+    """Renders PDF reports off the Streamlit script thread and caches them by content hash.
+
+    submit() returns immediately with the report's key; callers poll get() until
+    the bytes are ready. Finished reports live in an LRU bounded by total size.
+    Full-session exports are written to files in a scratch directory instead of
+    being held in memory, and the newest max_exports of them are kept.
+
+    With render_pdf set (e.g. advisor_client.generate_pdf) reports are rendered
+    by calling it from threads instead of by generate_pdf in worker processes.
+    """
+
+    def __init__(self, max_bytes: int = REPORT_CACHE_BYTES, workers: int = REPORT_WORKERS,
+                 max_exports: int = MAX_SESSION_EXPORTS, render_pdf: Optional[Callable[[Dict, str], bytes]] = None):
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.max_exports = max_exports
+        self.render_pdf = render_pdf
+        self._executor = None
+        self._remote_executor = None
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self._exports: "OrderedDict[str, str]" = OrderedDict()
+        self._export_dir = None
+        self._pending: Dict[str, Future] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "rendered": 0, "render_seconds": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # "spawn" avoids forking the multi-threaded Streamlit server
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _get_remote_executor(self) -> ThreadPoolExecutor:
+        # Waiting on another process to render is I/O, threads are enough
+        if self._remote_executor is None:
+            self._remote_executor = ThreadPoolExecutor(max_workers=4 * self.workers, thread_name_prefix="report")
+        return self._remote_executor
+
+    def submit(self, user_context: Dict, insights: str) -> str:
+        """Start rendering the report unless it is cached or already in flight; return its key."""
+        key = report_key(user_context, insights)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return key
+            if key in self._pending:
+                return key
+            self.stats["misses"] += 1
+            self._errors.pop(key, None)
+            if self.render_pdf is not None:
+                future = self._get_remote_executor().submit(_timed_generate_pdf, user_context, insights, self.render_pdf)
+            else:
+                future = self._get_executor().submit(_timed_generate_pdf, user_context, insights)
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done, self._store, "pdf_render"))
+        return key
+
+    def submit_session_export(self, user_context: Dict, messages: Iterable[Dict]) -> str:
+        """Start exporting a whole session to a PDF file unless it already exists; return its key.
+
+        messages must be re-iterable and picklable, e.g. a list or a
+        session_store.SessionMessages view that the worker streams from SQLite.
+        """
+        key = session_key(user_context, messages)
+        with self._lock:
+            # A file deleted behind our back (e.g. by a temp directory cleaner) is exported again
+            if key in self._exports and os.path.exists(self._exports[key]):
+                self._exports.move_to_end(key)
+                self.stats["hits"] += 1
+                return key
+            if key in self._pending:
+                return key
+            self.stats["misses"] += 1
+            self._errors.pop(key, None)
+            if self._export_dir is None:
+                self._export_dir = tempfile.mkdtemp(prefix="advisor-exports-")
+            path = os.path.join(self._export_dir, f"{key}.pdf")
+            future = self._get_executor().submit(_timed_generate_session_pdf, user_context, messages, path)
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done, self._store_export, "session_export"))
+        return key
+
+    def _finish(self, key: str, future: Future, store: Callable[[str, object], None], span: str):
+        with self._lock:
+            self._pending.pop(key, None)
+            try:
+                result, seconds = future.result()
+            except Exception as e:
+                metrics.count_error(span, e)
+                self._errors[key] = str(e)
+                return
+            # Timed inside the worker process, so queueing and pickling are not included
+            metrics.observe_seconds(span, seconds)
+            self.stats["rendered"] += 1
+            self.stats["render_seconds"] += seconds
+            store(key, result)
+
+    def _store_export(self, key: str, path: str):
+        """Remember an export file, deleting the oldest ones past max_exports."""
+        self._exports[key] = path
+        while len(self._exports) > self.max_exports:
+            _, evicted = self._exports.popitem(last=False)
+            if os.path.exists(evicted):
+                os.remove(evicted)
+
+    def _store(self, key: str, pdf_data: bytes):
+        """Insert into the cache, evicting least recently used reports past the size bound."""
+        self._cache[key] = pdf_data
+        self._cache_bytes += len(pdf_data)
+        while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the finished PDF for key, or None if it is not (or no longer) available."""
+        with self._lock:
+            pdf_data = self._cache.get(key)
+            if pdf_data is not None:
+                self._cache.move_to_end(key)
+            return pdf_data
+
+    def wait(self, key: str, timeout: Optional[float] = None) -> Optional[bytes]:
+        """Block until the report for key is rendered and return it (None if it was never submitted).
+
+        Raises the render error if rendering failed.
+        """
+        with self._lock:
+            pdf_data = self._cache.get(key)
+            future = self._pending.get(key)
+        if pdf_data is not None or future is None:
+            return pdf_data
+        # Taken from the future itself, _finish may not have stored it yet
+        pdf_data, _ = future.result(timeout)
+        return pdf_data
+
+    def get_export_path(self, key: str) -> Optional[str]:
+        """Return the file of a finished session export, or None if it is not available."""
+        with self._lock:
+            path = self._exports.get(key)
+            if path is not None and not os.path.exists(path):
+                del self._exports[key]
+                path = None
+            if path is not None:
+                self._exports.move_to_end(key)
+            return path
+
+    def close(self):
+        """Stop the worker pools and delete exported files."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._remote_executor is not None:
+            self._remote_executor.shutdown(wait=False, cancel_futures=True)
+            self._remote_executor = None
+        if self._export_dir is not None:
+            shutil.rmtree(self._export_dir, ignore_errors=True)
+            self._export_dir = None
+            self._exports.clear()
+
+    def is_pending(self, key: str) -> bool:
+        with self._lock:
+            return key in self._pending
+
+    def get_error(self, key: str) -> Optional[str]:
+        """Error message of a failed render, if any."""
+        with self._lock:
+            return self._errors.get(key)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Cache hit rate and average render time."""
+        with self._lock:
+            requests = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "cached_reports": len(self._cache),
+                "cached_bytes": self._cache_bytes,
+                "hit_rate": self.stats["hits"] / requests if requests else 0.0,
+                "avg_render_seconds": (
+                    self.stats["render_seconds"] / self.stats["rendered"] if self.stats["rendered"] else 0.0
+                ),
+            }
+
+
+def get_report_service() -> ReportService:
+    """Return the process-wide ReportService shared by all sessions, creating it on first call."""
+    global _report_service
+    if _report_service is None:
+        with _report_service_lock:
+            if _report_service is None:
+                # Against the advisor service, reports are rendered (and cached across app processes) there
+                render_pdf = advisor_client.generate_pdf if advisor_client.SERVICE_URL else None
+                _report_service = ReportService(render_pdf=render_pdf)
+    return _report_service
@@ -0,0 +1,146 @@
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from intent_router import tokenize
+from metrics import REGISTRY as metrics
+from session_store import SessionStore, get_session_store
+
+# Hashed term buckets per turn; a collision only blurs two rarely co-occurring terms
+RETRIEVAL_DIM = 512
+# Relevant earlier turns, and most recent turns, put into each prompt
+RETRIEVAL_TOP_K = 4
+RECENT_TURNS = 6
+# Sessions whose index is kept in memory
+MAX_SESSION_INDEXES = 64
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Process-wide indexes by (database path, session id), see get_session_index()
+_session_indexes: "OrderedDict[Tuple[str, int], SessionIndex]" = OrderedDict()
+_session_indexes_lock = threading.Lock()
+
+
+def _buckets(text: str) -> List[int]:
+    # Single words only: shared phrasing ("what was the plan") would otherwise outrank shared topics.
+    # Bare numbers are mostly one-off amounts and would spread noise over every bucket.
+    # crc32 rather than hash(), which is salted per process
+    return [
+        zlib.crc32(term.encode("utf-8")) % RETRIEVAL_DIM
+        for term in tokenize(text, bigrams=False) if not term.isdigit()
+    ]
+
+
+class TurnIndex:
+    """BM25 over the hashed terms of chat turns, kept as a (turns, RETRIEVAL_DIM) uint8 count matrix.
+
+    Turns are only ever appended. IDF and length normalization are applied at
+    query time, so adding a turn never touches the rows before it.
+    """
+
+    def __init__(self, capacity: int = 256):
+        # NumPy is only needed once a session is searched
+        import numpy as np
+
+        self._counts = np.zeros((capacity, RETRIEVAL_DIM), dtype=np.uint8)
+        self._lengths = np.zeros(capacity, dtype=np.float32)
+        self._document_frequency = np.zeros(RETRIEVAL_DIM, dtype=np.int64)
+        self.size = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._counts.nbytes + self._lengths.nbytes + self._document_frequency.nbytes
+
+    def add(self, text: str):
+        """Index the next turn."""
+        import numpy as np
+
+        if self.size == len(self._counts):
+            # Double the capacity so appends stay amortized O(1)
+            counts = np.zeros((2 * len(self._counts), RETRIEVAL_DIM), dtype=np.uint8)
+            counts[:self.size] = self._counts
+            lengths = np.zeros(2 * len(self._lengths), dtype=np.float32)
+            lengths[:self.size] = self._lengths
+            self._counts, self._lengths = counts, lengths
+        buckets = _buckets(text)
+        row = np.bincount(buckets, minlength=RETRIEVAL_DIM) if buckets else np.zeros(RETRIEVAL_DIM, dtype=np.int64)
+        self._counts[self.size] = np.minimum(row, 255)
+        self._lengths[self.size] = len(buckets)
+        self._document_frequency += row > 0
+        self.size += 1
+
+    def search(self, query: str, k: int, limit: Optional[int] = None) -> List[int]:
+        """Indexes of up to k turns among the first limit ones that share terms with query, best first."""
+        import numpy as np
+
+        limit = self.size if limit is None else min(limit, self.size)
+        buckets = np.unique(_buckets(query))
+        if limit <= 0 or k <= 0 or not len(buckets):
+            return []
+        # Only the query's columns are read, O(turns x query terms)
+        tf = self._counts[:limit, buckets].astype(np.float32)
+        df = self._document_frequency[buckets]
+        idf = np.log1p((self.size - df + 0.5) / (df + 0.5)).astype(np.float32)
+        lengths = self._lengths[:limit]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(float(lengths.mean()), 1.0))
+        scores = (tf * (BM25_K1 + 1) / (tf + norm[:, None])) @ idf
+        k = min(k, limit)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [int(index) for index in top if scores[index] > 0]
+
+
+class SessionIndex:
+    """TurnIndex of one stored session, caught up with newly stored messages on every search.
+
+    Row i of the index is the message with sequence number i.
+    """
+
+    def __init__(self, store: SessionStore, session_id: int):
+        self.store = store
+        self.session_id = session_id
+        self.index = TurnIndex()
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """Index the messages appended since the last call (all of them, the first time)."""
+        for message in self.store.iter_messages(self.session_id, start=self.index.size):
+            self.index.add(message["content"])
+
+    def relevant_history(self, question: str, top_k: int = RETRIEVAL_TOP_K,
+                         recent: int = RECENT_TURNS) -> List[Dict]:
+        """The top_k earlier turns most relevant to question plus the last recent turns, oldest first.
+
+        Retrieved turns are marked with "retrieved": True.
+        """
+        with metrics.span("history_retrieval"), self._lock:
+            self.sync()
+            size = self.index.size
+            seqs = self.index.search(question, top_k, limit=size - recent)
+        retrieved = self.store.get_messages(self.session_id, seqs)
+        for message in retrieved:
+            message["retrieved"] = True
+        return retrieved + self.store.load_messages(self.session_id, before=size, limit=recent)
+
+
+def get_session_index(session_id: int, store: Optional[SessionStore] = None) -> SessionIndex:
+    """Return the in-memory index of a session, building it on first use and evicting the least recent."""
+    store = store or get_session_store()
+    key = (store.path, session_id)
+    with _session_indexes_lock:
+        session_index = _session_indexes.get(key)
+        if session_index is None:
+            session_index = _session_indexes[key] = SessionIndex(store, session_id)
+            while len(_session_indexes) > MAX_SESSION_INDEXES:
+                _session_indexes.popitem(last=False)
+        else:
+            _session_indexes.move_to_end(key)
+    return session_index
+
+
+def relevant_history(session_id: int, question: str, top_k: int = RETRIEVAL_TOP_K, recent: int = RECENT_TURNS,
+                     store: Optional[SessionStore] = None) -> List[Dict]:
+    """chat_history for FinancialAdvisor: relevant earlier turns of a stored session plus its latest ones."""
+    return get_session_index(session_id, store).relevant_history(question, top_k, recent)
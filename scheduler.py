@@ -0,0 +1,434 @@
+import asyncio
+import heapq
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Optional
+
+from backends import ModelBackend
+from metrics import REGISTRY as metrics
+
+# Model calls per minute our API quota allows (0: unlimited), and how many may be spent at once
+MODEL_RPM = float(os.getenv("MODEL_RPM", 2000))
+MODEL_BURST = int(os.getenv("MODEL_BURST", 50))
+# Primary model calls in flight at once, and callers that may queue for one before new ones are turned away
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", 16))
+MODEL_MAX_QUEUE = int(os.getenv("MODEL_MAX_QUEUE", 64))
+# Seconds an interactive request waits for (or on) the primary model before the fallback is tried too (0: never)
+MODEL_HEDGE_AFTER = float(os.getenv("MODEL_HEDGE_AFTER", 8))
+# Seconds a stream may go without a chunk once its answer has started (the deadline only covers the first)
+MODEL_STREAM_IDLE_TIMEOUT = float(os.getenv("MODEL_STREAM_IDLE_TIMEOUT", 30))
+# Admission pause after the API reports a rate limit (HTTP 429)
+RATE_LIMIT_COOLDOWN = 10.0
+
+# Lower runs first: interactive chat, then initial insights, then batch jobs
+PRIORITIES = {"chat": 0, "insights": 1, "batch": 2}
+# Seconds from submission until a request is abandoned
+DEADLINES = {"chat": 30.0, "insights": 45.0, "batch": 300.0}
+# Batch jobs care about throughput, not latency, and would only spend the fallback's capacity
+HEDGED_PRIORITIES = frozenset({"chat", "insights"})
+
+# Prepended to answers from the fallback model; they are shown but never cached
+DEGRADED_NOTE = "*The advisor is busy, so this answer comes from a backup model and may be less detailed.*\n\n"
+
+# Process-wide scheduler, created on first use by get_model_scheduler()
+_model_scheduler = None
+_model_scheduler_lock = threading.Lock()
+
+
+class SchedulerError(Exception):
+    """A model call was not made because the scheduler could not admit it."""
+
+
+class Overloaded(SchedulerError):
+    """The queue was full."""
+
+
+class DeadlineExceeded(SchedulerError, TimeoutError):
+    """The request's deadline passed while it was queued or running."""
+
+
+class StreamInterrupted(Exception):
+    """A stream failed or stalled after part of its answer was delivered."""
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    # google.genai's APIError carries the HTTP status as .code
+    return getattr(error, "code", None) == 429
+
+
+def _is_client_error(error: BaseException) -> bool:
+    """A request the API rejected as such (e.g. 400 INVALID_ARGUMENT), which the fallback would reject too."""
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and 400 <= code < 500 and code not in (408, 429)
+
+
+class TokenBucket:
+    """Admits rate requests per second on average and up to burst at once.
+
+    Not thread-safe, ModelScheduler calls it under its own lock.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take a token and return 0, or return the seconds until one is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds: float, now: float):
+        """Admit nothing for the next seconds."""
+        self._refill(now)
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class ModelScheduler:
+    """Admission control in front of every model call.
+
+    Requests queue by priority (chat before insights before batch, FIFO within
+    one) and are admitted while fewer than max_concurrency calls are in flight
+    and the token bucket sized to the API quota has a token. A full queue
+    rejects new requests and every request has a deadline, covering both its
+    wait and the model call. Interactive requests that cannot be admitted or
+    whose primary call is slow or fails within hedge_after are also sent to
+    the fallback backend, and the first answer wins.
+    """
+
+    def __init__(self, rpm: Optional[float] = MODEL_RPM, burst: int = MODEL_BURST,
+                 max_concurrency: int = MODEL_MAX_CONCURRENCY, max_queue: int = MODEL_MAX_QUEUE,
+                 hedge_after: float = MODEL_HEDGE_AFTER, deadlines: Optional[Dict[str, float]] = None,
+                 stream_idle_timeout: float = MODEL_STREAM_IDLE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.hedge_after = hedge_after
+        self.stream_idle_timeout = stream_idle_timeout
+        self.deadlines = {**DEADLINES, **(deadlines or {})}
+        self._bucket = TokenBucket(rpm / 60, burst) if rpm else None
+        self._queue = []
+        self._depth = {priority: 0 for priority in PRIORITIES}
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        # Fallback calls have their own quota, but are capped so a stuck primary cannot multiply them
+        self._fallback_slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Threads running model calls and streams, started on first use."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # Primary calls, fallback calls and fallback calls still waiting for a slot
+                    self._executor = ThreadPoolExecutor(3 * self.max_concurrency, thread_name_prefix="model-call")
+        return self._executor
+
+    def queue_depth(self) -> Dict[str, int]:
+        with self._condition:
+            return dict(self._depth)
+
+    def _publish(self, priority: str):
+        metrics.set_gauge("advisor_queue_depth", self._depth[priority], priority=priority)
+        metrics.set_gauge("advisor_model_in_flight", self._in_flight)
+
+    def _admit(self, priority: str, deadline: float):
+        """Block until the request may call the primary model, taking one of its slots."""
+        start = time.monotonic()
+        entry = (PRIORITIES[priority], next(self._sequence))
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                raise Overloaded(f"{len(self._queue)} model requests are already queued")
+            heapq.heappush(self._queue, entry)
+            self._depth[priority] += 1
+            self._publish(priority)
+            try:
+                while True:
+                    now = time.monotonic()
+                    retry_in = None
+                    if self._queue[0] is entry and self._in_flight < self.max_concurrency:
+                        retry_in = self._bucket.take(now) if self._bucket is not None else 0.0
+                        if not retry_in:
+                            break
+                    if now >= deadline:
+                        raise DeadlineExceeded(f"Waited {now - start:.1f}s for a model slot")
+                    # The head of the queue wakes up for its next token, everyone else when a slot frees up
+                    self._condition.wait(deadline - now if retry_in is None else min(retry_in, deadline - now))
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._depth[priority] -= 1
+                self._publish(priority)
+                # The head may have changed
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._queue)
+            self._depth[priority] -= 1
+            self._in_flight += 1
+            self._publish(priority)
+            self._condition.notify_all()
+        metrics.inc("advisor_scheduler_total", priority=priority, outcome="admitted")
+        metrics.observe_seconds(f"queue_wait_{priority}", time.monotonic() - start)
+
+    @staticmethod
+    def _shed(priority: str, error: SchedulerError):
+        outcome = "rejected" if isinstance(error, Overloaded) else "timeout"
+        metrics.inc("advisor_scheduler_total", priority=priority, outcome=outcome)
+
+    def _release(self):
+        with self._condition:
+            self._in_flight -= 1
+            metrics.set_gauge("advisor_model_in_flight", self._in_flight)
+            self._condition.notify_all()
+
+    def _check_rate_limit(self, error: BaseException):
+        if _is_rate_limited(error) and self._bucket is not None:
+            with self._condition:
+                self._bucket.pause(RATE_LIMIT_COOLDOWN, time.monotonic())
+            metrics.inc("advisor_scheduler_total", priority="all", outcome="rate_limited")
+
+    def _generate_primary(self, backend: ModelBackend, prompt: str) -> str:
+        try:
+            return backend.generate(prompt)
+        except Exception as e:
+            self._check_rate_limit(e)
+            raise
+
+    def _generate_fallback(self, fallback: ModelBackend, prompt: str, deadline: float) -> str:
+        if not self._fallback_slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise DeadlineExceeded("No fallback model slot became free in time")
+        try:
+            return DEGRADED_NOTE + fallback.generate(prompt)
+        finally:
+            self._fallback_slots.release()
+
+    def _hedge(self, priority: str, fallback: Optional[ModelBackend]) -> Optional[ModelBackend]:
+        return fallback if fallback is not None and self.hedge_after > 0 and priority in HEDGED_PRIORITIES else None
+
+    def generate(self, backend: ModelBackend, prompt: str, priority: str = "chat",
+                 fallback: Optional[ModelBackend] = None) -> str:
+        """backend.generate(prompt) once admitted, hedged with fallback for interactive priorities.
+
+        Raises Overloaded or DeadlineExceeded when neither model could answer in time.
+        """
+        deadline = time.monotonic() + self.deadlines[priority]
+        hedge = self._hedge(priority, fallback)
+        try:
+            self._admit(priority, min(deadline, time.monotonic() + self.hedge_after) if hedge else deadline)
+        except SchedulerError as e:
+            if hedge is None:
+                self._shed(priority, e)
+                raise
+            metrics.inc("advisor_scheduler_total", priority=priority, outcome="fallback")
+            return self._generate_fallback(hedge, prompt, deadline)
+
+        # The call runs on the executor so the caller can stop waiting for it at the deadline; its
+        # slot is held until the call really ends, even if its answer is no longer awaited
+        primary = self.executor.submit(self._generate_primary, backend, prompt)
+        primary.add_done_callback(lambda _: self._release())
+        timeout = max(deadline - time.monotonic(), 0)
+        done, _ = wait([primary], timeout=min(self.hedge_after, timeout) if hedge else timeout)
+        if done and (primary.exception() is None or hedge is None or _is_client_error(primary.exception())):
+            return primary.result()
+        if hedge is None:
+            metrics.inc("advisor_scheduler_total", priority=priority, outcome="timeout")
+            raise DeadlineExceeded(f"No answer within {self.deadlines[priority]:g}s")
+        metrics.inc("advisor_scheduler_total", priority=priority, outcome="hedged")
+        pending = {self.executor.submit(self._generate_fallback, hedge, prompt, deadline)}
+        if not done:
+            pending.add(primary)
+        error = primary.exception() if done else None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                metrics.inc("advisor_scheduler_total", priority=priority, outcome="timeout")
+                raise DeadlineExceeded(f"No model answered within {self.deadlines[priority]:g}s")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                if future is primary and _is_client_error(future.exception()):
+                    raise future.exception()
+                error = future.exception()
+        raise error
+
+    def generate_stream(self, backend: ModelBackend, prompt: str, priority: str = "chat",
+                        fallback: Optional[ModelBackend] = None) -> Iterator[str]:
+        """backend.generate_stream(prompt) once admitted, within the request's deadline.
+
+        An interactive stream that cannot be admitted within hedge_after goes to
+        fallback instead. One that is admitted but has no first chunk within
+        hedge_after, or fails before it with a retryable error, is raced against
+        fallback: whichever yields first is streamed and the other is stopped.
+        Raises DeadlineExceeded when no chunk arrives before the deadline, and
+        StreamInterrupted when the stream fails or stalls afterwards.
+        """
+        deadline = time.monotonic() + self.deadlines[priority]
+        hedge = self._hedge(priority, fallback)
+        try:
+            self._admit(priority, min(deadline, time.monotonic() + self.hedge_after) if hedge else deadline)
+        except SchedulerError as e:
+            if hedge is None:
+                self._shed(priority, e)
+                raise
+            metrics.inc("advisor_scheduler_total", priority=priority, outcome="fallback")
+            yield from self._race_stream(None, hedge, prompt, priority, deadline, deadline)
+            return
+        hedge_at = time.monotonic() + self.hedge_after if hedge else deadline
+        yield from self._race_stream(backend, hedge, prompt, priority, deadline, hedge_at)
+
+    def _pump(self, source: str, backend: ModelBackend, prompt: str, events: "queue.Queue",
+              stop: threading.Event, deadline: float):
+        """Run one stream on an executor thread, handing (source, kind, value) events to the consumer."""
+        if source == "fallback" and not self._fallback_slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            events.put((source, "error", DeadlineExceeded("No fallback model slot became free in time")))
+            return
+        try:
+            chunks = backend.generate_stream(prompt)
+            try:
+                for chunk in chunks:
+                    if stop.is_set():
+                        break
+                    events.put((source, "chunk", chunk))
+            finally:
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
+            events.put((source, "end", None))
+        except Exception as e:
+            if source == "primary":
+                self._check_rate_limit(e)
+            events.put((source, "error", e))
+        finally:
+            if source == "fallback":
+                self._fallback_slots.release()
+
+    def _race_stream(self, backend: Optional[ModelBackend], fallback: Optional[ModelBackend], prompt: str,
+                     priority: str, deadline: float, hedge_at: float) -> Iterator[str]:
+        """Stream backend (an admitted primary, None for none), bringing in fallback at hedge_at or on failure.
+
+        Fallback answers start with DEGRADED_NOTE, sent with their first chunk so
+        a fallback that fails right away shows no note. The deadline applies
+        until that first chunk; from then on the winner may take up to
+        stream_idle_timeout per chunk, and failing or stalling raises
+        StreamInterrupted, since part of the answer has already been shown.
+        """
+        events: "queue.Queue" = queue.Queue()
+        stops: Dict[str, threading.Event] = {}
+        running = set()
+
+        def start(source: str, model: ModelBackend):
+            stops[source] = threading.Event()
+            running.add(source)
+            future = self.executor.submit(self._pump, source, model, prompt, events, stops[source], deadline)
+            if source == "primary":
+                # The slot is held until the stream really ends, even once it is no longer read
+                future.add_done_callback(lambda _: self._release())
+
+        if backend is not None:
+            start("primary", backend)
+        else:
+            start("fallback", fallback)
+        winner = None
+        error = None
+        try:
+            while True:
+                now = time.monotonic()
+                can_hedge = winner is None and fallback is not None and "fallback" not in stops
+                if winner is not None:
+                    wake = now + self.stream_idle_timeout
+                else:
+                    wake = min(deadline, hedge_at) if can_hedge else deadline
+                try:
+                    source, kind, value = events.get(timeout=max(wake - now, 0))
+                except queue.Empty:
+                    if winner is not None:
+                        metrics.inc("advisor_scheduler_total", priority=priority, outcome="stalled")
+                        raise StreamInterrupted(
+                            f"The answer stopped: no new text for {self.stream_idle_timeout:g}s"
+                        ) from None
+                    if can_hedge and time.monotonic() < deadline:
+                        metrics.inc("advisor_scheduler_total", priority=priority, outcome="hedged")
+                        start("fallback", fallback)
+                        continue
+                    metrics.inc("advisor_scheduler_total", priority=priority, outcome="timeout")
+                    raise DeadlineExceeded(f"No answer within {self.deadlines[priority]:g}s") from None
+                if winner is not None and source != winner:
+                    continue
+                if kind == "chunk":
+                    if winner is None:
+                        winner = source
+                        for other, stop in stops.items():
+                            if other != source:
+                                stop.set()
+                        if source == "fallback":
+                            value = DEGRADED_NOTE + value
+                    yield value
+                elif kind == "end":
+                    running.discard(source)
+                    # An empty primary answer is still its answer
+                    if winner is not None or source == "primary" or not running:
+                        return
+                else:
+                    running.discard(source)
+                    if winner is not None:
+                        raise StreamInterrupted(f"The answer stopped: {value}") from value
+                    if source == "primary" and _is_client_error(value):
+                        raise value
+                    if source == "primary" and can_hedge:
+                        metrics.inc("advisor_scheduler_total", priority=priority, outcome="hedged")
+                        start("fallback", fallback)
+                    # The primary's error explains the failure better than the fallback's
+                    error = value if source == "primary" else error or value
+                    if not running:
+                        raise error
+        finally:
+            for stop in stops.values():
+                stop.set()
+
+    async def generate_async(self, backend: ModelBackend, prompt: str, priority: str = "batch") -> str:
+        """await backend.generate_async(prompt) once admitted, cancelled at the deadline. Never hedged."""
+        deadline = time.monotonic() + self.deadlines[priority]
+        admission = asyncio.ensure_future(asyncio.to_thread(self._admit, priority, deadline))
+        try:
+            await asyncio.shield(admission)
+        except SchedulerError as e:
+            self._shed(priority, e)
+            raise
+        except asyncio.CancelledError:
+            # The waiting thread cannot be interrupted; give the slot back if it is admitted after all
+            admission.add_done_callback(lambda f: f.cancelled() or f.exception() or self._release())
+            raise
+        try:
+            return await asyncio.wait_for(backend.generate_async(prompt), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            metrics.inc("advisor_scheduler_total", priority=priority, outcome="timeout")
+            raise DeadlineExceeded(f"No answer within {self.deadlines[priority]:g}s") from None
+        except Exception as e:
+            self._check_rate_limit(e)
+            raise
+        finally:
+            self._release()
+
+
+def get_model_scheduler() -> ModelScheduler:
+    """Return the process-wide ModelScheduler shared by every FinancialAdvisor, creating it on first call."""
+    global _model_scheduler
+    if _model_scheduler is None:
+        with _model_scheduler_lock:
+            if _model_scheduler is None:
+                _model_scheduler = ModelScheduler()
+    return _model_scheduler
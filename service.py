@@ -0,0 +1,188 @@
+"""Advisor inference service: model calls and PDF reports over a small JSON API.
+
+Each worker process holds one FinancialAdvisor (one model client and its
+connection pool, the response cache, the scheduler) and one ReportService,
+shared by every request it serves. The response cache on disk is shared by
+all workers. Streamlit processes talk to it through advisor_client when
+ADVISOR_SERVICE_URL is set.
+
+    POST /v1/respond  {"user_input", "context", "chat_history", "priority"} -> {"response"}
+    POST /v1/stream   same body -> newline-delimited {"text"} chunks, then {"error"} if the answer stops midway
+    POST /v1/pdf      {"user_context", "insights"} -> application/pdf
+    GET  /health, GET /metrics
+
+Metrics live in each worker's own registry, so /metrics reports whichever
+worker served the scrape; they are only complete with a single worker (the
+default). Scale out by running one single-worker service per port instead.
+
+Run from the repository root (ADVISOR_BACKEND=fake answers without an API key):
+    python service.py [--host 127.0.0.1] [--port 8600] [--workers 1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from core import FinancialAdvisor
+from metrics import REGISTRY as metrics
+from reports import ReportService, report_key
+from scheduler import (
+    MODEL_BURST, MODEL_MAX_CONCURRENCY, MODEL_MAX_QUEUE, MODEL_RPM, PRIORITIES, ModelScheduler, StreamInterrupted
+)
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", 8600))
+# Worker processes; main() exports the count so each worker takes its share of the API quota.
+# /metrics is per worker, so it only covers the whole service with one.
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", 1))
+# Seconds a /v1/pdf request waits for its report
+PDF_TIMEOUT = 120.0
+# How each accepted field type is spelled in 400 responses
+_JSON_TYPES = {str: "a string", dict: "an object", list: "an array"}
+
+
+class BadRequest(Exception):
+    pass
+
+
+async def _read_json(request: Request, *required: str) -> dict:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise BadRequest("Body must be JSON")
+    if not isinstance(body, dict):
+        raise BadRequest("Body must be a JSON object")
+    missing = [field for field in required if not body.get(field)]
+    if missing:
+        raise BadRequest(f"Missing field(s): {', '.join(missing)}")
+    return body
+
+
+def _check_types(body: dict, **types: type):
+    """Reject fields of the wrong JSON type; absent and null fields are left to the caller."""
+    for field, expected in types.items():
+        value = body.get(field)
+        if value is not None and not isinstance(value, expected):
+            raise BadRequest(f"Field {field} must be {_JSON_TYPES[expected]}")
+
+
+def _advisor_args(body: dict):
+    _check_types(body, user_input=str, context=dict, chat_history=list)
+    if not all(isinstance(message, dict) for message in body.get("chat_history") or ()):
+        raise BadRequest("Field chat_history must be an array of objects")
+    priority = body.get("priority") or "chat"
+    if priority not in PRIORITIES:
+        raise BadRequest(f"Unknown priority: {priority}")
+    return body["user_input"], body.get("context"), body.get("chat_history"), priority
+
+
+async def respond(request: Request) -> Response:
+    body = await _read_json(request, "user_input")
+    advisor = request.app.state.advisor
+    # The advisor's blocking path has the single-flight sharing and hedging, so it runs on the threadpool
+    response = await run_in_threadpool(advisor.get_response, *_advisor_args(body))
+    return JSONResponse({"response": response})
+
+
+async def stream(request: Request) -> Response:
+    body = await _read_json(request, "user_input")
+    chunks = request.app.state.advisor.get_response_stream(*_advisor_args(body))
+
+    # A sync iterator, which Starlette advances on its threadpool
+    def lines():
+        try:
+            for chunk in chunks:
+                yield json.dumps({"text": chunk}) + "\n"
+        except StreamInterrupted as e:
+            # Its own line, so the client can tell the failure from the answer
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def pdf(request: Request) -> Response:
+    body = await _read_json(request, "user_context", "insights")
+    _check_types(body, user_context=dict, insights=str)
+    reports: ReportService = request.app.state.reports
+    reports.submit(body["user_context"], body["insights"])
+    key = report_key(body["user_context"], body["insights"])
+    try:
+        pdf_data = await run_in_threadpool(reports.wait, key, PDF_TIMEOUT)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    if pdf_data is None:
+        # Evicted between submit and wait
+        return JSONResponse({"error": "Report is no longer available, please retry"}, status_code=503)
+    return Response(pdf_data, media_type="application/pdf")
+
+
+async def health(request: Request) -> Response:
+    return JSONResponse({"status": "ok", "model": request.app.state.advisor.model, "pid": os.getpid()})
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    # This worker's registry only, see the module docstring
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+async def bad_request(request: Request, error: BadRequest) -> Response:
+    return JSONResponse({"error": str(error)}, status_code=400)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    # Every worker enforces its share of the quota and of the concurrency cap
+    scheduler = ModelScheduler(
+        rpm=MODEL_RPM / SERVICE_WORKERS if MODEL_RPM else None,
+        burst=max(1, MODEL_BURST // SERVICE_WORKERS),
+        max_concurrency=max(1, MODEL_MAX_CONCURRENCY // SERVICE_WORKERS),
+        max_queue=MODEL_MAX_QUEUE,
+    )
+    app.state.advisor = FinancialAdvisor(scheduler=scheduler)
+    app.state.reports = ReportService()
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(app.state.reports.close)
+
+
+app = Starlette(
+    routes=[
+        Route("/v1/respond", respond, methods=["POST"]),
+        Route("/v1/stream", stream, methods=["POST"]),
+        Route("/v1/pdf", pdf, methods=["POST"]),
+        Route("/health", health),
+        Route("/metrics", metrics_endpoint),
+    ],
+    exception_handlers={BadRequest: bad_request},
+    lifespan=lifespan,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    args = parser.parse_args()
+    if args.workers > 1:
+        print(f"warning: /metrics will report one of the {args.workers} workers per scrape, not their total",
+              file=sys.stderr)
+
+    import uvicorn
+
+    # Workers are fresh processes that import this module again and read their count from here
+    os.environ["SERVICE_WORKERS"] = str(args.workers)
+    uvicorn.run("service:app", host=args.host, port=args.port, workers=args.workers, log_level="info")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from metrics import REGISTRY as metrics
+from sqlite_utils import connect
+
+# Where chat sessions are persisted
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions.sqlite")
+# Messages loaded per page when opening a session or paging back through it
+MESSAGE_PAGE_SIZE = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_user ON sessions (user_id, id);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+# Process-wide stores by database path, created on first use by get_session_store()
+_session_stores: Dict[str, "SessionStore"] = {}
+_session_store_lock = threading.Lock()
+
+
+class SessionStore:
+    """Chat sessions persisted in SQLite.
+
+    Sessions are listed from a small index table without touching their
+    messages; messages are only ever appended and are read back in pages.
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH):
+        self.path = path
+        self._db = connect(path, wal=True)
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def create_session(self, user_id: str, name: str) -> int:
+        """Create an empty session and return its id."""
+        now = time.time()
+        with metrics.span("session_create"), self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO sessions (user_id, name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (user_id, name, now, now)
+            )
+            return cursor.lastrowid
+
+    def list_sessions(self, user_id: str) -> List[Dict]:
+        """Index of a user's sessions (id, name, message_count, updated_at), oldest first."""
+        with metrics.span("session_list"), self._lock:
+            rows = self._db.execute(
+                "SELECT id, name, message_count, updated_at FROM sessions WHERE user_id = ? ORDER BY id",
+                (user_id,)
+            ).fetchall()
+        return [{"id": row[0], "name": row[1], "message_count": row[2], "updated_at": row[3]} for row in rows]
+
+    def append_message(self, session_id: int, role: str, content: str) -> int:
+        """Append a message to a session and return its sequence number."""
+        now = time.time()
+        with metrics.span("session_append"), self._lock, self._db:
+            cursor = self._db.execute(
+                "UPDATE sessions SET message_count = message_count + 1, updated_at = ? "
+                "WHERE id = ? RETURNING message_count",
+                (now, session_id)
+            )
+            seq = cursor.fetchone()[0] - 1
+            self._db.execute(
+                "INSERT INTO messages (session_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, role, content, now)
+            )
+            return seq
+
+    def count_messages(self, session_id: int) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT message_count FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def load_messages(self, session_id: int, before: Optional[int] = None,
+                      limit: int = MESSAGE_PAGE_SIZE) -> List[Dict]:
+        """Load up to limit messages preceding sequence number before (default: the newest), oldest first."""
+        if before is None:
+            before = self.count_messages(session_id)
+        with metrics.span("session_load"), self._lock:
+            rows = self._db.execute(
+                "SELECT seq, role, content FROM messages WHERE session_id = ? AND seq < ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, before, limit)
+            ).fetchall()
+        return [{"seq": seq, "role": role, "content": content} for seq, role, content in reversed(rows)]
+
+    def get_messages(self, session_id: int, seqs: Iterable[int]) -> List[Dict]:
+        """Load the messages with the given sequence numbers, oldest first."""
+        seqs = list(seqs)
+        if not seqs:
+            return []
+        placeholders = ",".join("?" * len(seqs))
+        with metrics.span("session_load"), self._lock:
+            rows = self._db.execute(
+                f"SELECT seq, role, content FROM messages WHERE session_id = ? AND seq IN ({placeholders}) ORDER BY seq",
+                (session_id, *seqs)
+            ).fetchall()
+        return [{"seq": seq, "role": role, "content": content} for seq, role, content in rows]
+
+    def iter_messages(self, session_id: int, page_size: int = MESSAGE_PAGE_SIZE, start: int = 0) -> Iterator[Dict]:
+        """Yield the messages of a session from sequence number start on, fetching one page at a time."""
+        seq = start
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT seq, role, content FROM messages WHERE session_id = ? AND seq >= ? "
+                    "ORDER BY seq LIMIT ?",
+                    (session_id, seq, page_size)
+                ).fetchall()
+            for row_seq, role, content in rows:
+                yield {"seq": row_seq, "role": role, "content": content}
+            if len(rows) < page_size:
+                return
+            seq = rows[-1][0] + 1
+
+
+class SessionMessages:
+    """Re-iterable, picklable view of one session's messages.
+
+    Lets a worker process stream a session straight from the database instead
+    of receiving the whole message list.
+    """
+
+    def __init__(self, path: str, session_id: int, count: int):
+        self.path = path
+        self.session_id = session_id
+        # Messages are append-only, so the first count of them never change
+        self.count = count
+
+    def __iter__(self) -> Iterator[Dict]:
+        for message in get_session_store(self.path).iter_messages(self.session_id):
+            if message["seq"] >= self.count:
+                return
+            yield message
+
+
+def get_session_store(path: str = SESSION_DB_PATH) -> SessionStore:
+    """Return the process-wide SessionStore for path, opening the database on first call."""
+    store = _session_stores.get(path)
+    if store is None:
+        with _session_store_lock:
+            store = _session_stores.get(path)
+            if store is None:
+                store = _session_stores[path] = SessionStore(path)
+    return store
@@ -0,0 +1,104 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Stream:
+    """Chunks of one in-flight stream, replayed to every caller that joins it."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.condition = threading.Condition()
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the work; callers arriving while it is
+    still running wait for (or, for streams, follow along with) its result
+    instead of repeating it. Nothing is kept once the call has finished.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._streams: Dict[str, _Stream] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "shared": 0}
+
+    def call(self, key: str, fn: Callable[[], T]) -> T:
+        """Return fn(), or the result of the identical call already in flight."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stream(self, key: str, fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Yield the chunks of fn(), or of the identical stream already in flight from its first chunk on."""
+        with self._lock:
+            flight = self._streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._streams[key] = _Stream()
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+        return self._lead(key, flight, fn) if leader else self._follow(flight)
+
+    def _lead(self, key: str, flight: _Stream, fn: Callable[[], Iterator[str]]) -> Iterator[str]:
+        completed = False
+        try:
+            for chunk in fn():
+                with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+                yield chunk
+            completed = True
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            if not completed and flight.error is None:
+                # The leader's consumer stopped early, so followers must not take what they got as complete
+                flight.error = RuntimeError("Shared response stream ended before it was complete")
+            with self._lock:
+                del self._streams[key]
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+    @staticmethod
+    def _follow(flight: _Stream) -> Iterator[str]:
+        index = 0
+        while True:
+            with flight.condition:
+                while index == len(flight.chunks) and not flight.done:
+                    flight.condition.wait()
+                chunks = flight.chunks[index:]
+                done = flight.done
+            for chunk in chunks:
+                yield chunk
+            index += len(chunks)
+            if done and index == len(flight.chunks):
+                if flight.error is not None:
+                    raise flight.error
+                return
@@ -0,0 +1,24 @@
+import os
+import sqlite3
+
+# Seconds a statement waits for another connection's write lock before failing with "database is locked"
+BUSY_TIMEOUT_SECONDS = 5.0
+
+
+def connect(path: str, wal: bool = False) -> sqlite3.Connection:
+    """Open (creating its directory if needed) a SQLite file shared by the threads of a process.
+
+    Streamlit serves each browser session from its own thread and the service
+    answers requests from a threadpool, so the connection is not tied to the
+    thread that opened it. The stores using it serialize every access with
+    their own lock, which is what makes that safe. Other processes (service
+    workers, warm_insights.py) may hold the file's write lock; statements wait
+    up to BUSY_TIMEOUT_SECONDS for it, and with wal readers never wait at all.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+    if wal:
+        db.execute("PRAGMA journal_mode=WAL")
+    return db
@@ -0,0 +1,191 @@
+"""Precompute initial insights for common profile buckets.
+
+A bucket is (age band, income band, expense level, country). The live app
+serves a bucket's stored insights instead of calling the model when a
+submitted profile falls into it and its goals are empty or generic.
+
+    python warm_insights.py [--concurrency 8] [--refresh]
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+from sqlite_utils import connect
+
+# Where precomputed insights are stored
+WARM_INSIGHTS_PATH = os.getenv("WARM_INSIGHTS_PATH", "data/warm_insights.sqlite")
+
+# The question render_initial_insights asks right after the profile form is submitted
+INITIAL_INSIGHTS_PROMPT = "Provide initial financial insights based on the user's profile."
+
+# Inclusive age ranges and [low, high) monthly income ranges; profiles outside them are not bucketed
+AGE_BANDS = ((18, 24), (25, 34), (35, 44), (45, 54), (55, 64), (65, 80))
+INCOME_BANDS = ((0, 1000), (1000, 2500), (2500, 5000), (5000, 10000), (10000, 20000))
+EXPENSE_LEVELS = ("Low", "Medium", "High")
+COUNTRIES = ("United States", "India", "United Kingdom", "Canada", "Australia", "Other")
+
+# Goals made only of these words say nothing the bucket's insights do not already cover
+_GENERIC_GOAL_WORDS = frozenset(
+    "a an and be become better build budget budgeting early financial financially finances for freedom "
+    "future get good grow i independence independent invest investing manage me money more my n/a na "
+    "no none nothing plan planning retire retirement rich save saving savings secure security stability "
+    "stable the to wealth wealthy".split()
+)
+_GOAL_WORD_RE = re.compile(r"[a-z/]+|\d+")
+
+# Process-wide store, opened on first use by get_warm_insights_store()
+_warm_insights_store = None
+_warm_insights_store_lock = threading.Lock()
+
+Bucket = Tuple[Tuple[int, int], Tuple[int, int], str, str]
+
+
+def _band(value: float, bands) -> Optional[Tuple[int, int]]:
+    for band in bands:
+        low, high = band
+        if low <= value <= high if bands is AGE_BANDS else low <= value < high:
+            return band
+    return None
+
+
+def is_generic_goal(goals: str) -> bool:
+    """Whether the goals text is empty or only generic wishes such as "save more money"."""
+    words = _GOAL_WORD_RE.findall((goals or "").lower())
+    return len(words) <= 6 and all(word in _GENERIC_GOAL_WORDS for word in words)
+
+
+def profile_bucket(context: Dict) -> Optional[Bucket]:
+    """The bucket a profile falls into, or None if it has none or its goals need a tailored answer."""
+    if not is_generic_goal(str(context.get("goals") or "")):
+        return None
+    try:
+        age_band = _band(int(context.get("age")), AGE_BANDS)
+        income_band = _band(float(context.get("income")), INCOME_BANDS)
+    except (TypeError, ValueError):
+        return None
+    if age_band is None or income_band is None:
+        return None
+    if context.get("expenses") not in EXPENSE_LEVELS or context.get("country") not in COUNTRIES:
+        return None
+    return age_band, income_band, context["expenses"], context["country"]
+
+
+def bucket_key(bucket: Bucket) -> str:
+    (age_low, age_high), (income_low, income_high), expenses, country = bucket
+    return f"age {age_low}-{age_high}|income {income_low}-{income_high}|{expenses}|{country}"
+
+
+def bucket_context(bucket: Bucket) -> Dict:
+    """Representative profile of a bucket (band midpoints, no goals) that its insights are generated for."""
+    (age_low, age_high), (income_low, income_high), expenses, country = bucket
+    return {
+        "age": (age_low + age_high) // 2,
+        "income": float((income_low + income_high) / 2),
+        "expenses": expenses,
+        "goals": "",
+        "country": country,
+    }
+
+
+def iter_buckets() -> Iterator[Bucket]:
+    for age_band in AGE_BANDS:
+        for income_band in INCOME_BANDS:
+            for expenses in EXPENSE_LEVELS:
+                for country in COUNTRIES:
+                    yield age_band, income_band, expenses, country
+
+
+class WarmInsightsStore:
+    """Precomputed insights by bucket key, in SQLite so the warm-up job and the app can share them."""
+
+    def __init__(self, path: str = WARM_INSIGHTS_PATH):
+        self.path = path
+        self._db = connect(path, wal=True)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS insights "
+            "(bucket TEXT PRIMARY KEY, insights TEXT NOT NULL, model TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT insights FROM insights WHERE bucket = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, insights: str, model: str):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO insights (bucket, insights, model, created_at) VALUES (?, ?, ?, ?)",
+                (key, insights, model, time.time())
+            )
+
+    def keys(self) -> set:
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT bucket FROM insights")}
+
+
+def get_warm_insights_store() -> WarmInsightsStore:
+    """Return the process-wide WarmInsightsStore, opening the database on first call."""
+    global _warm_insights_store
+    if _warm_insights_store is None:
+        with _warm_insights_store_lock:
+            if _warm_insights_store is None:
+                _warm_insights_store = WarmInsightsStore()
+    return _warm_insights_store
+
+
+def lookup_insights(context: Dict) -> Optional[str]:
+    """Precomputed initial insights for a profile, or None if they must be generated live."""
+    bucket = profile_bucket(context)
+    if bucket is None:
+        return None
+    insights = get_warm_insights_store().get(bucket_key(bucket))
+    if insights is None:
+        return None
+    (_, _), (income_low, income_high), _, _ = bucket
+    # Figures were computed for the middle of the band, say so rather than pass them off as exact
+    return (
+        f"*Insights for profiles like yours (monthly income ${income_low:,}-${income_high:,}); "
+        f"ask a follow-up question for figures based on your exact income.*\n\n{insights}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8, help="Model calls in flight at once")
+    parser.add_argument("--refresh", action="store_true", help="Regenerate buckets that are already stored")
+    args = parser.parse_args()
+
+    from core import get_financial_advisor
+
+    advisor = get_financial_advisor()
+    store = get_warm_insights_store()
+    existing = set() if args.refresh else store.keys()
+    buckets = [bucket for bucket in iter_buckets() if bucket_key(bucket) not in existing]
+    print(f"{len(buckets)} buckets to warm, {len(existing)} already stored")
+
+    start = time.perf_counter()
+    results = asyncio.run(advisor.get_responses_batch(
+        ({"user_input": INITIAL_INSIGHTS_PROMPT, "context": bucket_context(bucket)} for bucket in buckets),
+        max_concurrency=args.concurrency
+    ))
+    failed = 0
+    for bucket, result in zip(buckets, results):
+        if result["status"] == "ok" and result["response"]:
+            store.set(bucket_key(bucket), result["response"], advisor.model)
+        else:
+            failed += 1
+            print(f"{bucket_key(bucket)}: failed: {result['error']}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    print(f"Warmed {len(buckets) - failed}, failed {failed} in {elapsed:.1f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()